@@ -0,0 +1,136 @@
+import base64
+import binascii
+import json
+import uuid
+from datetime import date
+from decimal import Decimal
+from typing import Any
+
+from django.db.models import F, Model, Q, QuerySet
+from ninja import Field, Schema
+from ninja.errors import HttpError
+from ninja.pagination import AsyncPaginationBase
+
+
+def _encode_value(value: Any) -> Any:
+    # Decision: Own encoding instead of DjangoJSONEncoder, which truncates
+    # datetimes to milliseconds — a lossy cursor would skip or repeat rows.
+    if isinstance(value, date):  # includes datetime
+        return value.isoformat()
+    if isinstance(value, (uuid.UUID, Decimal)):
+        return str(value)
+    return value
+
+
+def encode_cursor(values: list) -> str:
+    """Encode keyset values into an opaque, URL-safe cursor string."""
+    raw = json.dumps([_encode_value(v) for v in values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, expected_length: int) -> list:
+    """Decode a cursor produced by encode_cursor. Raises HttpError(400) if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise HttpError(400, "Invalid cursor")
+    if not isinstance(values, list) or len(values) != expected_length:
+        raise HttpError(400, "Invalid cursor")
+    return values
+
+
+class Keyset:
+    """An ordering over model fields usable for keyset (seek) pagination.
+
+    The ordering must end in a unique field so every row has a distinct
+    position. Nullable fields sort NULLs last in both directions, on every
+    backend, so the "after" predicate below matches the ORDER BY exactly.
+    """
+
+    def __init__(self, *ordering: str):
+        self.fields = [(name.lstrip("-"), name.startswith("-")) for name in ordering]
+        if self.fields[-1][0] not in ("id", "pk"):
+            self.fields.append(("id", self.fields[-1][1]))
+
+    def order_by(self, queryset: QuerySet) -> QuerySet:
+        model = queryset.model
+        expressions = []
+        for name, desc in self.fields:
+            if model._meta.get_field(name).null:
+                expressions.append(F(name).desc(nulls_last=True) if desc else F(name).asc(nulls_last=True))
+            else:
+                expressions.append(f"-{name}" if desc else name)
+        return queryset.order_by(*expressions)
+
+    def after(self, model: type[Model], values: list) -> Q:
+        """Build the predicate for rows strictly after `values` in this ordering.
+
+        Expands the row-value comparison (a, b, c) > (x, y, z) into
+        (a > x) OR (a = x AND b > y) OR (a = x AND b = y AND c > z),
+        which keeps each branch index-friendly and handles NULLs explicitly.
+        """
+        predicate = Q(pk__in=[])
+        equal_prefix = Q()
+        for (name, desc), value in zip(self.fields, values):
+            nullable = model._meta.get_field(name).null
+            if value is None:
+                # NULLs sort last: nothing is strictly after a NULL on this field
+                equal_prefix &= Q(**{f"{name}__isnull": True})
+                continue
+            step = Q(**{f"{name}__{'lt' if desc else 'gt'}": value})
+            if nullable:
+                step |= Q(**{f"{name}__isnull": True})
+            predicate |= equal_prefix & step
+            equal_prefix &= Q(**{name: value})
+        return predicate
+
+    def values_of(self, obj: Any) -> list:
+        return [getattr(obj, name) for name, _desc in self.fields]
+
+
+class CursorPagination(AsyncPaginationBase):
+    """Keyset pagination with opaque cursors and no COUNT(*).
+
+    Decision: Replaces PageNumberPagination on list endpoints — OFFSET scans
+    and the COUNT query both grow with table size, while a keyset page costs
+    the same at any depth. Fetches page_size + 1 rows to know whether another
+    page exists; next_cursor is null on the last page.
+    """
+
+    class Input(Schema):
+        cursor: str | None = Field(default=None, description="Opaque cursor from a previous page's next_cursor")
+        page_size: int | None = Field(default=None, ge=1)
+
+    class Output(Schema):
+        items: list[Any]
+        next_cursor: str | None = Field(default=None, description="Cursor for the next page, null on the last page")
+
+    def __init__(self, ordering: tuple[str, ...], page_size: int = 20, max_page_size: int = 100, **kwargs: Any):
+        self.keyset = Keyset(*ordering)
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+        super().__init__(**kwargs)
+
+    def _prepare(self, queryset: QuerySet, pagination: Input) -> tuple[QuerySet, int]:
+        page_size = min(pagination.page_size or self.page_size, self.max_page_size)
+        queryset = self.keyset.order_by(queryset)
+        if pagination.cursor:
+            values = decode_cursor(pagination.cursor, len(self.keyset.fields))
+            queryset = queryset.filter(self.keyset.after(queryset.model, values))
+        return queryset[: page_size + 1], page_size
+
+    def _page(self, items: list, page_size: int) -> dict:
+        next_cursor = None
+        if len(items) > page_size:
+            items = items[:page_size]
+            next_cursor = encode_cursor(self.keyset.values_of(items[-1]))
+        return {self.items_attribute: items, "next_cursor": next_cursor}
+
+    def paginate_queryset(self, queryset: QuerySet, pagination: Input, request, **params: Any) -> Any:
+        page_qs, page_size = self._prepare(queryset, pagination)
+        return self._page(list(page_qs), page_size)
+
+    async def apaginate_queryset(self, queryset: QuerySet, pagination: Input, request, **params: Any) -> Any:
+        page_qs, page_size = self._prepare(queryset, pagination)
+        return self._page([obj async for obj in page_qs], page_size)
@@ -0,0 +1,38 @@
+import logging
+
+from ninja import Router
+
+from apps.ingredients.autocomplete import MAX_RESULTS, ingredient_autocomplete
+from apps.ingredients.cache import get_categories
+from apps.ingredients.schemas import IngredientSuggestionOut
+
+logger = logging.getLogger(__name__)
+
+router = Router(tags=["ingredients"])
+
+
+@router.get("/autocomplete", response=list[IngredientSuggestionOut])
+async def autocomplete_ingredients(request, q: str = "", limit: int = 10):
+    """Suggest ingredient names for a typed prefix (any word start), most-stocked first.
+
+    Served from the per-worker in-memory index (apps.ingredients.autocomplete),
+    so a keystroke costs no database query. limit is capped at 20. Pulling
+    other workers' new ingredients, and loading an index that missed worker
+    start, happen in the background; until such a load finishes the
+    suggestions are empty.
+    """
+    ingredient_autocomplete.refresh_soon()
+    entries = ingredient_autocomplete.search(q, min(limit, MAX_RESULTS))
+    categories = (await get_categories(ids={entry.category_id for entry in entries})).by_id
+    results = []
+    for entry in entries:
+        category = categories.get(entry.category_id)
+        results.append(
+            {
+                "id": entry.id,
+                "name": entry.name,
+                "category_name": category.name if category else None,
+                "category_icon": category.icon if category else None,
+            }
+        )
+    return results
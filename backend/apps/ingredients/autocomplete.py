@@ -0,0 +1,213 @@
+import asyncio
+import contextvars
+import heapq
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+# Prefixes up to this length have their top results precomputed: they match
+# the most names, so a range scan would be slowest exactly where it is hit most.
+SHORT_PREFIX_LEN = 2
+MAX_RESULTS = 20
+# How often a worker pulls ingredients created by other workers (id > newest seen)
+REFRESH_SECONDS = 60
+
+
+@dataclass
+class Entry:
+    id: int
+    name: str
+    category_id: int | None
+    popularity: int = 0
+
+
+def normalize_query(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _keys(name: str) -> list[str]:
+    """Index a name under every word start: "olive oil" → ["olive oil", "oil"]."""
+    words = name.split()
+    return [" ".join(words[i:]) for i in range(len(words))]
+
+
+class IngredientAutocomplete:
+    """Per-worker prefix index over Ingredient.name, ranked by pantry popularity.
+
+    Decision: A sorted list of (key, id) searched with bisect rather than a
+    node-per-character trie — the same prefix lookup at a fraction of the
+    memory — plus precomputed top results for 1-2 character prefixes. Every
+    word start is a key, so "oil" finds "olive oil". Loaded once per worker
+    (config/asgi.py); new ingredients are added as this worker creates them,
+    and other workers' additions are pulled by id every REFRESH_SECONDS. Both
+    the pull and a load that missed worker start run on a background thread
+    (refresh_soon), so a keystroke never touches the database or waits on a
+    thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refresh_task: asyncio.Task | None = None
+        self._reset()
+
+    def _reset(self):
+        self.loaded = False
+        self._entries: dict[int, Entry] = {}
+        self._keys: list[tuple[str, int]] = []
+        self._top: dict[str, list[int]] = {}
+        self._max_id = 0
+        self._refreshed_at = 0.0
+
+    def _rank(self, entry: Entry, query: str) -> tuple:
+        # Popular first, then names that start with the query, then shorter, then alphabetical
+        return (-entry.popularity, not entry.name.startswith(query), len(entry.name), entry.name)
+
+    def _add_to_top(self, entry: Entry) -> None:
+        for key in _keys(entry.name):
+            for length in range(1, min(SHORT_PREFIX_LEN, len(key)) + 1):
+                prefix = key[:length]
+                ids = self._top.get(prefix, [])
+                if entry.id in ids:
+                    continue
+                ranked = sorted([*ids, entry.id], key=lambda i: self._rank(self._entries[i], prefix))
+                self._top[prefix] = ranked[:MAX_RESULTS]
+
+    def _insert(self, entry: Entry) -> None:
+        self._entries[entry.id] = entry
+        for key in _keys(entry.name):
+            insort(self._keys, (key, entry.id))
+        self._add_to_top(entry)
+        self._max_id = max(self._max_id, entry.id)
+
+    def load(self) -> None:
+        """(Re)build the index from the database: one query, popularity = pantry items per ingredient."""
+        from django.db.models import Count
+
+        from apps.ingredients.models import Ingredient  # models imports this module
+
+        entries = [
+            Entry(id=row[0], name=row[1], category_id=row[2], popularity=row[3])
+            for row in Ingredient.objects.annotate(popularity=Count("pantry_items"))
+            .order_by()
+            .values_list("id", "name", "category_id", "popularity")
+        ]
+        # Built aside and swapped in, so searches running meanwhile see the old index, never half of the new one
+        by_id = {entry.id: entry for entry in entries}
+        keys = sorted((key, entry.id) for entry in entries for key in _keys(entry.name))
+        candidates: dict[str, list[int]] = {}
+        for key, entry_id in keys:
+            for length in range(1, min(SHORT_PREFIX_LEN, len(key)) + 1):
+                candidates.setdefault(key[:length], []).append(entry_id)
+        top = {
+            prefix: heapq.nsmallest(MAX_RESULTS, set(ids), key=lambda i: self._rank(by_id[i], prefix))
+            for prefix, ids in candidates.items()
+        }
+        with self._lock:
+            self._entries, self._keys, self._top = by_id, keys, top
+            self._max_id = max(by_id, default=0)
+            self.loaded = True
+            self._refreshed_at = time.monotonic()
+        logger.info("[IngredientAutocomplete.load] indexed %d ingredients", len(entries))
+
+    def is_stale(self) -> bool:
+        """True if the index is not loaded yet or is due a pull (no I/O)."""
+        return not self.loaded or time.monotonic() - self._refreshed_at >= REFRESH_SECONDS
+
+    def refresh_soon(self) -> None:
+        """Start refresh() on a background thread if the index is stale and none is running; never waits.
+
+        Searches meanwhile are answered from the index as it is (empty until a
+        missed warm-up load finishes).
+        """
+        if not self.is_stale():
+            return
+        loop = asyncio.get_running_loop()
+        task = self._refresh_task
+        if task is not None and not task.done() and task.get_loop() is loop:
+            return
+        # An empty context, not the request's: the refresh outlives the request
+        self._refresh_task = loop.create_task(self._refresh_in_background(), context=contextvars.Context())
+
+    async def _refresh_in_background(self) -> None:
+        try:
+            await sync_to_async(self._refresh_and_close, thread_sensitive=False)()
+        except Exception:
+            logger.exception("[IngredientAutocomplete.refresh_soon] refresh failed")
+
+    def _refresh_and_close(self) -> None:
+        try:
+            self.refresh()
+        finally:
+            close_old_connections()
+
+    def refresh(self) -> None:
+        """Load on first use, then pull ingredients other workers created since the newest one seen."""
+        if not self.loaded:
+            self.load()
+            return
+        if time.monotonic() - self._refreshed_at < REFRESH_SECONDS:
+            return
+        from apps.ingredients.models import Ingredient
+
+        self._refreshed_at = time.monotonic()
+        for ingredient in Ingredient.objects.filter(id__gt=self._max_id).order_by("id"):
+            self.add(ingredient)
+
+    def add(self, ingredient) -> None:
+        """Index a new or renamed/recategorised ingredient (no-op until the index is loaded)."""
+        if not self.loaded:
+            return
+        with self._lock:
+            existing = self._entries.get(ingredient.id)
+            if existing is not None:
+                if existing.name == ingredient.name:
+                    existing.category_id = ingredient.category_id
+                    return
+                self._remove(existing)
+            popularity = existing.popularity if existing else 0
+            self._insert(Entry(ingredient.id, ingredient.name, ingredient.category_id, popularity))
+
+    def remove(self, ingredient_id: int) -> None:
+        with self._lock:
+            entry = self._entries.get(ingredient_id)
+            if entry is not None:
+                self._remove(entry)
+
+    def _remove(self, entry: Entry) -> None:
+        del self._entries[entry.id]
+        self._keys = [pair for pair in self._keys if pair[1] != entry.id]
+        # Re-rank the affected short prefixes so the next-best entry takes the freed slot
+        for prefix, ids in self._top.items():
+            if entry.id in ids:
+                self._top[prefix] = [e.id for e in self._best(prefix, MAX_RESULTS)]
+
+    def search(self, query: str, limit: int = 10) -> list[Entry]:
+        query = normalize_query(query)
+        limit = max(1, min(limit, MAX_RESULTS))
+        if not query:
+            return []
+        if len(query) <= SHORT_PREFIX_LEN:
+            entries = (self._entries.get(i) for i in self._top.get(query, [])[:limit])
+            return [entry for entry in entries if entry is not None]
+        return self._best(query, limit)
+
+    def _best(self, prefix: str, limit: int) -> list[Entry]:
+        """Top entries with a key starting with prefix, found by bisecting the sorted keys."""
+        start = bisect_left(self._keys, (prefix,))
+        end = bisect_left(self._keys, (prefix + "\uffff",), lo=start)
+        ids = {entry_id for _, entry_id in self._keys[start:end]}
+        return heapq.nsmallest(limit, (self._entries[i] for i in ids), key=lambda e: self._rank(e, prefix))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset()
+
+
+ingredient_autocomplete = IngredientAutocomplete()
@@ -0,0 +1,170 @@
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "ingredient_categories:version"
+
+
+@dataclass(frozen=True)
+class CategorySnapshot:
+    """All IngredientCategory rows at one version, indexed by id and name.
+
+    digest identifies the rows' contents, so it is the same on every worker
+    holding the same categories; version is this worker's invalidation counter.
+    """
+
+    version: int
+    digest: str = ""
+    loaded_at: float = 0.0
+    by_id: dict = field(default_factory=dict)
+    by_name: dict = field(default_factory=dict)
+
+    def is_missing(self, ids: Iterable = (), names: Iterable = ()) -> bool:
+        return any(i is not None and i not in self.by_id for i in ids) or any(n not in self.by_name for n in names)
+
+
+_snapshot: CategorySnapshot | None = None
+
+
+async def _current_version() -> int:
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        # Seed with a timestamp rather than 1, so a counter lost to eviction can
+        # never come back at a value some worker has already cached.
+        await cache.aadd(VERSION_KEY, time.time_ns(), timeout=None)
+        version = await cache.aget(VERSION_KEY)
+    return version
+
+
+def _digest(categories) -> str:
+    rows = sorted(
+        (str(c.id), c.name, c.default_shelf_life, c.default_shelf_life_unit, c.icon or "") for c in categories
+    )
+    return hashlib.sha256(repr(rows).encode()).hexdigest()[:16]
+
+
+async def get_categories(ids: Iterable = (), names: Iterable = ()) -> CategorySnapshot:
+    """Return this worker's category snapshot, reloading it if it may be stale.
+
+    Pass the category ids and names about to be looked up: a snapshot missing
+    any of them is reloaded, so a category another worker just created is
+    found here too.
+
+    Decision: ~25 rows that almost never change are loaded once per worker and
+    served from memory; the only per-call cost is reading the version counter
+    from Django's cache. Writes bump the counter via IngredientCategory.save()
+    and delete() — queryset.update()/bulk_create() must call
+    bump_category_version() themselves. With the default LocMemCache that
+    counter is per process and other workers never see it move, so a snapshot
+    is also reloaded on a lookup miss and after CATEGORY_CACHE_TTL seconds
+    (renames and shelf-life edits elsewhere); with a shared cache (Redis) the
+    counter alone invalidates every worker at once.
+    """
+    global _snapshot
+    version = await _current_version()
+    snapshot = _snapshot
+    if (
+        snapshot is not None
+        and snapshot.version == version
+        and time.monotonic() - snapshot.loaded_at < settings.CATEGORY_CACHE_TTL
+        and not snapshot.is_missing(ids, names)
+    ):
+        return snapshot
+
+    from apps.ingredients.models import IngredientCategory  # models imports this module
+
+    categories = [category async for category in IngredientCategory.objects.all()]
+    _snapshot = CategorySnapshot(
+        version=version,
+        digest=_digest(categories),
+        loaded_at=time.monotonic(),
+        by_id={category.id: category for category in categories},
+        by_name={category.name: category for category in categories},
+    )
+    logger.info("[get_categories] loaded %d categories at version %s", len(categories), version)
+    return _snapshot
+
+
+def _bump() -> None:
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:  # key missing or evicted
+        cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def bump_category_version() -> None:
+    """Invalidate every worker's category snapshot.
+
+    Bumps immediately, so this worker sees its own write, and again on commit,
+    so no worker keeps a snapshot it loaded before the write became visible.
+    """
+    global _snapshot
+    _snapshot = None
+    _bump()
+    transaction.on_commit(_bump)
+
+
+def clear_category_cache() -> None:
+    """Drop this worker's snapshot (tests, where rolled-back rows must not linger)."""
+    global _snapshot
+    _snapshot = None
+
+
+class IngredientLRU:
+    """Bounded, per-worker map of normalized ingredient name → Ingredient.
+
+    Decision: An OrderedDict LRU rather than functools.lru_cache, because
+    entries are filled in bulk and must be evictable by name when an
+    Ingredient is saved. Only this worker's entry is evicted on save, so
+    entries also expire INGREDIENT_CACHE_TTL seconds after they were loaded:
+    another worker's recategorisation reaches this one's counters, expiry
+    defaults and responses within that time, however popular the name.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict = OrderedDict()
+
+    def get_many(self, names) -> dict:
+        found = {}
+        cutoff = time.monotonic() - settings.INGREDIENT_CACHE_TTL
+        for name in names:
+            entry = self._entries.get(name)
+            if entry is None:
+                continue
+            ingredient, loaded_at = entry
+            if loaded_at <= cutoff:
+                del self._entries[name]
+                continue
+            self._entries.move_to_end(name)
+            found[name] = ingredient
+        return found
+
+    def put_many(self, ingredients) -> None:
+        now = time.monotonic()
+        for ingredient in ingredients:
+            self._entries[ingredient.name] = (ingredient, now)
+            self._entries.move_to_end(ingredient.name)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def evict(self, name: str) -> None:
+        self._entries.pop(name, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+ingredient_lru = IngredientLRU(maxsize=settings.INGREDIENT_CACHE_SIZE)
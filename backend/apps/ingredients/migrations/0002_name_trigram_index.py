@@ -0,0 +1,36 @@
+# Generated by Django 6.0.2 on 2026-10-19 12:00
+
+from django.db import migrations
+
+# Decision: /pantry/?search= filters ingredient__name__icontains, which Postgres
+# compiles to UPPER("name"::text) LIKE UPPER('%term%') — no B-tree can serve a
+# leading wildcard. A pg_trgm GIN index on that same UPPER(name) expression can.
+# It is raw SQL rather than a Meta index because SQLite (tests, local dev) has no
+# GIN or trigram support; there the search falls back to a scan of the small
+# ingredients table.
+INDEX_NAME = "ingredient_name_trgm_idx"
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON public.ingredients USING gin (UPPER(name) gin_trgm_ops);"
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS public.{INDEX_NAME};")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("ingredients", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 
 from apps.core.models import AbstractIdTimestampModel
+from apps.ingredients.autocomplete import ingredient_autocomplete
+from apps.ingredients.cache import bump_category_version, ingredient_lru
 
 
 class IngredientCategory(AbstractIdTimestampModel):
@@ -13,6 +15,17 @@ class IngredientCategory(AbstractIdTimestampModel):
         db_table = "ingredient_categories"
         verbose_name_plural = "ingredient categories"
 
+    # Decision: Writes go through save()/delete() so the per-worker category
+    # cache (apps.ingredients.cache) is invalidated without signals.
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        bump_category_version()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        bump_category_version()
+        return result
+
     def __str__(self):
         return self.name
 
@@ -34,6 +47,15 @@ class Ingredient(AbstractIdTimestampModel):
     def save(self, *args, **kwargs):
         self.name = self.name.lower().strip()
         super().save(*args, **kwargs)
+        ingredient_lru.evict(self.name)
+        ingredient_autocomplete.add(self)
+
+    def delete(self, *args, **kwargs):
+        ingredient_id = self.id
+        result = super().delete(*args, **kwargs)
+        ingredient_lru.evict(self.name)
+        ingredient_autocomplete.remove(ingredient_id)
+        return result
 
     def __str__(self):
         return self.name
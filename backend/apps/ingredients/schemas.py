@@ -0,0 +1,8 @@
+from ninja import Field, Schema
+
+
+class IngredientSuggestionOut(Schema):
+    id: int
+    name: str
+    category_name: str | None = Field(default=None, description="Ingredient category name")
+    category_icon: str | None = Field(default=None, description="Emoji icon for the category")
@@ -1,65 +1,57 @@
 import logging
 from datetime import date, timedelta
-from decimal import Decimal
 
-from django.db.models import Count, Q
+from django.db import IntegrityError
+from django.db.models import Count
+from django.http import StreamingHttpResponse
 from ninja import Router
 from ninja.errors import HttpError
-from ninja.pagination import PageNumberPagination, paginate
+from ninja.pagination import paginate
 
+from apps.core.pagination import CursorPagination
 from apps.core.schemas import ErrorOut
-from apps.ingredients.models import IngredientCategory
-from apps.pantry.models import PantryItem
+from apps.ingredients.cache import get_categories
+from apps.pantry.changes import pantry_changes
+from apps.pantry.counters import record_pantry_change
+from apps.pantry.models import PantryCategoryCounter, PantryItem
 from apps.pantry.schemas import (
     BulkDeleteIn,
     BulkDeleteOut,
     CategorySummaryOut,
+    PantryBulkAddIn,
+    PantryBulkAddOut,
+    PantryBulkUseIn,
+    PantryChangesOut,
+    PantryImportOut,
     PantryItemCreateIn,
     PantryItemCreateOut,
     PantryItemOut,
-    PantrySummaryOut,
     PantryItemUpdateIn,
     PantryItemUseIn,
+    PantrySummaryOut,
+)
+from apps.pantry.services import (
+    PantryAdd,
+    PantryUpsertResult,
+    PantryUse,
+    build_pantry_item_responses,
+    consume_pantry_item,
+    consume_pantry_items,
+    delete_pantry_items,
+    update_ingredient_category,
+    upsert_pantry_item,
+    upsert_pantry_items,
 )
-from apps.pantry.services import calculate_expiry_date, get_or_create_ingredient, update_ingredient_category
+from apps.pantry.transfer import EXPORT_CONTENT_TYPES, export_pantry, import_pantry
+from apps.pantry.versioning import abump_pantry_versions, etag_by_pantry_version
 
 logger = logging.getLogger(__name__)
 
 router = Router(tags=["pantry"])
 
-
-async def _build_pantry_item_response(item: PantryItem) -> dict:
-    """Build the response dict for PantryItemOut from a PantryItem with ingredient loaded.
-
-    Fetches the ingredient category explicitly because Django's async ORM does not
-    populate nested FK caches (ingredient.category) from select_related — accessing
-    a nullable nested FK silently returns None instead of the cached object.
-    """
-    ingredient = item.ingredient
-    category_name = None
-    category_icon = None
-    if ingredient.category_id:
-        category = await IngredientCategory.objects.filter(id=ingredient.category_id).afirst()
-        if category:
-            category_name = category.name
-            category_icon = category.icon
-    return {
-        "id": item.id,
-        "ingredient": {
-            "id": ingredient.id,
-            "name": ingredient.name,
-            "category_name": category_name,
-            "category_icon": category_icon,
-        },
-        "quantity": item.quantity,
-        "unit": item.unit,
-        "added_date": item.added_date,
-        "expiry_date": item.expiry_date,
-        "source": item.source,
-        "status": item.status,
-        "created_at": item.created_at,
-        "updated_at": item.updated_at,
-    }
+MAX_BULK_ADD_ITEMS = 500
+MAX_CHANGES_PAGE = 500
+MAX_BULK_USE_ITEMS = 100
 
 
 # ---------------------------------------------------------------------------
@@ -68,7 +60,8 @@ async def _build_pantry_item_response(item: PantryItem) -> dict:
 
 
 @router.get("/", response=list[PantryItemOut])
-@paginate(PageNumberPagination, page_size=20)
+@etag_by_pantry_version
+@paginate(CursorPagination, ordering=("expiry_date", "id"), max_page_size=200)
 async def list_pantry_items(
     request,
     status: str | None = None,
@@ -98,6 +91,7 @@ async def list_pantry_items(
 
 
 @router.get("/expiring", response=list[PantryItemOut])
+@etag_by_pantry_version
 async def expiring_items(
     request,
     days: int = 3,
@@ -108,86 +102,118 @@ async def expiring_items(
     Only returns available items with a set expiry date.
     """
     cutoff = date.today() + timedelta(days=days)
-    # Decision: Fetch IDs first, then aget() individually. Nested select_related
-    # (ingredient__category) doesn't populate the second-level FK cache in async
-    # iteration, but aget() works correctly.
-    item_ids = [
-        item_id
-        async for item_id in PantryItem.objects.filter(
+    # Two queries regardless of item count: items+ingredients, then their categories
+    items = [
+        item
+        async for item in PantryItem.objects.filter(
             user=request.auth,
             status=PantryItem.Status.AVAILABLE,
             expiry_date__isnull=False,
             expiry_date__lte=cutoff,
-        ).values_list("id", flat=True)
+        )
+        .select_related("ingredient")
+        .order_by("expiry_date", "id")
     ]
-    result = []
-    for item_id in item_ids:
-        item = await PantryItem.objects.select_related("ingredient__category").aget(id=item_id)
-        result.append(await _build_pantry_item_response(item))
-    return result
+    return await build_pantry_item_responses(items)
+
+
+@router.get("/changes", response={200: PantryChangesOut, 400: ErrorOut, 410: ErrorOut})
+@etag_by_pantry_version
+async def pantry_changes_since(request, since: str | None = None, limit: int = 200):
+    """Delta sync for offline clients: what changed in the pantry since a cursor.
+
+    Omit `since` for a full sync. Returns items created or updated and ids of
+    items deleted after the cursor, plus the cursor to send next time; while
+    has_more is true, call again with it straight away. 410 means the cursor
+    is older than the tombstone retention window — drop local state and
+    full-sync. Cost scales with the number of changes, not pantry size.
+    """
+    limit = max(1, min(limit, MAX_CHANGES_PAGE))
+    changes = await pantry_changes(request.auth, since, limit)
+    logger.info(
+        "[pantry_changes_since] user=%s items=%d deleted=%d has_more=%s",
+        request.auth.id,
+        len(changes.items),
+        len(changes.deleted_ids),
+        changes.has_more,
+    )
+    return {
+        "items": await build_pantry_item_responses(changes.items),
+        "deleted_ids": changes.deleted_ids,
+        "cursor": changes.cursor,
+        "has_more": changes.has_more,
+    }
+
+
+@router.get("/export", response={400: ErrorOut})
+async def export_pantry_items(request, format: str = "csv"):
+    """Download the whole pantry, used_up history included, as CSV or NDJSON.
+
+    Streams the file chunk by chunk (transfer.export_pantry), so memory stays
+    flat however many items the user has.
+    """
+    if format not in EXPORT_CONTENT_TYPES:
+        raise HttpError(400, f"Invalid format. Must be one of: {', '.join(EXPORT_CONTENT_TYPES)}")
+
+    logger.info("[export_pantry_items] user=%s format=%s", request.auth.id, format)
+    response = StreamingHttpResponse(export_pantry(request.auth, format), content_type=EXPORT_CONTENT_TYPES[format])
+    response["Content-Disposition"] = f'attachment; filename="pantry-{date.today().isoformat()}.{format}"'
+    return response
 
 
 @router.get("/summary", response=PantrySummaryOut)
+@etag_by_pantry_version
 async def pantry_summary(request):
     """Get category-level summary of pantry items for the dashboard.
 
-    Groups items by ingredient category with conditional counts for each status.
-    Items without a category are grouped as "Uncategorized".
+    Groups items by ingredient category with counts for each status.
+    Items without a category are grouped as "Uncategorized" (listed last).
     """
     user = request.auth
     expiring_cutoff = date.today() + timedelta(days=3)
 
-    # Decision: Use values().annotate() with conditional Count for efficient
-    # single-query aggregation instead of multiple queries per category.
-    category_stats = [
-        row
-        async for row in PantryItem.objects.filter(user=user)
-        .values("ingredient__category__id", "ingredient__category__name", "ingredient__category__icon")
-        .annotate(
-            available_count=Count("id", filter=Q(status=PantryItem.Status.AVAILABLE)),
-            expired_count=Count("id", filter=Q(status=PantryItem.Status.EXPIRED)),
-            used_up_count=Count("id", filter=Q(status=PantryItem.Status.USED_UP)),
-            expiring_soon_count=Count(
-                "id",
-                filter=Q(
-                    status=PantryItem.Status.AVAILABLE,
-                    expiry_date__isnull=False,
-                    expiry_date__lte=expiring_cutoff,
-                ),
-            ),
-            total_count=Count("id"),
+    # Decision: Status counts come from the incrementally maintained
+    # PantryCategoryCounter rows (one per category), so the cost doesn't grow
+    # with used_up history. Only "expiring soon" is counted live, over the
+    # user's available items with an expiry date — a small indexed range.
+    counters = [c async for c in PantryCategoryCounter.objects.filter(user=user) if c.total]
+    expiring = {
+        category_id: count
+        async for category_id, count in PantryItem.objects.filter(
+            user=user,
+            status=PantryItem.Status.AVAILABLE,
+            expiry_date__isnull=False,
+            expiry_date__lte=expiring_cutoff,
         )
-    ]
+        .order_by()
+        .values("ingredient__category_id")
+        .annotate(count=Count("id"))
+        .values_list("ingredient__category_id", "count")
+    }
+    category_by_id = (await get_categories(ids=[counter.category_id for counter in counters])).by_id
 
     categories = []
-    total_items = 0
-    total_available = 0
-    total_expired = 0
-    total_expiring_soon = 0
-
-    for row in category_stats:
+    for counter in counters:
+        category = category_by_id.get(counter.category_id)
         categories.append(
             CategorySummaryOut(
-                category_id=row["ingredient__category__id"],
-                category_name=row["ingredient__category__name"] or "Uncategorized",
-                category_icon=row["ingredient__category__icon"],
-                available_count=row["available_count"],
-                expired_count=row["expired_count"],
-                used_up_count=row["used_up_count"],
-                expiring_soon_count=row["expiring_soon_count"],
-                total_count=row["total_count"],
+                category_id=counter.category_id,
+                category_name=category.name if category else "Uncategorized",
+                category_icon=category.icon if category else None,
+                available_count=counter.available,
+                expired_count=counter.expired,
+                used_up_count=counter.used_up,
+                expiring_soon_count=expiring.get(counter.category_id, 0),
+                total_count=counter.total,
             )
         )
-        total_items += row["total_count"]
-        total_available += row["available_count"]
-        total_expired += row["expired_count"]
-        total_expiring_soon += row["expiring_soon_count"]
+    categories.sort(key=lambda c: (c.category_id is None, c.category_name))
 
     return PantrySummaryOut(
-        total_items=total_items,
-        total_available=total_available,
-        total_expired=total_expired,
-        total_expiring_soon=total_expiring_soon,
+        total_items=sum(c.total_count for c in categories),
+        total_available=sum(c.available_count for c in categories),
+        total_expired=sum(c.expired_count for c in categories),
+        total_expiring_soon=sum(c.expiring_soon_count for c in categories),
         categories=categories,
     )
 
@@ -211,8 +237,7 @@ async def bulk_delete_pantry_items(request, payload: BulkDeleteIn):
     if len(payload.ids) > 100:
         raise HttpError(400, "Cannot delete more than 100 items at once")
 
-    result = await PantryItem.objects.filter(id__in=payload.ids, user=request.auth).adelete()
-    deleted_count = result[0]
+    deleted_count = await delete_pantry_items(request.auth, payload.ids)
 
     logger.info(
         "[bulk_delete_pantry_items] user=%s requested=%d deleted=%d",
@@ -223,63 +248,115 @@ async def bulk_delete_pantry_items(request, payload: BulkDeleteIn):
     return {"deleted_count": deleted_count}
 
 
+@router.post("/bulk", response={200: PantryBulkAddOut, 400: ErrorOut, 409: ErrorOut})
+async def bulk_add_pantry_items(request, payload: PantryBulkAddIn):
+    """Add many items to the pantry in one request (e.g. a whole shopping trip).
+
+    Each item follows the same merge rules as POST /pantry/; several entries
+    for one ingredient collapse into a single pantry item. Returns the
+    resulting items, one per distinct ingredient, in first-seen order.
+    Costs a fixed handful of queries regardless of batch size.
+    """
+    if not payload.items:
+        raise HttpError(400, "No items provided")
+
+    if len(payload.items) > MAX_BULK_ADD_ITEMS:
+        raise HttpError(400, f"Cannot add more than {MAX_BULK_ADD_ITEMS} items at once")
+
+    result = await _upsert_or_409(request.auth, [_pantry_add(item) for item in payload.items])
+
+    logger.info(
+        "[bulk_add_pantry_items] user=%s requested=%d created=%d updated=%d",
+        request.auth.id,
+        len(payload.items),
+        result.created_count,
+        result.updated_count,
+    )
+    return {
+        "created_count": result.created_count,
+        "updated_count": result.updated_count,
+        "items": await build_pantry_item_responses(result.items),
+    }
+
+
+@router.post("/bulk-use", response={200: list[PantryItemOut], 400: ErrorOut, 404: ErrorOut, 409: ErrorOut})
+async def bulk_use_pantry_items(request, payload: PantryBulkUseIn):
+    """Consume several pantry items at once, e.g. everything that went into a meal.
+
+    Each entry follows the rules of POST /pantry/{id}/use. All-or-nothing: if
+    any item is missing (404), not available or short of the quantity (400),
+    nothing is applied. Returns the updated items in request order (one per
+    distinct id) with a fixed number of queries.
+    """
+    if not payload.items:
+        raise HttpError(400, "No items provided")
+
+    if len(payload.items) > MAX_BULK_USE_ITEMS:
+        raise HttpError(400, f"Cannot use more than {MAX_BULK_USE_ITEMS} items at once")
+
+    items = await consume_pantry_items(request.auth, [PantryUse(item.id, item.quantity) for item in payload.items])
+    logger.info("[bulk_use_pantry_items] user=%s used=%d", request.auth.id, len(items))
+    return await build_pantry_item_responses(items)
+
+
+@router.post("/import", response={200: PantryImportOut, 400: ErrorOut})
+async def import_pantry_items(request, format: str = "csv"):
+    """Import pantry items from a CSV or NDJSON request body (e.g. migrating from another app).
+
+    The raw body is the file (not multipart). Rows use the POST /pantry/
+    fields — ingredient, quantity, unit, expiry_date, category — so a
+    /pantry/export file round-trips. Invalid rows are skipped and reported;
+    valid rows are merged into the pantry in batches (transfer.import_pantry).
+    """
+    if format not in EXPORT_CONTENT_TYPES:
+        raise HttpError(400, f"Invalid format. Must be one of: {', '.join(EXPORT_CONTENT_TYPES)}")
+
+    logger.info("[import_pantry_items] user=%s format=%s", request.auth.id, format)
+    return await import_pantry(request.auth, request, format)
+
+
 # ---------------------------------------------------------------------------
 # Create
 # ---------------------------------------------------------------------------
 
 
+def _pantry_add(payload: PantryItemCreateIn) -> PantryAdd:
+    return PantryAdd(
+        ingredient_name=payload.ingredient_name,
+        quantity=payload.quantity,
+        unit=payload.unit,
+        expiry_date=payload.expiry_date,
+        category_hint=payload.category_hint,
+    )
+
+
+async def _upsert_or_409(user, adds: list[PantryAdd]) -> PantryUpsertResult:
+    try:
+        return await upsert_pantry_items(user, adds)
+    except IntegrityError:
+        # A concurrent request created an available item for one of these ingredients;
+        # nothing was written, so the client can simply retry.
+        raise HttpError(409, "Pantry was modified concurrently, please retry")
+
+
 @router.post("/", response={201: PantryItemCreateOut, 200: PantryItemCreateOut})
 async def add_pantry_item(request, payload: PantryItemCreateIn):
     """Manually add an item to the pantry.
 
     If the user already has an 'available' pantry item for the same ingredient,
     quantities are added together (upsert) and returns 200.
-    New items return 201.
+    New items return 201. One INSERT ... ON CONFLICT statement (services.upsert_pantry_item).
     """
     user = request.auth
     logger.info("[add_pantry_item] user=%s ingredient=%s", user.id, payload.ingredient_name)
 
-    ingredient = await get_or_create_ingredient(payload.ingredient_name, payload.category_hint, payload.unit)
-
-    # Decision: Same upsert pattern as confirm_receipt to respect the unique constraint
-    # on (user, ingredient) where status=available.
-    try:
-        existing = await PantryItem.objects.select_related("ingredient__category").aget(
-            user=user,
-            ingredient=ingredient,
-            status=PantryItem.Status.AVAILABLE,
-        )
-        if payload.quantity and existing.quantity:
-            existing.quantity += payload.quantity
-        elif payload.quantity:
-            existing.quantity = payload.quantity
-        if payload.unit:
-            existing.unit = payload.unit
-        if payload.expiry_date:
-            existing.expiry_date = payload.expiry_date
-        await existing.asave()
-        # Re-fetch with relations for response (arefresh_from_db doesn't load select_related)
-        existing = await PantryItem.objects.select_related("ingredient__category").aget(id=existing.id)
-        logger.info("[add_pantry_item] upserted item=%s for user=%s", existing.id, user.id)
-        return 200, {"item": await _build_pantry_item_response(existing), "created": False}
-    except PantryItem.DoesNotExist:
-        pass
-
-    expiry = payload.expiry_date or await calculate_expiry_date(ingredient)
-    unit = payload.unit or ingredient.common_unit
-
-    item = await PantryItem.objects.acreate(
-        user=user,
-        ingredient=ingredient,
-        quantity=payload.quantity,
-        unit=unit,
-        expiry_date=expiry,
-        source=PantryItem.Source.MANUAL,
-    )
-    # Load relations for response
-    item = await PantryItem.objects.select_related("ingredient__category").aget(id=item.id)
-    logger.info("[add_pantry_item] created item=%s for user=%s", item.id, user.id)
-    return 201, {"item": await _build_pantry_item_response(item), "created": True}
+    item, created = await upsert_pantry_item(user, _pantry_add(payload))
+    [response] = await build_pantry_item_responses([item])
+    if created:
+        logger.info("[add_pantry_item] created item=%s for user=%s", item.id, user.id)
+        return 201, {"item": response, "created": True}
+    logger.info("[add_pantry_item] upserted item=%s for user=%s", item.id, user.id)
+    return 200, {"item": response, "created": False}
 
 
 # ---------------------------------------------------------------------------
@@ -296,10 +373,11 @@ async def update_pantry_item(request, item_id: str, payload: PantryItemUpdateIn)
     category_hint updates the ingredient's category (creates category if needed).
     """
     try:
-        item = await PantryItem.objects.select_related("ingredient__category").aget(id=item_id, user=request.auth)
+        item = await PantryItem.objects.select_related("ingredient").aget(id=item_id, user=request.auth)
     except PantryItem.DoesNotExist:
         raise HttpError(404, "Pantry item not found")
 
+    old_status = item.status
     if payload.status is not None:
         valid_statuses = {s.value for s in PantryItem.Status}
         if payload.status not in valid_statuses:
@@ -315,10 +393,12 @@ async def update_pantry_item(request, item_id: str, payload: PantryItemUpdateIn)
         await update_ingredient_category(item.ingredient, payload.category_hint)
 
     await item.asave()
-    # Re-fetch to get updated ingredient category relation
-    item = await PantryItem.objects.select_related("ingredient__category").aget(id=item.id)
+    await abump_pantry_versions([request.auth.id])
+    await record_pantry_change(request.auth.id, [(item.ingredient.category_id, old_status, item.status)])
     logger.info("[update_pantry_item] item=%s updated", item.id)
-    return await _build_pantry_item_response(item)
+    # update_ingredient_category updated item.ingredient in place, so no re-fetch is needed
+    [response] = await build_pantry_item_responses([item])
+    return response
 
 
 @router.delete("/{item_id}", response={204: None, 404: ErrorOut})
@@ -327,13 +407,10 @@ async def delete_pantry_item(request, item_id: str):
 
     Returns 404 if the item doesn't exist or belongs to another user.
     """
-    try:
-        item = await PantryItem.objects.aget(id=item_id, user=request.auth)
-    except PantryItem.DoesNotExist:
+    if not await delete_pantry_items(request.auth, [item_id]):
         raise HttpError(404, "Pantry item not found")
 
-    logger.info("[delete_pantry_item] item=%s user=%s", item.id, request.auth.id)
-    await item.adelete()
+    logger.info("[delete_pantry_item] item=%s user=%s", item_id, request.auth.id)
     return 204, None
 
 
@@ -343,34 +420,11 @@ async def use_pantry_item(request, item_id: str, payload: PantryItemUseIn | None
 
     If no quantity is provided, or the item has no tracked quantity, marks as used_up.
     If quantity is provided, decrements and keeps available if remainder > 0.
-    Rejects use of non-available items with 400.
+    Rejects use of non-available items or more than the remaining quantity with 400.
+    One conditional UPDATE ... RETURNING (services.consume_pantry_item).
     """
-    try:
-        item = await PantryItem.objects.select_related("ingredient__category").aget(id=item_id, user=request.auth)
-    except PantryItem.DoesNotExist:
-        raise HttpError(404, "Pantry item not found")
-
-    if item.status != PantryItem.Status.AVAILABLE:
-        raise HttpError(400, f"Cannot use item with status '{item.status}'")
-
     use_quantity = payload.quantity if payload else None
-
-    if use_quantity is None or item.quantity is None:
-        # Use all — mark as used_up
-        item.status = PantryItem.Status.USED_UP
-        if item.quantity is not None:
-            item.quantity = Decimal("0")
-        logger.info("[use_pantry_item] item=%s fully used", item.id)
-    else:
-        if use_quantity > item.quantity:
-            raise HttpError(400, "Cannot use more than available quantity")
-        item.quantity -= use_quantity
-        if item.quantity <= 0:
-            item.status = PantryItem.Status.USED_UP
-            item.quantity = Decimal("0")
-            logger.info("[use_pantry_item] item=%s fully used (exact quantity)", item.id)
-        else:
-            logger.info("[use_pantry_item] item=%s partially used, remaining=%s", item.id, item.quantity)
-
-    await item.asave()
-    return await _build_pantry_item_response(item)
+    item = await consume_pantry_item(request.auth, item_id, use_quantity)
+    logger.info("[use_pantry_item] item=%s status=%s remaining=%s", item.id, item.status, item.quantity)
+    [response] = await build_pantry_item_responses([item])
+    return response
@@ -0,0 +1,127 @@
+import logging
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from ninja.errors import HttpError
+
+from apps.core.pagination import Keyset, decode_cursor, encode_cursor
+from apps.pantry.models import PantryItem, PantryItemTombstone
+
+logger = logging.getLogger(__name__)
+
+ITEM_KEYSET = Keyset("updated_at", "id")
+TOMBSTONE_KEYSET = Keyset("created_at", "id")
+# Position for "before any row" at a given time (ids are UUIDs, so this sorts first)
+NIL_ID = uuid.UUID(int=0)
+
+
+@dataclass
+class PantryChanges:
+    items: list[PantryItem] = field(default_factory=list)
+    deleted_ids: list[uuid.UUID] = field(default_factory=list)
+    cursor: str = ""
+    has_more: bool = False
+
+
+def _parse_cursor(cursor: str) -> tuple[datetime, uuid.UUID, datetime, datetime | None]:
+    changed_at, last_id, floor, rescan = decode_cursor(cursor, 4)
+    try:
+        changed_at, last_id, floor = (
+            datetime.fromisoformat(changed_at),
+            uuid.UUID(last_id),
+            datetime.fromisoformat(floor),
+        )
+        rescan = datetime.fromisoformat(rescan) if rescan is not None else None
+    except (TypeError, ValueError):
+        raise HttpError(400, "Invalid cursor")
+    if any(timezone.is_naive(value) for value in (changed_at, floor, rescan) if value is not None):
+        raise HttpError(400, "Invalid cursor")
+    return changed_at, last_id, floor, rescan
+
+
+async def pantry_changes(user, cursor: str | None, limit: int) -> PantryChanges:
+    """Items created/updated and ids deleted after `cursor`, oldest change first, at most `limit`.
+
+    Without a cursor this is a full sync: every item, no deletions. The
+    returned cursor is opaque; pass it back while has_more is true, then keep
+    it for the next sync. Changes from the last PANTRY_CHANGES_OVERLAP seconds
+    may be sent again on the next sync; clients apply them by id.
+
+    Decision: The change log is the data itself — items are read by keyset on
+    (updated_at, id) over pantry_user_updated_idx and deletions from
+    PantryItemTombstone on (created_at, id), the two streams merged in Python —
+    so a sync costs two indexed range reads proportional to what changed, not
+    to pantry size. The cursor is (position, floor, rescan): floor is when the
+    client's copy was last complete, which only moves forward. Tombstones
+    before floor are skipped (a full sync never sees deletions from before it
+    started), and once floor is older than PANTRY_TOMBSTONE_RETENTION_DAYS the
+    deletions it needs may be pruned, so the client gets 410 and must
+    full-sync. Positions are app-clock write timestamps, not commit order: a
+    row stamped before a read can commit after it (a write's now() is taken
+    before its transaction, the sweeper commits in batches, workers' clocks
+    drift). Anything stamped within PANTRY_CHANGES_OVERLAP of a read is
+    therefore unsettled: when a pass reads that far, rescan remembers where
+    that began, and the cursor returned once the client is caught up points
+    back there, so the next sync reads the window again. Paging itself always
+    moves forward, so a busy window can't stall it.
+    """
+    now = timezone.now()
+    # Rows stamped after this may belong to writes that had not committed yet when this read ran
+    settled = now - timedelta(seconds=settings.PANTRY_CHANGES_OVERLAP)
+    items = ITEM_KEYSET.order_by(PantryItem.objects.filter(user=user).select_related("ingredient"))
+    if cursor:
+        changed_at, last_id, floor, rescan = _parse_cursor(cursor)
+        if floor < now - timedelta(days=settings.PANTRY_TOMBSTONE_RETENTION_DAYS):
+            raise HttpError(410, "Sync cursor expired, start a full sync")
+        position = [changed_at, last_id]
+        items = items.filter(ITEM_KEYSET.after(PantryItem, position))
+        tombstones = TOMBSTONE_KEYSET.order_by(
+            PantryItemTombstone.objects.filter(TOMBSTONE_KEYSET.after(PantryItemTombstone, position))
+        )
+        tombstones = [t async for t in tombstones.filter(user=user, created_at__gte=floor)[: limit + 1]]
+    else:
+        position, floor, rescan, tombstones = [settled, NIL_ID], settled, None, []
+
+    changes = sorted(
+        [(item.updated_at, item.id, item) async for item in items[: limit + 1]]
+        + [(tombstone.created_at, tombstone.id, tombstone) for tombstone in tombstones],
+        key=lambda change: change[:2],
+    )
+    result = PantryChanges(has_more=len(changes) > limit)
+    changes = changes[:limit]
+    for _, _, obj in changes:
+        if isinstance(obj, PantryItemTombstone):
+            result.deleted_ids.append(obj.id)
+        else:
+            result.items.append(obj)
+
+    if changes:
+        position = list(changes[-1][:2])
+    if position[0] > settled:
+        rescan = min(rescan or settled, settled)
+    # The client's copy is complete up to its position, but only as far as this read could see
+    complete = min(rescan or settled, settled)
+    floor = max(floor, min(position[0], complete))
+    if not result.has_more:
+        # Caught up: reread the unsettled window next time; an idle client's floor keeps moving, so it never expires
+        if rescan and rescan < position[0]:
+            position = [rescan, NIL_ID]
+        floor, rescan = max(floor, complete), None
+    result.cursor = encode_cursor([*position, floor, rescan])
+    return result
+
+
+def prune_pantry_tombstones(retention_days: int | None = None) -> int:
+    """Delete tombstones older than the retention window. Returns the number deleted.
+
+    Clients whose cursor is older than the window get 410 from /pantry/changes
+    and full-sync, so nothing they need is lost.
+    """
+    retention_days = settings.PANTRY_TOMBSTONE_RETENTION_DAYS if retention_days is None else retention_days
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    deleted, _ = PantryItemTombstone.objects.filter(created_at__lt=cutoff).delete()
+    logger.info("[prune_pantry_tombstones] deleted=%d older than %s", deleted, cutoff)
+    return deleted
@@ -0,0 +1,184 @@
+import logging
+from collections import Counter, defaultdict
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from apps.pantry.models import PantryCategoryCounter, PantryItem
+from apps.users.models import User
+
+logger = logging.getLogger(__name__)
+
+# PantryItem.status → PantryCategoryCounter column
+STATUS_COLUMNS = {
+    PantryItem.Status.AVAILABLE: "available",
+    PantryItem.Status.EXPIRED: "expired",
+    PantryItem.Status.USED_UP: "used_up",
+}
+
+# One pantry item's transition: (category_id, old_status, new_status).
+# old_status is None for a new item, new_status is None for a deleted one.
+PantryChange = tuple[int | None, str | None, str | None]
+
+
+def _net_changes(changes: Iterable[PantryChange]) -> dict:
+    """Net item transitions into {category_id: {column: n}}, dropping categories that net to zero."""
+    deltas: dict = defaultdict(Counter)
+    for category_id, old_status, new_status in changes:
+        if old_status == new_status:
+            continue
+        if old_status is not None:
+            deltas[category_id][STATUS_COLUMNS[old_status]] -= 1
+        if new_status is not None:
+            deltas[category_id][STATUS_COLUMNS[new_status]] += 1
+    netted = {category_id: {column: n for column, n in delta.items() if n} for category_id, delta in deltas.items()}
+    return {category_id: delta for category_id, delta in netted.items() if delta}
+
+
+async def record_pantry_change(user_id, changes: Iterable[PantryChange]) -> None:
+    """Apply a batch of item status transitions to the user's category counters.
+
+    Decision: Transitions are netted per category first, then each touched
+    category gets one UPDATE with F() increments (same pattern as
+    recipes.services.stats.record_cooking), so a bulk write costs one query per
+    category touched rather than per item, and concurrent writers never lose
+    counts. The row is created on a category's first item.
+    """
+    now = timezone.now()
+    for category_id, delta in _net_changes(changes).items():
+        updates = {column: F(column) + n for column, n in delta.items()}
+        updates["updated_at"] = now
+        counter = PantryCategoryCounter.objects.filter(user_id=user_id, category_id=category_id)
+        if await counter.aupdate(**updates):
+            continue
+        _, created = await PantryCategoryCounter.objects.aget_or_create(
+            user_id=user_id, category_id=category_id, defaults=delta
+        )
+        if not created:
+            # Lost a race with a concurrent first item in this category
+            await counter.aupdate(**updates)
+
+
+def apply_pantry_change(user_id, changes: Iterable[PantryChange]) -> None:
+    """Sync counterpart of record_pantry_change, for calling inside the transaction that makes the change."""
+    now = timezone.now()
+    for category_id, delta in _net_changes(changes).items():
+        updates = {column: F(column) + n for column, n in delta.items()}
+        updates["updated_at"] = now
+        counter = PantryCategoryCounter.objects.filter(user_id=user_id, category_id=category_id)
+        if counter.update(**updates):
+            continue
+        _, created = PantryCategoryCounter.objects.get_or_create(
+            user_id=user_id, category_id=category_id, defaults=delta
+        )
+        if not created:
+            # Lost a race with a concurrent first item in this category
+            counter.update(**updates)
+
+
+@dataclass
+class ReconcileResult:
+    users: int = 0
+    rows: int = 0
+
+
+def _count_rows(user_ids) -> list[PantryCategoryCounter]:
+    return [
+        PantryCategoryCounter(
+            user_id=row["user_id"],
+            category_id=row["ingredient__category_id"],
+            **{column: row[column] for column in STATUS_COLUMNS.values()},
+        )
+        for row in PantryItem.objects.filter(user_id__in=user_ids)
+        .order_by()
+        .values("user_id", "ingredient__category_id")
+        .annotate(**{column: Count("id", filter=Q(status=status)) for status, column in STATUS_COLUMNS.items()})
+    ]
+
+
+def reconcile_pantry_counters(chunk_size: int = 500, user_ids: list | None = None) -> ReconcileResult:
+    """Rebuild PantryCategoryCounter rows from PantryItem, chunk_size users at a time.
+
+    Pass user_ids to reconcile only those users; otherwise every user is
+    walked by keyset on id. Each chunk is recounted and swapped inside its own
+    transaction, like rebuild_cooking_stats.
+    """
+    result = ReconcileResult()
+    last_user_id = None
+    remaining = sorted(user_ids) if user_ids is not None else None
+
+    while True:
+        if remaining is not None:
+            chunk, remaining = remaining[:chunk_size], remaining[chunk_size:]
+        else:
+            users = User.objects.order_by("id")
+            if last_user_id is not None:
+                users = users.filter(id__gt=last_user_id)
+            chunk = list(users.values_list("id", flat=True)[:chunk_size])
+        if not chunk:
+            break
+        last_user_id = chunk[-1]
+
+        with transaction.atomic():
+            rows = _count_rows(chunk)
+            PantryCategoryCounter.objects.filter(user_id__in=chunk).delete()
+            PantryCategoryCounter.objects.bulk_create(rows)
+
+        result.users += len(chunk)
+        result.rows += len(rows)
+        logger.info("[reconcile_pantry_counters] chunk of %d users done (through %s)", len(chunk), last_user_id)
+
+    logger.info("[reconcile_pantry_counters] users=%d rows=%d", result.users, result.rows)
+    return result
+
+
+def move_counters(moves: dict[tuple, int], old_status: str, new_status: str) -> int:
+    """Move counts between two status columns for many (user_id, category_id) pairs in one UPDATE.
+
+    Sync counterpart of record_pantry_change for batch jobs that transition
+    items across many users at once (e.g. the expiry sweeper). Assumes the
+    counter rows exist, which holds for any category with items in old_status;
+    a missing row is left to reconciliation. Returns the number of rows updated.
+    """
+    if not moves:
+        return 0
+    old_column, new_column = STATUS_COLUMNS[old_status], STATUS_COLUMNS[new_status]
+    whens = [
+        When(user_id=user_id, category_id=category_id, then=Value(n)) for (user_id, category_id), n in moves.items()
+    ]
+    match = Q()
+    for user_id, category_id in moves:
+        match |= Q(user_id=user_id, category_id=category_id)
+    moved = Case(*whens, default=Value(0), output_field=IntegerField())
+    return PantryCategoryCounter.objects.filter(match).update(
+        **{old_column: F(old_column) - moved, new_column: F(new_column) + moved, "updated_at": timezone.now()}
+    )
+
+
+def move_category_counters(counts: dict, old_category_id: int | None, new_category_id: int | None) -> None:
+    """Move item counts from one category's counter rows to another's, for many users at once.
+
+    counts maps user_id → {column: n} for the items changing category (all
+    items of an ingredient that was recategorised). Creates the new
+    category's rows where missing, then costs one UPDATE per side however
+    many users hold the items. Call inside the transaction that moves them.
+    """
+    if not counts:
+        return
+    PantryCategoryCounter.objects.bulk_create(
+        [PantryCategoryCounter(user_id=user_id, category_id=new_category_id) for user_id in counts],
+        ignore_conflicts=True,
+    )
+    now = timezone.now()
+    for category_id, sign in ((old_category_id, -1), (new_category_id, 1)):
+        updates = {}
+        for column in STATUS_COLUMNS.values():
+            whens = [When(user_id=user_id, then=Value(sign * n[column])) for user_id, n in counts.items() if n[column]]
+            if whens:
+                updates[column] = F(column) + Case(*whens, default=Value(0), output_field=IntegerField())
+        PantryCategoryCounter.objects.filter(user_id__in=list(counts), category_id=category_id).update(
+            **updates, updated_at=now
+        )
@@ -0,0 +1,106 @@
+import logging
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from apps.pantry.counters import move_counters
+from apps.pantry.models import PantryItem
+from apps.pantry.versioning import bump_pantry_versions
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SweepResult:
+    batches: int = 0
+    expired: int = 0
+
+
+def sweep_expired_items(batch_size: int = 1000, today: date | None = None) -> SweepResult:
+    """Mark available items whose expiry_date has passed as expired, batch_size rows at a time.
+
+    Decision: Walks pantry_status_expiry_idx by keyset on (expiry_date, id)
+    rather than one UPDATE over every overdue row, so each transaction locks
+    at most batch_size rows and the job's memory stays flat however large the
+    table is. Rows are read FOR UPDATE SKIP LOCKED (a no-op on SQLite), so a
+    row a user is editing right now is skipped until the next sweep instead of
+    blocking it, and the counters and pantry versions move in the same
+    transaction.
+    """
+    today = today or timezone.localdate()
+    result = SweepResult()
+    cursor = None
+
+    while True:
+        overdue = PantryItem.objects.filter(status=PantryItem.Status.AVAILABLE, expiry_date__lt=today)
+        if cursor is not None:
+            last_expiry, last_id = cursor
+            overdue = overdue.filter(expiry_date__gte=last_expiry).exclude(expiry_date=last_expiry, id__lte=last_id)
+
+        with transaction.atomic():
+            batch = list(
+                overdue.select_for_update(skip_locked=True, of=("self",))
+                .order_by("expiry_date", "id")
+                .values_list("id", "expiry_date", "user_id", "ingredient__category_id")[:batch_size]
+            )
+            if not batch:
+                break
+            PantryItem.objects.filter(id__in=[row[0] for row in batch]).update(
+                status=PantryItem.Status.EXPIRED, updated_at=timezone.now()
+            )
+            move_counters(
+                Counter((user_id, category_id) for _, _, user_id, category_id in batch),
+                PantryItem.Status.AVAILABLE,
+                PantryItem.Status.EXPIRED,
+            )
+            bump_pantry_versions({user_id for _, _, user_id, _ in batch})
+
+        last_id, last_expiry = batch[-1][:2]
+        cursor = (last_expiry, last_id)
+        result.batches += 1
+        result.expired += len(batch)
+        logger.info(
+            "[sweep_expired_items] batch %d: expired %d items (through %s)", result.batches, len(batch), cursor[0]
+        )
+
+    logger.info("[sweep_expired_items] done: batches=%d expired=%d", result.batches, result.expired)
+    return result
+
+
+_sweeper: threading.Thread | None = None
+
+
+def start_expiry_sweeper(interval: int | None = None) -> threading.Thread | None:
+    """Run sweep_expired_items every `interval` seconds on a daemon thread in this process.
+
+    Optional alternative to scheduling the expire_pantry_items command with
+    cron: enabled by PANTRY_EXPIRY_SWEEP_INTERVAL > 0 and started once per
+    process from config/asgi.py. Every worker runs its own loop; that is safe
+    because concurrent sweeps skip each other's locked rows. Errors are logged
+    and the loop carries on.
+    """
+    global _sweeper
+    interval = settings.PANTRY_EXPIRY_SWEEP_INTERVAL if interval is None else interval
+    if interval <= 0 or _sweeper is not None:
+        return _sweeper
+
+    def run():
+        while True:
+            try:
+                sweep_expired_items(batch_size=settings.PANTRY_EXPIRY_SWEEP_BATCH_SIZE)
+            except Exception:
+                logger.exception("[start_expiry_sweeper] sweep failed")
+            finally:
+                close_old_connections()
+            time.sleep(interval)
+
+    _sweeper = threading.Thread(target=run, name="pantry-expiry-sweeper", daemon=True)
+    _sweeper.start()
+    logger.info("[start_expiry_sweeper] sweeping every %ds", interval)
+    return _sweeper
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.pantry.expiry import sweep_expired_items
+
+
+class Command(BaseCommand):
+    help = "Mark available pantry items past their expiry date as expired"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.PANTRY_EXPIRY_SWEEP_BATCH_SIZE,
+            help=f"Items expired per transaction (default: {settings.PANTRY_EXPIRY_SWEEP_BATCH_SIZE})",
+        )
+
+    def handle(self, *args, **options):
+        result = sweep_expired_items(batch_size=max(1, options["batch_size"]))
+        self.stdout.write(self.style.SUCCESS(f"Expired {result.expired} pantry items in {result.batches} batches"))
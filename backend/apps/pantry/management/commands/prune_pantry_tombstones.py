@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.pantry.changes import prune_pantry_tombstones
+
+
+class Command(BaseCommand):
+    help = "Delete pantry deletion tombstones older than the /pantry/changes retention window"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.PANTRY_TOMBSTONE_RETENTION_DAYS,
+            help=f"Keep tombstones this many days (default: {settings.PANTRY_TOMBSTONE_RETENTION_DAYS})",
+        )
+
+    def handle(self, *args, **options):
+        deleted = prune_pantry_tombstones(retention_days=max(0, options["days"]))
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} pantry tombstones"))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from apps.pantry.counters import reconcile_pantry_counters
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-category pantry summary counters from pantry items"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Users reconciled per transaction (default: 500)",
+        )
+
+    def handle(self, *args, **options):
+        result = reconcile_pantry_counters(chunk_size=max(1, options["chunk_size"]))
+        self.stdout.write(
+            self.style.SUCCESS(f"Reconciled pantry counters for {result.users} users ({result.rows} category rows)")
+        )
@@ -0,0 +1,102 @@
+# Generated by Django 6.0.2 on 2026-10-19 10:00
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+# New public tables get the same deny-all RLS as core.0001_enable_rls_deny_all
+RLS_TABLES = ["pantry_category_counters"]
+
+
+def enable_rls(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for table in RLS_TABLES:
+        schema_editor.execute(f"ALTER TABLE public.{table} ENABLE ROW LEVEL SECURITY;")
+
+
+def backfill_counters(apps, schema_editor):
+    """Seed the counters from existing pantry items (same aggregation as reconcile_pantry_counters)."""
+    PantryItem = apps.get_model("pantry", "PantryItem")
+    PantryCategoryCounter = apps.get_model("pantry", "PantryCategoryCounter")
+    rows = (
+        PantryItem.objects.order_by()
+        .values("user_id", "ingredient__category_id")
+        .annotate(
+            available=Count("id", filter=Q(status="available")),
+            expired=Count("id", filter=Q(status="expired")),
+            used_up=Count("id", filter=Q(status="used_up")),
+        )
+    )
+    PantryCategoryCounter.objects.bulk_create(
+        [
+            PantryCategoryCounter(
+                user_id=row["user_id"],
+                category_id=row["ingredient__category_id"],
+                available=row["available"],
+                expired=row["expired"],
+                used_up=row["used_up"],
+            )
+            for row in rows.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("ingredients", "0001_initial"),
+        ("pantry", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PantryCategoryCounter",
+            fields=[
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("available", models.IntegerField(default=0)),
+                ("expired", models.IntegerField(default=0)),
+                ("used_up", models.IntegerField(default=0)),
+                (
+                    "category",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="pantry_counters",
+                        to="ingredients.ingredientcategory",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="pantry_counters",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "pantry_category_counters",
+                "constraints": [
+                    models.UniqueConstraint(
+                        condition=models.Q(("category__isnull", False)),
+                        fields=("user", "category"),
+                        name="unique_pantry_category_counter",
+                    ),
+                    models.UniqueConstraint(
+                        condition=models.Q(("category__isnull", True)),
+                        fields=("user",),
+                        name="unique_pantry_uncategorized_counter",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+        migrations.RunPython(enable_rls, migrations.RunPython.noop),
+    ]
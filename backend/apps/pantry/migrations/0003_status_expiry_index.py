@@ -0,0 +1,20 @@
+# Generated by Django 6.0.2 on 2026-10-19 11:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("ingredients", "0001_initial"),
+        ("pantry", "0002_category_counters"),
+        ("receipts", "0003_cursor_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="pantryitem",
+            index=models.Index(fields=["status", "expiry_date"], name="pantry_status_expiry_idx"),
+        ),
+    ]
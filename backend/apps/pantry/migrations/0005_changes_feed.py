@@ -0,0 +1,52 @@
+# Generated by Django 6.0.2 on 2026-10-19 13:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# New public tables get the same deny-all RLS as core.0001_enable_rls_deny_all
+RLS_TABLES = ["pantry_item_tombstones"]
+
+
+def enable_rls(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for table in RLS_TABLES:
+        schema_editor.execute(f"ALTER TABLE public.{table} ENABLE ROW LEVEL SECURITY;")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("pantry", "0004_hot_path_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PantryItemTombstone",
+            fields=[
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("id", models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="pantry_tombstones",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "pantry_item_tombstones",
+                "indexes": [
+                    models.Index(fields=["user", "created_at", "id"], name="pantry_tombstone_user_idx"),
+                ],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="pantryitem",
+            index=models.Index(fields=["user", "updated_at", "id"], name="pantry_user_updated_idx"),
+        ),
+        migrations.RunPython(enable_rls, migrations.RunPython.noop),
+    ]
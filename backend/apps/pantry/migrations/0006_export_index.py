@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-19 15:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("pantry", "0005_changes_feed"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="pantryitem",
+            index=models.Index(fields=["user", "created_at", "id"], name="pantry_user_created_idx"),
+        ),
+    ]
@@ -56,7 +56,94 @@ class PantryItem(AbstractUUIDTimestampModel):
                 name="unique_available_pantry_item",
             ),
         ]
+        indexes = [
+            # Expiry sweeper keyset scan: status = available AND expiry_date < today, by (expiry_date, id)
+            models.Index(fields=["status", "expiry_date"], name="pantry_status_expiry_idx"),
+            # /pantry/expiring, ?expiring_within=, the summary's expiring-soon count and suggest's pantry read
+            models.Index(fields=["user", "status", "expiry_date"], name="pantry_user_status_expiry_idx"),
+            # Upsert/merge lookups and deduction by (user, ingredient) regardless of status
+            models.Index(fields=["user", "ingredient"], name="pantry_user_ingredient_idx"),
+            # /pantry/changes keyset scan: user's items by (updated_at, id)
+            models.Index(fields=["user", "updated_at", "id"], name="pantry_user_updated_idx"),
+            # /pantry/export keyset scan: user's items by (created_at, id), which never change
+            models.Index(fields=["user", "created_at", "id"], name="pantry_user_created_idx"),
+        ]
         ordering = ["expiry_date"]
 
     def __str__(self):
         return f"{self.ingredient} ({self.status})"
+
+
+class PantryCategoryCounter(AbstractUUIDTimestampModel):
+    """Per-user, per-category item counts by status, maintained by pantry writes.
+
+    Decision: /pantry/summary reads these O(categories) rows instead of a
+    GROUP BY over the user's whole pantry, whose used_up history grows forever.
+    Every write path reports its status transitions through
+    counters.record_pantry_change; reconcile_pantry_counters rebuilds the rows
+    from PantryItem if they drift (e.g. after admin edits or a failed write).
+    """
+
+    user = models.ForeignKey(
+        "users.User",
+        on_delete=models.CASCADE,
+        related_name="pantry_counters",
+    )
+    category = models.ForeignKey(
+        "ingredients.IngredientCategory",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="pantry_counters",
+    )
+    available = models.IntegerField(default=0)
+    expired = models.IntegerField(default=0)
+    used_up = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = "pantry_category_counters"
+        # NULL never conflicts in a plain unique constraint, so "Uncategorized" gets its own
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "category"],
+                condition=models.Q(category__isnull=False),
+                name="unique_pantry_category_counter",
+            ),
+            models.UniqueConstraint(
+                fields=["user"],
+                condition=models.Q(category__isnull=True),
+                name="unique_pantry_uncategorized_counter",
+            ),
+        ]
+
+    @property
+    def total(self) -> int:
+        return self.available + self.expired + self.used_up
+
+    def __str__(self):
+        return f"{self.user_id}/{self.category_id}: {self.total}"
+
+
+class PantryItemTombstone(AbstractUUIDTimestampModel):
+    """Record of a deleted pantry item, so /pantry/changes can report deletions.
+
+    id is the deleted item's id and created_at the deletion time. Written in
+    the same transaction as the delete (services.delete_pantry_items); pruned
+    after PANTRY_TOMBSTONE_RETENTION_DAYS by prune_pantry_tombstones.
+    """
+
+    id = models.UUIDField(primary_key=True, editable=False)
+    user = models.ForeignKey(
+        "users.User",
+        on_delete=models.CASCADE,
+        related_name="pantry_tombstones",
+    )
+
+    class Meta:
+        db_table = "pantry_item_tombstones"
+        indexes = [
+            models.Index(fields=["user", "created_at", "id"], name="pantry_tombstone_user_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}/{self.id} deleted {self.created_at}"
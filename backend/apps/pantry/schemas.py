@@ -59,7 +59,16 @@ class PantryItemUpdateIn(Schema):
 
 
 class PantryItemUseIn(Schema):
-    quantity: Decimal | None = Field(default=None, description="Quantity to consume; omit to use all")
+    quantity: Decimal | None = Field(default=None, gt=0, description="Quantity to consume; omit to use all")
+
+
+class PantryBulkUseItemIn(Schema):
+    id: uuid.UUID = Field(description="Pantry item ID")
+    quantity: Decimal | None = Field(default=None, gt=0, description="Quantity to consume; omit to use all")
+
+
+class PantryBulkUseIn(Schema):
+    items: list[PantryBulkUseItemIn] = Field(description="Items to consume; all are applied or none")
 
 
 class BulkDeleteIn(Schema):
@@ -70,6 +79,36 @@ class BulkDeleteOut(Schema):
     deleted_count: int = Field(description="Number of items actually deleted")
 
 
+class PantryBulkAddIn(Schema):
+    items: list[PantryItemCreateIn] = Field(description="Items to add; merged like POST /pantry/")
+
+
+class PantryBulkAddOut(Schema):
+    created_count: int = Field(description="Number of new pantry items created")
+    updated_count: int = Field(description="Number of existing pantry items merged into")
+    items: list[PantryItemOut] = Field(description="The resulting pantry items, one per distinct ingredient")
+
+
+class PantryChangesOut(Schema):
+    items: list[PantryItemOut] = Field(description="Items created or updated since the cursor, oldest change first")
+    deleted_ids: list[uuid.UUID] = Field(description="Ids of items deleted since the cursor")
+    cursor: str = Field(description="Pass as ?since= on the next call")
+    has_more: bool = Field(description="True if more changes are waiting; call again right away with the new cursor")
+
+
+class PantryImportErrorOut(Schema):
+    row: int = Field(description="1-based data row (CSV, excluding the header) or line (NDJSON)")
+    error: str
+
+
+class PantryImportOut(Schema):
+    rows: int = Field(description="Data rows read")
+    created_count: int = Field(description="New pantry items created")
+    updated_count: int = Field(description="Merges into existing available items")
+    error_count: int = Field(description="Rows skipped as invalid")
+    errors: list[PantryImportErrorOut] = Field(description="The first 100 row errors")
+
+
 class CategorySummaryOut(Schema):
     category_id: int | None = None
     category_name: str
@@ -1,16 +1,47 @@
 import logging
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
 from datetime import date, timedelta
+from decimal import Decimal
 
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Case, Count, DecimalField, F, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.query import RawQuerySet
+from django.utils import timezone
+from ninja.errors import HttpError
+
+from apps.ingredients.autocomplete import ingredient_autocomplete
+from apps.ingredients.cache import get_categories, ingredient_lru
 from apps.ingredients.models import Ingredient, IngredientCategory
+from apps.pantry.counters import (
+    STATUS_COLUMNS,
+    apply_pantry_change,
+    move_category_counters,
+    move_counters,
+    record_pantry_change,
+)
+from apps.pantry.models import PantryItem, PantryItemTombstone
+from apps.pantry.versioning import bump_pantry_versions
 
 logger = logging.getLogger(__name__)
 
+# PantryItem.quantity decimal_places
+QUANTITY_PLACES = Decimal("0.01")
+
 
 async def get_or_create_category(name: str) -> IngredientCategory:
     """Get or create an ingredient category by name.
 
+    Existing categories come from the in-process category cache (no query).
     New categories get a default shelf life of 7 days.
     """
+    category = (await get_categories(names=[name])).by_name.get(name)
+    if category is not None:
+        return category
+
     category, created = await IngredientCategory.objects.aget_or_create(
         name=name,
         defaults={"default_shelf_life": 7},
@@ -20,46 +51,602 @@ async def get_or_create_category(name: str) -> IngredientCategory:
     return category
 
 
+@transaction.atomic
+def _move_ingredient_category(ingredient: Ingredient, category: IngredientCategory) -> None:
+    old_category_id = ingredient.category_id
+    ingredient.category = category
+    ingredient.save()
+    items = PantryItem.objects.filter(ingredient=ingredient)
+    counts: dict = {}
+    for user_id, status, n in items.order_by().values_list("user_id", "status").annotate(n=Count("id")):
+        counts.setdefault(user_id, Counter())[STATUS_COLUMNS[status]] = n
+    items.update(updated_at=timezone.now())
+    move_category_counters(counts, old_category_id, category.id)
+    bump_pantry_versions(counts)
+
+
 async def update_ingredient_category(ingredient: Ingredient, category_hint: str) -> None:
-    """Update an ingredient's category. Creates the category if it doesn't exist."""
+    """Update an ingredient's category. Creates the category if it doesn't exist.
+
+    Ingredients are shared, so every user holding this ingredient has items
+    move between summary categories: that ingredient's per-status counts move
+    from the old category's counters to the new one's, and the items'
+    updated_at is bumped so /pantry/changes resends them with the new
+    category. All in one transaction and a fixed number of queries however
+    many users hold it; full recounts are left to reconcile_pantry_counters.
+    """
     category = await get_or_create_category(category_hint)
     if ingredient.category_id != category.id:
-        ingredient.category = category
-        await ingredient.asave()
+        await sync_to_async(_move_ingredient_category)(ingredient, category)
         logger.info("[update_ingredient_category] ingredient=%s category=%s", ingredient.name, category_hint)
 
 
-async def get_or_create_ingredient(name: str, category_hint: str | None, unit: str | None) -> Ingredient:
-    """Normalize ingredient name and get or create the Ingredient record.
+@dataclass(frozen=True)
+class IngredientSpec:
+    """A raw ingredient name plus the hints used if it has to be created."""
+
+    name: str
+    category_hint: str | None = None
+    unit: str | None = None
+
+
+def normalize_ingredient_name(name: str) -> str:
+    return name.lower().strip()
+
+
+async def resolve_ingredients(specs: list[IngredientSpec]) -> dict[str, Ingredient]:
+    """Resolve raw ingredient names to Ingredient rows, creating the missing ones.
 
-    If a category_hint is provided, try to match it to an existing IngredientCategory.
+    Returns a dict keyed by normalized name. Names are normalized once; known
+    ones come from the per-worker LRU, the rest from one SELECT, and anything
+    still missing is created with one bulk_create(ignore_conflicts=True) and
+    re-selected — so a whole receipt costs at most three queries, and a
+    concurrent creator of the same name is absorbed rather than raising.
+    New ingredients get category_hint (looked up or created) and unit as
+    common_unit; existing ingredients are never modified.
     """
-    normalized = name.lower().strip()
-    defaults = {}
-    if unit:
-        defaults["common_unit"] = unit
+    wanted: dict[str, IngredientSpec] = {}
+    for spec in specs:
+        normalized = normalize_ingredient_name(spec.name)
+        if normalized not in wanted:
+            wanted[normalized] = spec
 
-    ingredient, created = await Ingredient.objects.aget_or_create(name=normalized, defaults=defaults)
+    resolved = ingredient_lru.get_many(wanted)
+    missing = [name for name in wanted if name not in resolved]
+    if missing:
+        async for ingredient in Ingredient.objects.filter(name__in=missing):
+            resolved[ingredient.name] = ingredient
 
-    # Assign category if hint provided and ingredient has no category yet
-    if created and category_hint:
-        category = await get_or_create_category(category_hint)
-        ingredient.category = category
-        await ingredient.asave()
+    to_create = [name for name in missing if name not in resolved]
+    if to_create:
+        new_ingredients = []
+        for name in to_create:
+            spec = wanted[name]
+            ingredient = Ingredient(name=name)
+            if spec.unit:
+                ingredient.common_unit = spec.unit
+            if spec.category_hint:
+                ingredient.category = await get_or_create_category(spec.category_hint)
+            new_ingredients.append(ingredient)
+        await Ingredient.objects.abulk_create(new_ingredients, ignore_conflicts=True)
+        async for ingredient in Ingredient.objects.filter(name__in=to_create):
+            resolved[ingredient.name] = ingredient
+            ingredient_autocomplete.add(ingredient)
+        logger.debug("[resolve_ingredients] created %d ingredients", len(to_create))
 
-    if created:
-        logger.debug("[get_or_create_ingredient] created ingredient=%s category=%s", normalized, category_hint)
+    ingredient_lru.put_many(resolved.values())
+    return resolved
 
-    return ingredient
+
+async def get_or_create_ingredient(name: str, category_hint: str | None, unit: str | None) -> Ingredient:
+    """Normalize ingredient name and get or create the Ingredient record.
+
+    If the ingredient is new and a category_hint is provided, it is assigned
+    that IngredientCategory (created if needed). Single-name form of
+    resolve_ingredients.
+    """
+    resolved = await resolve_ingredients([IngredientSpec(name, category_hint, unit)])
+    return resolved[normalize_ingredient_name(name)]
 
 
 async def calculate_expiry_date(ingredient: Ingredient) -> date | None:
-    """Calculate expiry date based on ingredient's category shelf life."""
+    """Calculate expiry date based on ingredient's category shelf life (from the category cache)."""
     if not ingredient.category_id:
         return None
 
-    try:
-        category = await IngredientCategory.objects.aget(id=ingredient.category_id)
-        return date.today() + timedelta(days=category.default_shelf_life)
-    except IngredientCategory.DoesNotExist:
+    category = (await get_categories(ids=[ingredient.category_id])).by_id.get(ingredient.category_id)
+    if category is None:
         return None
+    return date.today() + timedelta(days=category.default_shelf_life)
+
+
+def pantry_item_response(item: PantryItem, category: IngredientCategory | None) -> dict:
+    """Build the PantryItemOut dict for an item whose ingredient is already loaded.
+
+    quantity is quantized to the column's 2 decimal places so a just-saved
+    item serializes exactly like one read back from the database.
+    """
+    ingredient = item.ingredient
+    quantity = item.quantity
+    if quantity is not None:
+        quantity = Decimal(quantity).quantize(QUANTITY_PLACES)
+    return {
+        "id": item.id,
+        "ingredient": {
+            "id": ingredient.id,
+            "name": ingredient.name,
+            "category_name": category.name if category else None,
+            "category_icon": category.icon if category else None,
+        },
+        "quantity": quantity,
+        "unit": item.unit,
+        "added_date": item.added_date,
+        "expiry_date": item.expiry_date,
+        "source": item.source,
+        "status": item.status,
+        "created_at": item.created_at,
+        "updated_at": item.updated_at,
+    }
+
+
+async def build_pantry_item_responses(items: list[PantryItem]) -> list[dict]:
+    """Serialize pantry items (ingredient loaded, e.g. via select_related("ingredient")) for PantryItemOut.
+
+    Decision: Categories come from the in-process category cache rather than
+    the ingredient__category join — Django's async ORM does not populate nested
+    FK caches from select_related, and the cache makes decoration query-free.
+    """
+    categories = (await get_categories(ids={item.ingredient.category_id for item in items})).by_id
+    return [pantry_item_response(item, categories.get(item.ingredient.category_id)) for item in items]
+
+
+@dataclass
+class PantryAdd:
+    """One item to add to a user's pantry, merged with an available item for the same ingredient."""
+
+    ingredient_name: str
+    quantity: Decimal | None = None
+    unit: str | None = None
+    expiry_date: date | None = None
+    category_hint: str | None = None
+    # Unit for a newly created item when `unit` is not given, before the ingredient's common_unit
+    default_unit: str | None = None
+
+
+def _apply_pantry_insert(user, sql: str, params: list, candidate: PantryItem) -> PantryItem:
+    """Write phase of upsert_pantry_item: the INSERT ... ON CONFLICT, version bump and counters in one transaction."""
+    with transaction.atomic():
+        [item] = PantryItem.objects.raw(sql, params)
+        bump_pantry_versions([user.id])
+        if item.id == candidate.id:
+            apply_pantry_change(user.id, [(candidate.ingredient.category_id, None, item.status)])
+    return item
+
+
+async def upsert_pantry_item(user, add: PantryAdd) -> tuple[PantryItem, bool]:
+    """Add one item to the user's pantry in a single statement. Returns (item, created).
+
+    Same merge rules as upsert_pantry_items, applied by one
+    INSERT ... ON CONFLICT (user_id, ingredient_id) WHERE status = 'available'
+    DO UPDATE ... RETURNING, which infers the unique_available_pantry_item
+    partial index. The SQL is identical on Postgres and SQLite (3.35+).
+
+    Decision: One round-trip instead of SELECT + UPDATE/INSERT + re-fetch, and
+    no race — two concurrent adds for the same ingredient both land, the second
+    as an update. The row is created with a client-generated id, so "created"
+    is simply whether that id came back; the response is built from the
+    returned row. The user's pantry_version bump and, for a new item, the
+    counter change commit in the same transaction (_apply_pantry_insert).
+    """
+    ingredient = await get_or_create_ingredient(add.ingredient_name, add.category_hint, add.unit)
+    expiry = add.expiry_date or await calculate_expiry_date(ingredient)
+    candidate = PantryItem(
+        user=user,
+        ingredient=ingredient,
+        quantity=add.quantity,
+        unit=add.unit or add.default_unit or ingredient.common_unit,
+        expiry_date=expiry,
+    )
+
+    quote = connection.ops.quote_name
+    fields = PantryItem._meta.concrete_fields
+    table = quote(PantryItem._meta.db_table)
+    col = {f.name: quote(f.column) for f in fields}
+    params = [f.get_db_prep_save(f.pre_save(candidate, add=True), connection) for f in fields]
+
+    # Only what the caller supplied replaces the stored values
+    assignments = [f"{col['updated_at']} = EXCLUDED.{col['updated_at']}"]
+    if add.quantity:
+        assignments.append(f"{col['quantity']} = COALESCE({table}.{col['quantity']}, 0) + EXCLUDED.{col['quantity']}")
+    if add.unit:
+        assignments.append(f"{col['unit']} = EXCLUDED.{col['unit']}")
+    if add.expiry_date:
+        assignments.append(f"{col['expiry_date']} = EXCLUDED.{col['expiry_date']}")
+
+    columns = ", ".join(col.values())
+    # The predicate must be a literal for the planner to match it to the partial index
+    conflict = f"({col['user']}, {col['ingredient']}) WHERE {col['status']} = '{PantryItem.Status.AVAILABLE}'"
+    sql = (
+        f"INSERT INTO {table} ({columns}) VALUES ({', '.join(['%s'] * len(params))}) "
+        f"ON CONFLICT {conflict} DO UPDATE SET {', '.join(assignments)} "
+        f"RETURNING {columns}"
+    )
+    item = await sync_to_async(_apply_pantry_insert)(user, sql, params, candidate)
+    item.ingredient = ingredient
+    created = item.id == candidate.id
+    return item, created
+
+
+@dataclass
+class PantryUpsertResult:
+    items: list[PantryItem] = field(default_factory=list)
+    created_ids: set = field(default_factory=set)
+
+    @property
+    def created_count(self) -> int:
+        return len(self.created_ids)
+
+    @property
+    def updated_count(self) -> int:
+        return len(self.items) - len(self.created_ids)
+
+
+@dataclass
+class _Merged:
+    ingredient: Ingredient
+    quantity: Decimal | None = None
+    unit: str | None = None
+    expiry_date: date | None = None
+    default_unit: str | None = None
+
+
+def _apply_pantry_upsert(user, merged: dict, existing: dict, source: str, receipt_scan) -> list:
+    """Write phase of upsert_pantry_items: one UPDATE and one INSERT inside a transaction."""
+    decimal = DecimalField(max_digits=10, decimal_places=2)
+    with transaction.atomic():
+        if existing:
+            zero = Value(Decimal("0"), output_field=decimal)
+            quantity_whens = [
+                When(
+                    id=item.id,
+                    then=Coalesce(F("quantity"), zero) + Value(merged[ing_id].quantity, output_field=decimal),
+                )
+                for ing_id, item in existing.items()
+                if merged[ing_id].quantity
+            ]
+            unit_whens = [
+                When(id=item.id, then=Value(merged[ing_id].unit))
+                for ing_id, item in existing.items()
+                if merged[ing_id].unit
+            ]
+            expiry_whens = [
+                When(id=item.id, then=Value(merged[ing_id].expiry_date))
+                for ing_id, item in existing.items()
+                if merged[ing_id].expiry_date
+            ]
+            updates = {"updated_at": timezone.now()}
+            if quantity_whens:
+                updates["quantity"] = Case(*quantity_whens, default=F("quantity"), output_field=decimal)
+            if unit_whens:
+                updates["unit"] = Case(*unit_whens, default=F("unit"))
+            if expiry_whens:
+                updates["expiry_date"] = Case(*expiry_whens, default=F("expiry_date"))
+            if receipt_scan is not None:
+                updates["receipt_scan"] = receipt_scan
+            # The items were read before this transaction: one used up, expired or deleted since can't take the add
+            matched = PantryItem.objects.filter(
+                id__in=[item.id for item in existing.values()], status=PantryItem.Status.AVAILABLE
+            ).update(**updates)
+            if matched != len(existing):
+                raise IntegrityError("Pantry item changed between read and merge")
+
+        new_items = [
+            PantryItem(
+                user=user,
+                ingredient=m.ingredient,
+                quantity=m.quantity,
+                unit=m.unit or m.default_unit or m.ingredient.common_unit,
+                expiry_date=m.expiry_date,
+                source=source,
+                receipt_scan=receipt_scan,
+            )
+            for ing_id, m in merged.items()
+            if ing_id not in existing
+        ]
+        PantryItem.objects.bulk_create(new_items)
+        bump_pantry_versions([user.id])
+        apply_pantry_change(user.id, [(item.ingredient.category_id, None, item.status) for item in new_items])
+    return new_items
+
+
+async def upsert_pantry_items(
+    user,
+    adds: list[PantryAdd],
+    source: str = PantryItem.Source.MANUAL,
+    receipt_scan=None,
+) -> PantryUpsertResult:
+    """Add items to the user's pantry, merging into existing available items per ingredient.
+
+    Merge rules (shared by add_pantry_item, /pantry/bulk and confirm_receipt):
+    quantities are summed (a missing quantity leaves the other side as-is),
+    an explicit unit or expiry_date replaces the stored one, and new items get
+    the category shelf-life expiry and the ingredient's common_unit unless
+    overridden. Several adds for one ingredient collapse into one item.
+
+    Decision: A fixed number of queries for any batch size — ingredient
+    resolution (at most 3), one SELECT of the user's matching available
+    items, one UPDATE with per-row CASE on F("quantity") so concurrent edits
+    aren't overwritten, one INSERT, the pantry_version bump and one SELECT of
+    the results, plus one counter UPDATE per category of new items. The writes
+    share a transaction, so a concurrent insert of the same ingredient
+    (unique_available_pantry_item) raises IntegrityError with nothing applied.
+    So does a matched item that stopped being available between the SELECT
+    and the UPDATE (used up, expired or deleted): the UPDATE is guarded by
+    status and its row count checked, so the add never lands on a used_up
+    row or vanishes.
+    """
+    if not adds:
+        return PantryUpsertResult()
+
+    ingredients = await resolve_ingredients(
+        [IngredientSpec(add.ingredient_name, add.category_hint, add.unit) for add in adds]
+    )
+    categories = (await get_categories(ids={ingredient.category_id for ingredient in ingredients.values()})).by_id
+
+    merged: dict[int, _Merged] = {}
+    for add in adds:
+        ingredient = ingredients[normalize_ingredient_name(add.ingredient_name)]
+        m = merged.setdefault(ingredient.id, _Merged(ingredient=ingredient))
+        if add.quantity:
+            m.quantity = (m.quantity or Decimal("0")) + add.quantity
+        if add.unit:
+            m.unit = add.unit
+        if add.expiry_date:
+            m.expiry_date = add.expiry_date
+        if add.default_unit and not m.default_unit:
+            m.default_unit = add.default_unit
+
+    existing = {
+        item.ingredient_id: item
+        async for item in PantryItem.objects.filter(
+            user=user,
+            ingredient_id__in=merged,
+            status=PantryItem.Status.AVAILABLE,
+        ).only("id", "ingredient_id")
+    }
+
+    # New items without an explicit expiry get their category's shelf life
+    for ing_id, m in merged.items():
+        if ing_id not in existing and not m.expiry_date:
+            category = categories.get(m.ingredient.category_id)
+            if category is not None:
+                m.expiry_date = date.today() + timedelta(days=category.default_shelf_life)
+
+    new_items = await sync_to_async(_apply_pantry_upsert)(user, merged, existing, source, receipt_scan)
+
+    new_by_ingredient = {item.ingredient_id: item for item in new_items}
+    ids = [(existing.get(ing_id) or new_by_ingredient[ing_id]).id for ing_id in merged]
+    by_id = {item.id: item async for item in PantryItem.objects.filter(id__in=ids).select_related("ingredient")}
+    result = PantryUpsertResult(
+        items=[by_id[item_id] for item_id in ids if item_id in by_id],
+        created_ids={item.id for item in new_items},
+    )
+    logger.info(
+        "[upsert_pantry_items] user=%s created=%d updated=%d",
+        user.id,
+        result.created_count,
+        result.updated_count,
+    )
+    return result
+
+
+def _delete_with_tombstones(items) -> list[tuple]:
+    """Delete phase of delete_pantry_items: lock, delete and tombstone the rows in one transaction."""
+    with transaction.atomic():
+        rows = list(
+            items.select_for_update(of=("self",)).values_list("id", "user_id", "ingredient__category_id", "status")
+        )
+        if rows:
+            PantryItem.objects.filter(id__in=[row[0] for row in rows]).delete()
+            PantryItemTombstone.objects.bulk_create(
+                [PantryItemTombstone(id=item_id, user_id=user_id) for item_id, user_id, _, _ in rows]
+            )
+            bump_pantry_versions({user_id for _, user_id, _, _ in rows})
+    return rows
+
+
+async def delete_pantry_items(user, ids: list) -> int:
+    """Delete the user's pantry items among ids (others are skipped). Returns the number deleted.
+
+    Every delete goes through here so it leaves a PantryItemTombstone for
+    /pantry/changes in the same transaction; rows are locked first, so two
+    concurrent deletes of one item can't both count it.
+    """
+    rows = await sync_to_async(_delete_with_tombstones)(PantryItem.objects.filter(id__in=ids, user=user))
+    await record_pantry_change(user.id, [(category_id, status, None) for _, _, category_id, status in rows])
+    return len(rows)
+
+
+@dataclass
+class PantryUse:
+    """Consume `quantity` of one pantry item; None uses it all."""
+
+    item_id: uuid.UUID
+    quantity: Decimal | None = None
+
+
+def _use_error(user, uses: dict) -> HttpError:
+    """Explain why a guarded use matched fewer items than requested (first offending item wins)."""
+    found = {
+        item_id: (status, quantity)
+        for item_id, status, quantity in PantryItem.objects.filter(user=user, id__in=uses).values_list(
+            "id", "status", "quantity"
+        )
+    }
+    for item_id, quantity in uses.items():
+        if item_id not in found:
+            return HttpError(404, "Pantry item not found")
+        status, available = found[item_id]
+        if status != PantryItem.Status.AVAILABLE:
+            return HttpError(400, f"Cannot use item with status '{status}'")
+        if quantity is not None and available is not None and quantity > available:
+            return HttpError(400, "Cannot use more than available quantity")
+    return HttpError(409, "Pantry was modified concurrently, please retry")
+
+
+# Ingredient columns returned alongside a used item, enough to serialize it
+_RETURNED_INGREDIENT_COLUMNS = ("name", "category_id", "common_unit")
+
+
+def _use_query(user, uses: dict) -> RawQuerySet:
+    """The guarded UPDATE for `uses` with a RETURNING clause: yields each updated item with its ingredient.
+
+    Written out as SQL, like upsert_pantry_item, because the ORM has no
+    update-returning. The guard only matches available items with enough
+    quantity (or none tracked); every SET expression reads the row's
+    pre-update values, so the status CASE sees the old quantity. Correlated
+    subqueries in RETURNING carry the ingredient, since SQLite's RETURNING
+    can't read joined tables. The SQL is identical on Postgres and SQLite.
+    """
+    quote = connection.ops.quote_name
+    meta = PantryItem._meta
+    table = quote(meta.db_table)
+    col = {f.name: f"{table}.{quote(f.column)}" for f in meta.concrete_fields}
+    item_id_col, quantity = col["id"], col["quantity"]
+    used_up = PantryItem.Status.USED_UP
+
+    guards, guard_params = [], []
+    quantity_whens, quantity_params = [], []
+    status_whens, status_params = [], []
+    for item_id, amount in uses.items():
+        pk = meta.pk.get_db_prep_value(item_id, connection)
+        if amount is None:
+            guards.append(f"{item_id_col} = %s")
+            guard_params += [pk]
+            quantity_whens.append(f"WHEN {item_id_col} = %s AND {quantity} IS NOT NULL THEN 0")
+            quantity_params += [pk]
+            status_whens.append(f"WHEN {item_id_col} = %s THEN %s")
+            status_params += [pk, used_up]
+        else:
+            n = str(amount)
+            guards.append(f"({item_id_col} = %s AND ({quantity} IS NULL OR {quantity} >= CAST(%s AS NUMERIC)))")
+            guard_params += [pk, n]
+            quantity_whens.append(
+                f"WHEN {item_id_col} = %s AND {quantity} IS NOT NULL THEN {quantity} - CAST(%s AS NUMERIC)"
+            )
+            quantity_params += [pk, n]
+            status_whens.append(
+                f"WHEN {item_id_col} = %s AND ({quantity} IS NULL OR {quantity} <= CAST(%s AS NUMERIC)) THEN %s"
+            )
+            status_params += [pk, n, used_up]
+
+    updated_at = meta.get_field("updated_at")
+    user_id = meta.get_field("user").get_db_prep_value(user.pk, connection)
+    ingredients = quote(Ingredient._meta.db_table)
+    returning = list(col.values())
+    returning += [
+        f"(SELECT {ingredients}.{quote(column)} FROM {ingredients} WHERE {ingredients}.{quote('id')} = {col['ingredient']})"
+        f" AS {quote('ingredient_' + column)}"
+        for column in _RETURNED_INGREDIENT_COLUMNS
+    ]
+    sql = (
+        f"UPDATE {table} SET "
+        f"{quote(meta.get_field('quantity').column)} = CASE {' '.join(quantity_whens)} ELSE {quantity} END, "
+        f"{quote(meta.get_field('status').column)} = CASE {' '.join(status_whens)} ELSE {col['status']} END, "
+        f"{quote(updated_at.column)} = %s "
+        f"WHERE {col['user']} = %s AND {col['status']} = %s AND ({' OR '.join(guards)}) "
+        f"RETURNING {', '.join(returning)}"
+    )
+    params = [
+        *quantity_params,
+        *status_params,
+        updated_at.get_db_prep_value(timezone.now(), connection),
+        user_id,
+        PantryItem.Status.AVAILABLE,
+        *guard_params,
+    ]
+    return PantryItem.objects.raw(sql, params)
+
+
+def _attach_ingredient(item: PantryItem) -> PantryItem:
+    item.ingredient = Ingredient(
+        id=item.ingredient_id,
+        **{column: getattr(item, f"ingredient_{column}") for column in _RETURNED_INGREDIENT_COLUMNS},
+    )
+    return item
+
+
+def _apply_pantry_use(user, uses: dict[uuid.UUID, Decimal | None]) -> list[PantryItem]:
+    """Write phase of consume_pantry_item(s): all-or-nothing guarded UPDATE ... RETURNING in a transaction.
+
+    `uses` is keyed by UUID, matching the ids of the returned rows. The
+    pantry_version bump and the available → used_up counter moves commit
+    with the UPDATE or not at all.
+    """
+    with transaction.atomic():
+        by_id = {item.id: _attach_ingredient(item) for item in _use_query(user, uses)}
+        if len(by_id) != len(uses):
+            transaction.set_rollback(True)
+        else:
+            bump_pantry_versions([user.id])
+            move_counters(
+                Counter(
+                    (user.id, item.ingredient.category_id)
+                    for item in by_id.values()
+                    if item.status == PantryItem.Status.USED_UP
+                ),
+                PantryItem.Status.AVAILABLE,
+                PantryItem.Status.USED_UP,
+            )
+    if len(by_id) != len(uses):
+        raise _use_error(user, uses)
+    return [by_id[item_id] for item_id in uses]
+
+
+async def consume_pantry_item(user, item_id, quantity: Decimal | None = None) -> PantryItem:
+    """Consume one pantry item (see consume_pantry_items for the rules). Returns the updated item.
+
+    Decision: The hot path is a single guarded UPDATE ... RETURNING, so there
+    is no read-modify-write to race with another device, and the response is
+    built from the returned row. It shares one short transaction with the
+    pantry_version bump and, if the item was used up, the counter update, so
+    a failure part-way leaves neither a stale version nor drifted counters.
+    Only a failed guard costs the extra read that picks 404 or 400.
+    """
+    try:
+        item_id = uuid.UUID(str(item_id))
+    except ValueError:
+        raise HttpError(404, "Pantry item not found")
+    [item] = await sync_to_async(_apply_pantry_use)(user, {item_id: quantity})
+    return item
+
+
+async def consume_pantry_items(user, uses: list[PantryUse]) -> list[PantryItem]:
+    """Consume several pantry items at once, all or nothing. Returns the items in request order.
+
+    Same rules as POST /pantry/{id}/use: only available items can be used, a
+    quantity decrements (up to what is left) and the item becomes used_up at
+    zero, no quantity (or an untracked one) uses it all. Several uses of one
+    item add up. Raises HttpError 404/400 naming the first item that can't be
+    used, with nothing applied.
+
+    Decision: One UPDATE with per-item CASE expressions on F("quantity"),
+    guarded by status = available AND quantity >= n, does every decrement and
+    used_up transition — no read-modify-write, so concurrent uses can't lose
+    an update — and returns the updated rows (see _use_query). If the guard
+    matches fewer rows than asked for, the transaction rolls back and one
+    extra read finds out why. On success, the same transaction bumps
+    pantry_version and moves the counts of items used up (one UPDATE).
+    """
+    merged: dict = {}
+    for use in uses:
+        if use.item_id not in merged:
+            merged[use.item_id] = use.quantity
+        elif merged[use.item_id] is None or use.quantity is None:
+            merged[use.item_id] = None
+        else:
+            merged[use.item_id] += use.quantity
+
+    items = await sync_to_async(_apply_pantry_use)(user, merged)
+    logger.info("[consume_pantry_items] user=%s items=%d", user.id, len(items))
+    return items
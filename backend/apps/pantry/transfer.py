@@ -0,0 +1,306 @@
+import codecs
+import csv
+import io
+import json
+import logging
+from collections.abc import AsyncIterator, Iterable, Iterator
+from dataclasses import dataclass, field
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError
+from ninja.errors import HttpError
+
+from apps.core.pagination import Keyset
+from apps.ingredients.cache import get_categories
+from apps.ingredients.models import Ingredient, IngredientCategory
+from apps.pantry.models import PantryItem
+from apps.pantry.services import PantryAdd, upsert_pantry_items
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CHUNK_SIZE = 500
+EXPORT_FIELDS = [
+    "id",
+    "ingredient",
+    "category",
+    "quantity",
+    "unit",
+    "status",
+    "source",
+    "added_date",
+    "expiry_date",
+    "created_at",
+    "updated_at",
+]
+EXPORT_CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+# Keyset on (created_at, id): neither changes after insert, so an item edited
+# mid-export is neither skipped nor exported twice.
+EXPORT_KEYSET = Keyset("created_at", "id")
+
+
+async def iter_pantry_chunks(user, chunk_size: int) -> AsyncIterator[list[PantryItem]]:
+    """Yield the user's pantry items (ingredient loaded) in chunks of at most chunk_size.
+
+    Decision: One keyset query per chunk over pantry_user_created_idx rather
+    than a server-side cursor — those are disabled for PgBouncer transaction
+    pooling, and a client-side cursor would buffer the whole result — so only
+    one chunk is ever in memory and no transaction stays open while the
+    client reads.
+    """
+    queryset = EXPORT_KEYSET.order_by(PantryItem.objects.filter(user=user).select_related("ingredient"))
+    page = queryset
+    while True:
+        chunk = [item async for item in page[:chunk_size]]
+        if chunk:
+            yield chunk
+        if len(chunk) < chunk_size:
+            return
+        page = queryset.filter(EXPORT_KEYSET.after(PantryItem, EXPORT_KEYSET.values_of(chunk[-1])))
+
+
+# A spreadsheet reads a cell starting with one of these as a formula
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+# User- and OCR-supplied text columns
+CSV_TEXT_FIELDS = ("ingredient", "category", "unit")
+
+
+def _csv_safe(row: dict) -> dict:
+    """Prefix text cells that a spreadsheet would run as a formula with ', so they show as text."""
+    for name in CSV_TEXT_FIELDS:
+        value = row[name]
+        if value and value.startswith(FORMULA_PREFIXES):
+            row[name] = "'" + value
+    return row
+
+
+def _csv_unescape(row: dict) -> dict:
+    """Undo _csv_safe, so an exported CSV imports the original names."""
+    for name, value in row.items():
+        if isinstance(value, str) and value.startswith("'") and value[1:].startswith(FORMULA_PREFIXES):
+            row[name] = value[1:]
+    return row
+
+
+def _export_row(item: PantryItem, categories: dict) -> dict:
+    category = categories.get(item.ingredient.category_id)
+    return {
+        "id": str(item.id),
+        "ingredient": item.ingredient.name,
+        "category": category.name if category else None,
+        "quantity": str(item.quantity) if item.quantity is not None else None,
+        "unit": item.unit,
+        "status": item.status,
+        "source": item.source,
+        "added_date": item.added_date.isoformat(),
+        "expiry_date": item.expiry_date.isoformat() if item.expiry_date else None,
+        "created_at": item.created_at.isoformat(),
+        "updated_at": item.updated_at.isoformat(),
+    }
+
+
+async def export_pantry(user, fmt: str, chunk_size: int | None = None) -> AsyncIterator[str]:
+    """Render the user's pantry as CSV (with a header row) or NDJSON, one string per chunk."""
+    chunk_size = chunk_size or EXPORT_CHUNK_SIZE
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    if fmt == "csv":
+        writer.writeheader()
+
+    rows = 0
+    async for chunk in iter_pantry_chunks(user, chunk_size):
+        categories = (await get_categories(ids={item.ingredient.category_id for item in chunk})).by_id
+        for item in chunk:
+            row = _export_row(item, categories)
+            if fmt == "csv":
+                writer.writerow(_csv_safe(row))
+            else:
+                buffer.write(json.dumps(row, ensure_ascii=False) + "\n")
+        rows += len(chunk)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():  # CSV header of an empty pantry
+        yield buffer.getvalue()
+    logger.info("[export_pantry] user=%s format=%s rows=%d", user.id, fmt, rows)
+
+
+IMPORT_BATCH_SIZE = 500
+MAX_IMPORT_ROWS = 50_000
+MAX_IMPORT_ERRORS = 100
+# Accepted column names (the export's, or the POST /pantry/ field names) → PantryAdd field
+IMPORT_COLUMNS = {
+    "ingredient": "ingredient_name",
+    "ingredient_name": "ingredient_name",
+    "category": "category_hint",
+    "category_hint": "category_hint",
+    "quantity": "quantity",
+    "unit": "unit",
+    "expiry_date": "expiry_date",
+}
+
+# Column limits, checked per row so one bad value can't fail a whole batch
+MAX_QUANTITY = Decimal(10) ** (
+    PantryItem._meta.get_field("quantity").max_digits - PantryItem._meta.get_field("quantity").decimal_places
+)
+MAX_LENGTHS = {
+    "ingredient_name": Ingredient._meta.get_field("name").max_length,
+    "unit": PantryItem._meta.get_field("unit").max_length,
+    "category_hint": IngredientCategory._meta.get_field("name").max_length,
+}
+
+
+@dataclass
+class PantryImportResult:
+    rows: int = 0
+    created_count: int = 0
+    updated_count: int = 0
+    error_count: int = 0
+    errors: list[dict] = field(default_factory=list)
+
+    def add_error(self, row: int, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_IMPORT_ERRORS:
+            self.errors.append({"row": row, "error": message})
+
+
+def _records(lines: Iterable[str], fmt: str) -> Iterator[tuple[int, dict | str]]:
+    """Yield (row number, record) for each data row, or (row number, error message) if it can't be parsed."""
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        if not {"ingredient", "ingredient_name"} & set(reader.fieldnames or ()):
+            raise HttpError(400, "CSV header must include an 'ingredient' column")
+        for number, record in enumerate(reader, start=1):
+            yield number, _csv_unescape(record)
+        return
+
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield number, "Invalid JSON"
+            continue
+        yield number, record if isinstance(record, dict) else "Each line must be a JSON object"
+
+
+def _pantry_add(record: dict) -> PantryAdd:
+    """Validate one import record into a PantryAdd. Raises ValueError with a message for the report."""
+    values = {}
+    for column, value in record.items():
+        name = IMPORT_COLUMNS.get(column)
+        if name is None or value is None or (isinstance(value, str) and not value.strip()):
+            continue
+        values[name] = value.strip() if isinstance(value, str) else value
+
+    status = record.get("status")
+    if status and status != PantryItem.Status.AVAILABLE:
+        raise ValueError(f"Only available items can be imported (status '{status}')")
+    if not isinstance(values.get("ingredient_name"), str):
+        raise ValueError("Missing ingredient")
+    if "quantity" in values:
+        try:
+            values["quantity"] = Decimal(str(values["quantity"]))
+        except InvalidOperation:
+            raise ValueError(f"Invalid quantity '{values['quantity']}'")
+        if not values["quantity"].is_finite() or not 0 <= values["quantity"] < MAX_QUANTITY:
+            raise ValueError(f"Invalid quantity '{values['quantity']}'")
+    if "expiry_date" in values:
+        try:
+            values["expiry_date"] = date.fromisoformat(str(values["expiry_date"]))
+        except ValueError:
+            raise ValueError(f"Invalid expiry_date '{values['expiry_date']}', expected YYYY-MM-DD")
+    for name, max_length in MAX_LENGTHS.items():
+        if name in values:
+            values[name] = str(values[name])
+            if len(values[name]) > max_length:
+                raise ValueError(f"{name} is longer than {max_length} characters")
+    return PantryAdd(**values)
+
+
+async def _write_batch(user, adds: list[PantryAdd], result: PantryImportResult) -> None:
+    try:
+        upserted = await upsert_pantry_items(user, adds)
+    except IntegrityError:
+        # A concurrent add created one of these items and nothing was written; the retry merges into it
+        upserted = await upsert_pantry_items(user, adds)
+    result.created_count += upserted.created_count
+    result.updated_count += upserted.updated_count
+
+
+def _read_batch(records: Iterator, result: PantryImportResult) -> tuple[list[PantryAdd], bool]:
+    """Read and validate rows until IMPORT_BATCH_SIZE are valid. Returns (batch, whether the body is used up).
+
+    Blocking: it reads the request body and parses CSV/JSON, so import_pantry
+    runs it in a thread, one batch per hop. Errors are recorded on `result`.
+    """
+    batch: list[PantryAdd] = []
+    while len(batch) < IMPORT_BATCH_SIZE:
+        try:
+            number, record = next(records)
+        except StopIteration:
+            return batch, True
+        except UnicodeDecodeError:
+            result.add_error(result.rows + 1, "Body is not valid UTF-8; import stopped")
+            return batch, True
+        except csv.Error as exc:
+            result.add_error(result.rows + 1, f"Malformed CSV ({exc}); import stopped")
+            return batch, True
+
+        result.rows = number
+        if number > MAX_IMPORT_ROWS:
+            result.add_error(number, f"Import is limited to {MAX_IMPORT_ROWS} rows; import stopped")
+            result.rows = MAX_IMPORT_ROWS
+            return batch, True
+        if isinstance(record, str):
+            result.add_error(number, record)
+            continue
+        try:
+            batch.append(_pantry_add(record))
+        except ValueError as exc:
+            result.add_error(number, str(exc))
+    return batch, False
+
+
+async def import_pantry(user, stream: Iterable[bytes], fmt: str) -> PantryImportResult:
+    """Add rows from a CSV or NDJSON byte stream to the user's pantry. Returns counts and per-row errors.
+
+    Rows follow POST /pantry/ (ingredient, quantity, unit, expiry_date,
+    category as its category_hint); the export's other columns are ignored,
+    and rows with a status other than available are reported as errors.
+    Invalid rows are reported (the first MAX_IMPORT_ERRORS in full) and
+    skipped; the rest are imported. Not atomic: each batch commits on its own.
+
+    Decision: The body is decoded and parsed line by line, and valid rows are
+    written IMPORT_BATCH_SIZE at a time through upsert_pantry_items — batched
+    ingredient resolution, one UPDATE and one INSERT per batch — so memory is
+    bounded by one batch and the query count by rows / IMPORT_BATCH_SIZE.
+    Reading and parsing a batch (_read_batch) runs in a thread, so a large
+    file never holds the event loop between writes. Several rows for one
+    ingredient merge into one item, like /pantry/bulk.
+    """
+    result = PantryImportResult()
+    records = _records(codecs.iterdecode(stream, "utf-8-sig"), fmt)
+    read_batch = sync_to_async(_read_batch)
+    done = False
+    while not done:
+        batch, done = await read_batch(records, result)
+        if batch:
+            await _write_batch(user, batch, result)
+    logger.info(
+        "[import_pantry] user=%s format=%s rows=%d created=%d updated=%d errors=%d",
+        user.id,
+        fmt,
+        result.rows,
+        result.created_count,
+        result.updated_count,
+        result.error_count,
+    )
+    return result
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-19 08:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("receipts", "0002_add_confirmed_status"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="receiptscan",
+            index=models.Index(fields=["user", "-scanned_at", "-id"], name="receipt_scan_user_cursor_idx"),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.2 on 2026-10-19 16:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("receipts", "0003_cursor_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="receiptscan",
+            name="error",
+            field=models.CharField(blank=True, max_length=500, null=True),
+        ),
+    ]
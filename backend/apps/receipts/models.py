@@ -24,10 +24,14 @@ class ReceiptScan(AbstractUUIDTimestampModel):
         choices=Status.choices,
         default=Status.PROCESSING,
     )
+    error = models.CharField(max_length=500, blank=True, null=True)
 
     class Meta:
         db_table = "receipt_scans"
         ordering = ["-scanned_at"]
+        indexes = [
+            models.Index(fields=["user", "-scanned_at", "-id"], name="receipt_scan_user_cursor_idx"),
+        ]
 
     def __str__(self):
         return f"Scan {self.id} ({self.status})"
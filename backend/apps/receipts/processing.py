@@ -0,0 +1,301 @@
+import asyncio
+import contextlib
+import contextvars
+import logging
+import uuid
+from collections.abc import AsyncIterator
+from datetime import timedelta
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from apps.pantry.services import IngredientSpec, normalize_ingredient_name, resolve_ingredients
+from apps.receipts.models import ReceiptItem, ReceiptScan
+from apps.receipts.services.base import ExtractedItem, OCRExtractionError, OCRProvider, ReceiptExtractionResult
+
+logger = logging.getLogger(__name__)
+
+# Long-poll: how often a waiter re-reads the status when the scan runs on another worker
+WAIT_POLL_INTERVAL = 1.0
+# A scan still processing this long after the timeout lost its worker (restart, crash)
+ABANDONED_GRACE = timedelta(seconds=60)
+MAX_ERROR_LENGTH = ReceiptScan._meta.get_field("error").max_length
+
+
+async def fail_scan(scan: ReceiptScan, message: str) -> None:
+    """Mark a processing scan failed with a reason for the client (no-op if it already finished)."""
+    scan.status, scan.error = ReceiptScan.Status.FAILED, message[:MAX_ERROR_LENGTH]
+    await ReceiptScan.objects.filter(id=scan.id, status=ReceiptScan.Status.PROCESSING).aupdate(
+        status=scan.status, error=scan.error, updated_at=timezone.now()
+    )
+
+
+def _receipt_item(scan: ReceiptScan, extracted: ExtractedItem, ingredients: dict) -> ReceiptItem:
+    return ReceiptItem(
+        receipt=scan,
+        ingredient=ingredients[normalize_ingredient_name(extracted.name)] if extracted.is_food else None,
+        raw_text=extracted.raw_text,
+        quantity=Decimal(str(extracted.quantity)) if extracted.quantity is not None else None,
+        unit=extracted.unit,
+        price=Decimal(str(extracted.price)) if extracted.price is not None else None,
+    )
+
+
+@transaction.atomic
+def _complete_scan(scan: ReceiptScan, result: ReceiptExtractionResult, items: list[ReceiptItem]) -> bool:
+    """Mark the scan completed and insert its items in one transaction. False if it is no longer processing."""
+    updated = ReceiptScan.objects.filter(id=scan.id, status=ReceiptScan.Status.PROCESSING).update(
+        status=ReceiptScan.Status.COMPLETED,
+        store_name=result.store_name,
+        raw_extraction=result.raw_response,
+        updated_at=timezone.now(),
+    )
+    if not updated:
+        return False
+    ReceiptItem.objects.bulk_create(items)
+    return True
+
+
+async def process_scan(scan: ReceiptScan, provider: OCRProvider, timeout: float | None = None) -> list[ReceiptItem]:
+    """Extract the scan's image and store its line items. Returns the items created.
+
+    Raises OCRExtractionError (after marking the scan failed) if the provider
+    fails or takes longer than `timeout` seconds (default
+    RECEIPT_SCAN_TIMEOUT; ScanRunner passes what is left after queueing).
+
+    Decision: Items are written and the status flips to completed in one
+    transaction, guarded on status=processing — a poller never sees a
+    completed scan without its items, and a scan deleted or given up on
+    (abandoned) meanwhile is left alone.
+    """
+    logger.info("[process_scan] scan=%s image_url=%s", scan.id, scan.image_url)
+    timeout = settings.RECEIPT_SCAN_TIMEOUT if timeout is None else timeout
+    try:
+        result = await asyncio.wait_for(provider.extract_receipt(scan.image_url), timeout)
+    except TimeoutError as exc:
+        await fail_scan(scan, f"Timed out after {settings.RECEIPT_SCAN_TIMEOUT}s")
+        logger.error("[process_scan] scan=%s timed out", scan.id)
+        raise OCRExtractionError(scan.error) from exc
+    except OCRExtractionError as exc:
+        await fail_scan(scan, str(exc))
+        logger.exception("[process_scan] OCR failed for scan=%s", scan.id)
+        raise
+
+    # Resolve every food line's ingredient in one batch, then insert all lines at once
+    ingredients = await resolve_ingredients(
+        [IngredientSpec(e.name, e.category_hint, e.unit) for e in result.items if e.is_food]
+    )
+    items = [_receipt_item(scan, extracted, ingredients) for extracted in result.items]
+    try:
+        completed = await sync_to_async(_complete_scan)(scan, result, items)
+    except IntegrityError:
+        completed = False  # deleted by the user while extracting
+    if not completed:
+        logger.warning("[process_scan] scan=%s no longer processing, extraction discarded", scan.id)
+        return []
+
+    scan.status = ReceiptScan.Status.COMPLETED
+    scan.store_name = result.store_name
+    scan.raw_extraction = result.raw_response
+    logger.info("[process_scan] scan=%s completed, %d items created", scan.id, len(items))
+    return items
+
+
+async def _fail_streamed_scan(scan: ReceiptScan, message: str, count: int) -> None:
+    """Fail the scan and drop the items it streamed, so only completed scans have items."""
+    logger.error("[stream_scan] scan=%s failed after %d items: %s", scan.id, count, message)
+    await fail_scan(scan, message)
+    await ReceiptItem.objects.filter(receipt_id=scan.id).adelete()
+
+
+async def stream_scan(scan: ReceiptScan, provider: OCRProvider) -> AsyncIterator[ReceiptItem]:
+    """Like process_scan, but saves and yields each line item as the provider streams it in.
+
+    Raises OCRExtractionError (after marking the scan failed and deleting the
+    items saved so far) if the provider fails or the scan takes longer than
+    RECEIPT_SCAN_TIMEOUT, waiting for one of ScanRunner's slots included.
+    Ends early, leaving the scan as it is, if the scan is deleted or stops
+    processing meanwhile.
+
+    Decision: One ingredient resolution (usually an LRU hit) and one INSERT per
+    item as it arrives, rather than process_scan's batch at the end, because
+    that is what puts the first item in front of the user seconds in instead
+    of after the whole receipt. The status still flips to completed only at
+    the end; until then GET /receipts/{id} shows the items saved so far
+    under status processing.
+    """
+    logger.info("[stream_scan] scan=%s image_url=%s", scan.id, scan.image_url)
+    deadline = asyncio.get_running_loop().time() + settings.RECEIPT_SCAN_TIMEOUT
+    async with scan_runner.slot(scan, deadline):
+        extraction = aiter(provider.stream_receipt(scan.image_url))
+        count = 0
+        try:
+            while True:
+                # The deadline covers waiting on the provider, not the caller's handling of each item
+                async with asyncio.timeout_at(deadline):
+                    extracted = await anext(extraction, None)
+                if extracted is None or isinstance(extracted, ReceiptExtractionResult):
+                    break
+                ingredients = await resolve_ingredients(
+                    [IngredientSpec(extracted.name, extracted.category_hint, extracted.unit)]
+                    if extracted.is_food
+                    else []
+                )
+                item = _receipt_item(scan, extracted, ingredients)
+                try:
+                    await item.asave()
+                except IntegrityError:
+                    # Deleted by the user while extracting
+                    await extraction.aclose()
+                    logger.warning("[stream_scan] scan=%s no longer exists, extraction discarded", scan.id)
+                    return
+                count += 1
+                yield item
+        except TimeoutError as exc:
+            await extraction.aclose()
+            await _fail_streamed_scan(scan, f"Timed out after {settings.RECEIPT_SCAN_TIMEOUT}s", count)
+            raise OCRExtractionError(scan.error) from exc
+        except OCRExtractionError as exc:
+            await _fail_streamed_scan(scan, str(exc), count)
+            raise
+
+        if extracted is None:
+            await _fail_streamed_scan(scan, "Extraction ended without a result", count)
+            raise OCRExtractionError(scan.error)
+        if not await sync_to_async(_complete_scan)(scan, extracted, []):
+            logger.warning("[stream_scan] scan=%s no longer processing, extraction discarded", scan.id)
+            return
+        scan.status = ReceiptScan.Status.COMPLETED
+        scan.store_name = extracted.store_name
+        scan.raw_extraction = extracted.raw_response
+        logger.info("[stream_scan] scan=%s completed, %d items streamed", scan.id, count)
+
+
+async def fail_if_abandoned(scan: ReceiptScan) -> None:
+    """Fail a scan that has been processing longer than any extraction can take.
+
+    Background extraction lives in one worker's memory, so a restart drops
+    it; without this the scan would read as processing forever. ScanRunner
+    counts queueing against the timeout, so a live scan never reaches the
+    cutoff.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.RECEIPT_SCAN_TIMEOUT) - ABANDONED_GRACE
+    if scan.status == ReceiptScan.Status.PROCESSING and scan.scanned_at < cutoff:
+        logger.warning("[fail_if_abandoned] scan=%s abandoned since %s", scan.id, scan.scanned_at)
+        await fail_scan(scan, "Scan was interrupted, please try again")
+
+
+class ScanRunner:
+    """Runs scan extraction as tasks on the worker's event loop, at most RECEIPT_SCAN_CONCURRENCY at a time.
+
+    Decision: Tasks on the running ASGI loop rather than a job queue — the
+    work is awaiting two HTTP calls, so an in-flight scan costs a coroutine,
+    not a worker slot, and no broker has to be deployed. The semaphore caps
+    concurrent Anthropic calls per worker; scans beyond it wait their turn.
+    The trade-off is that a worker restart drops its in-flight scans, which
+    fail_if_abandoned turns into failed scans the client can retry. Time spent
+    queued for a slot counts against RECEIPT_SCAN_TIMEOUT, so no scan outlives
+    the cutoff fail_if_abandoned applies to it.
+    """
+
+    def __init__(self):
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self._finished: dict[uuid.UUID, asyncio.Event] = {}
+
+    def _bind(self) -> asyncio.AbstractEventLoop:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # First use, or a new loop (management commands and tests run one per call)
+            self._loop, self._tasks, self._finished = loop, set(), {}
+            self._semaphore = asyncio.Semaphore(max(1, settings.RECEIPT_SCAN_CONCURRENCY))
+        return loop
+
+    @contextlib.asynccontextmanager
+    async def slot(self, scan: ReceiptScan, deadline: float):
+        """Hold one of this worker's extraction slots while extracting the scan.
+
+        Raises OCRExtractionError (after marking the scan failed) if no slot
+        frees up before `deadline` (event loop time).
+        """
+        self._bind()
+        semaphore = self._semaphore
+        try:
+            async with asyncio.timeout_at(deadline):
+                await semaphore.acquire()
+        except TimeoutError as exc:
+            await fail_scan(scan, f"Timed out after {settings.RECEIPT_SCAN_TIMEOUT}s")
+            logger.error("[ScanRunner] scan=%s timed out waiting for a slot", scan.id)
+            raise OCRExtractionError(scan.error) from exc
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+    def submit(self, scan: ReceiptScan, provider: OCRProvider) -> asyncio.Task:
+        """Start extracting the scan in the background and return its task."""
+        loop = self._bind()
+        deadline = loop.time() + settings.RECEIPT_SCAN_TIMEOUT
+        finished = self._finished[scan.id] = asyncio.Event()
+        # An empty context, not the request's: its sync_to_async thread is gone once the 202 is sent,
+        # so the task's ORM calls go to asgiref's shared background thread instead
+        task = loop.create_task(
+            self._run(scan, provider, finished, deadline),
+            name=f"receipt-scan-{scan.id}",
+            context=contextvars.Context(),
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _run(self, scan: ReceiptScan, provider: OCRProvider, finished: asyncio.Event, deadline: float) -> None:
+        try:
+            async with self.slot(scan, deadline):
+                await process_scan(scan, provider, timeout=deadline - asyncio.get_running_loop().time())
+        except OCRExtractionError:
+            pass  # recorded on the scan by process_scan
+        except Exception:
+            logger.exception("[ScanRunner] scan=%s failed", scan.id)
+            await fail_scan(scan, "Receipt extraction failed")
+        finally:
+            self._finished.pop(scan.id, None)
+            finished.set()
+            await sync_to_async(close_old_connections)()
+
+    async def wait(self, scan_id: uuid.UUID, timeout: float) -> None:
+        """Sleep up to `timeout` seconds, waking early if this worker finishes the scan."""
+        finished = self._finished.get(scan_id)
+        if finished is None or asyncio.get_running_loop() is not self._loop:
+            await asyncio.sleep(timeout)
+            return
+        try:
+            await asyncio.wait_for(finished.wait(), timeout)
+        except TimeoutError:
+            pass
+
+    async def join(self) -> None:
+        """Wait for every scan submitted on the current loop to finish."""
+        while self._tasks and asyncio.get_running_loop() is self._loop:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+scan_runner = ScanRunner()
+
+
+async def wait_for_scan(scan: ReceiptScan, wait: float) -> None:
+    """Return once the scan is no longer processing, or after `wait` seconds.
+
+    Wakes as soon as the scan finishes when it runs on this worker, otherwise
+    re-reads its status every WAIT_POLL_INTERVAL (a primary-key lookup).
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    statuses = ReceiptScan.objects.filter(id=scan.id).values_list("status", flat=True)
+    while (remaining := deadline - loop.time()) > 0:
+        await scan_runner.wait(scan.id, min(WAIT_POLL_INTERVAL, remaining))
+        if await statuses.afirst() != ReceiptScan.Status.PROCESSING:
+            return
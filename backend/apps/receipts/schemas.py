@@ -36,7 +36,10 @@ class ReceiptScanDetailOut(Schema):
     image_url: str
     store_name: str | None = None
     scanned_at: datetime
-    status: str
+    status: str = Field(
+        description="processing → completed (items filled in) or failed; confirmed once added to pantry"
+    )
+    error: str | None = Field(default=None, description="Why extraction failed, when status is failed")
     items: list[ReceiptItemOut]
 
 
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator
 from dataclasses import dataclass, field
 
 
@@ -28,3 +29,14 @@ class OCRProvider(ABC):
     @abstractmethod
     async def extract_receipt(self, image_url: str) -> ReceiptExtractionResult:
         """Extract structured receipt data from an image URL."""
+
+    async def stream_receipt(self, image_url: str) -> AsyncIterator[ExtractedItem | ReceiptExtractionResult]:
+        """Yield each line item as soon as it is extracted, then the complete result.
+
+        The complete result's items are the ones already yielded. This default
+        extracts everything first; providers that can stream override it.
+        """
+        result = await self.extract_receipt(image_url)
+        for item in result.items:
+            yield item
+        yield result
@@ -1,6 +1,9 @@
+import asyncio
 import base64
+import json
 import logging
 import mimetypes
+from collections.abc import AsyncIterator
 
 import anthropic
 import httpx
@@ -12,6 +15,7 @@ from apps.receipts.services.base import (
     OCRProvider,
     ReceiptExtractionResult,
 )
+from apps.receipts.services.preprocess import prepare_receipt_image
 
 logger = logging.getLogger(__name__)
 
@@ -130,6 +134,82 @@ MEDIA_TYPE_MAP = {
 }
 
 
+class ItemStreamParser:
+    """Picks each complete object out of the tool input's "items" array while its JSON is still arriving.
+
+    Feed it the input_json_delta fragments in order; feed() returns the items
+    whose closing brace was in that fragment.
+
+    Decision: One pass per fragment that tracks only nesting depth and whether
+    it is inside a string, and keeps only the current item's text — O(n) over
+    the whole input. Re-parsing the accumulated partial JSON on every delta
+    would cost O(n²).
+    """
+
+    def __init__(self, key: str = "items"):
+        self._key = key
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string: list[str] = []  # the top-level string being read, a candidate key
+        self._last_key: str | None = None
+        self._in_items = False
+        self._item: list[str] | None = None  # text of the item being read
+
+    def feed(self, fragment: str) -> list[dict]:
+        items = []
+        for char in fragment:
+            if self._item is not None:
+                self._item.append(char)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_key = "".join(self._string)
+                elif self._depth == 1:
+                    self._string.append(char)
+            elif char == '"':
+                self._in_string = True
+                self._string = []
+            elif char in "{[":
+                self._depth += 1
+                if char == "[" and self._depth == 2 and self._last_key == self._key:
+                    self._in_items = True
+                elif char == "{" and self._depth == 3 and self._in_items:
+                    self._item = [char]
+            elif char in "}]":
+                if char == "}" and self._depth == 3 and self._item is not None:
+                    try:
+                        items.append(json.loads("".join(self._item)))
+                    except ValueError:
+                        logger.warning("[ItemStreamParser] skipping unparseable item")
+                    self._item = None
+                elif char == "]" and self._depth == 2:
+                    self._in_items = False
+                self._depth -= 1
+        return items
+
+
+def _extracted_item(item) -> ExtractedItem | None:
+    """Map one tool input item to an ExtractedItem, or None if it lacks the required fields."""
+    if not isinstance(item, dict) or not item.get("raw_text") or not item.get("name"):
+        logger.warning("[_extracted_item] skipping incomplete item %r", item)
+        return None
+    return ExtractedItem(
+        raw_text=item["raw_text"],
+        name=item["name"],
+        quantity=item.get("quantity"),
+        unit=item.get("unit"),
+        price=item.get("price"),
+        is_food=item.get("is_food", True),
+        category_hint=item.get("category_hint"),
+    )
+
+
 def _detect_media_type_from_bytes(data: bytes) -> str | None:
     """Detect image media type from magic bytes."""
     if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
@@ -151,36 +231,11 @@ class ClaudeOCRProvider(OCRProvider):
     async def extract_receipt(self, image_url: str) -> ReceiptExtractionResult:
         """Download receipt image, send to Claude Vision, return structured extraction."""
         logger.info("[extract_receipt] starting, image_url=%s", image_url)
-        image_data, media_type = await self._download_image(image_url)
+        image_data, media_type, image_report = await self._load_image(image_url)
 
         logger.info("[extract_receipt] sending to Claude Vision, model=%s media_type=%s", self.model, media_type)
         try:
-            response = await self.client.messages.create(
-                model=self.model,
-                max_tokens=4096,
-                system=SYSTEM_PROMPT,
-                tools=[EXTRACT_TOOL],
-                tool_choice={"type": "tool", "name": "extract_receipt_items"},
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "image",
-                                "source": {
-                                    "type": "base64",
-                                    "media_type": media_type,
-                                    "data": image_data,
-                                },
-                            },
-                            {
-                                "type": "text",
-                                "text": "Extract all line items from this grocery receipt.",
-                            },
-                        ],
-                    }
-                ],
-            )
+            response = await self.client.messages.create(**self._request(image_data, media_type))
         except anthropic.APIError as exc:
             logger.exception("[extract_receipt] Claude API error")
             raise OCRExtractionError(f"Claude API error: {exc}") from exc
@@ -190,10 +245,92 @@ class ClaudeOCRProvider(OCRProvider):
             getattr(response, "usage", None),
             response.stop_reason,
         )
-        return self._parse_response(response)
+        return self._parse_response(response, image_report)
+
+    async def stream_receipt(self, image_url: str) -> AsyncIterator[ExtractedItem | ReceiptExtractionResult]:
+        """Like extract_receipt, but yields each line item as soon as Claude has finished writing it.
+
+        Uses the streaming Messages API: the tool input arrives as
+        input_json_delta fragments, and ItemStreamParser pulls out each item
+        as its object closes. The complete result comes last, parsed from the
+        final message like extract_receipt. Any item the incremental parse
+        missed is yielded from there before it.
+        """
+        logger.info("[stream_receipt] starting, image_url=%s", image_url)
+        image_data, media_type, image_report = await self._load_image(image_url)
+
+        parser = ItemStreamParser()
+        streamed = 0
+        try:
+            async with self.client.messages.stream(**self._request(image_data, media_type)) as stream:
+                async for event in stream:
+                    if event.type != "content_block_delta" or event.delta.type != "input_json_delta":
+                        continue
+                    for item in parser.feed(event.delta.partial_json):
+                        if extracted := _extracted_item(item):
+                            streamed += 1
+                            yield extracted
+                response = await stream.get_final_message()
+        except anthropic.APIError as exc:
+            logger.exception("[stream_receipt] Claude API error after %d items", streamed)
+            raise OCRExtractionError(f"Claude API error: {exc}") from exc
+
+        logger.info(
+            "[stream_receipt] Claude response: usage=%s stop_reason=%s streamed=%d",
+            getattr(response, "usage", None),
+            response.stop_reason,
+            streamed,
+        )
+        result = self._parse_response(response, image_report)
+        for extracted in result.items[streamed:]:
+            yield extracted
+        yield result
+
+    def _request(self, image_data: str, media_type: str) -> dict:
+        """Messages API parameters for extracting one base64-encoded receipt image."""
+        return {
+            "model": self.model,
+            "max_tokens": 4096,
+            "system": SYSTEM_PROMPT,
+            "tools": [EXTRACT_TOOL],
+            "tool_choice": {"type": "tool", "name": "extract_receipt_items"},
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [
+                        {
+                            "type": "image",
+                            "source": {
+                                "type": "base64",
+                                "media_type": media_type,
+                                "data": image_data,
+                            },
+                        },
+                        {
+                            "type": "text",
+                            "text": "Extract all line items from this grocery receipt.",
+                        },
+                    ],
+                }
+            ],
+        }
+
+    async def _load_image(self, image_url: str) -> tuple[str, str, dict]:
+        """Download and preprocess the image. Returns (base64_data, media_type, preprocessing report).
+
+        The report (bytes and estimated vision tokens before and after) is
+        stored with the scan's raw extraction. RECEIPT_IMAGE_MAX_EDGE=0 sends
+        the image as downloaded, with an empty report.
+        """
+        data, media_type = await self._download_image(image_url)
+        report = {}
+        if settings.RECEIPT_IMAGE_MAX_EDGE > 0:
+            prepared = await asyncio.to_thread(prepare_receipt_image, data, media_type, settings.RECEIPT_IMAGE_MAX_EDGE)
+            data, media_type, report = prepared.data, prepared.media_type, prepared.report.as_dict()
+        return base64.b64encode(data).decode("utf-8"), media_type, report
 
-    async def _download_image(self, image_url: str) -> tuple[str, str]:
-        """Download image from URL, return (base64_data, media_type)."""
+    async def _download_image(self, image_url: str) -> tuple[bytes, str]:
+        """Download image from URL, return (bytes, media_type)."""
         try:
             async with httpx.AsyncClient(timeout=30, headers={"User-Agent": "PantryChef/1.0"}) as client:
                 resp = await client.get(image_url, follow_redirects=True)
@@ -224,28 +361,18 @@ class ClaudeOCRProvider(OCRProvider):
                 ext = "." + image_url.rsplit(".", 1)[-1].split("?")[0].lower() if "." in image_url else ""
                 media_type = MEDIA_TYPE_MAP.get(ext) or mimetypes.guess_type(image_url)[0] or "image/jpeg"
 
-        image_data = base64.b64encode(resp.content).decode("utf-8")
-        return image_data, media_type
+        return resp.content, media_type
 
-    def _parse_response(self, response) -> ReceiptExtractionResult:
+    def _parse_response(self, response, image_report: dict | None = None) -> ReceiptExtractionResult:
         """Extract tool_use block from Claude response and map to dataclass."""
         raw_response = response.model_dump()
+        if image_report:
+            raw_response["image_preprocessing"] = image_report
 
         for block in response.content:
             if block.type == "tool_use" and block.name == "extract_receipt_items":
                 tool_input = block.input
-                items = [
-                    ExtractedItem(
-                        raw_text=item["raw_text"],
-                        name=item["name"],
-                        quantity=item.get("quantity"),
-                        unit=item.get("unit"),
-                        price=item.get("price"),
-                        is_food=item.get("is_food", True),
-                        category_hint=item.get("category_hint"),
-                    )
-                    for item in tool_input.get("items", [])
-                ]
+                items = [extracted for item in tool_input.get("items", []) if (extracted := _extracted_item(item))]
                 food_count = sum(1 for i in items if i.is_food)
                 logger.info(
                     "[_parse_response] %d items (%d food, %d non-food) store=%s",
@@ -0,0 +1,151 @@
+import io
+import logging
+import math
+from dataclasses import asdict, dataclass
+
+import numpy as np
+from PIL import ExifTags, Image, ImageOps, UnidentifiedImageError
+
+from apps.receipts.services.base import OCRExtractionError
+
+logger = logging.getLogger(__name__)
+
+JPEG_QUALITY = 85
+# Claude scales images down to this long edge and about this many tokens before reading them
+VISION_MAX_EDGE = 1568
+VISION_MAX_TOKENS = 1600
+# Receipt detection runs on a thumbnail this big; crops smaller than these fractions of the photo are distrusted
+DETECT_EDGE = 256
+MIN_CROP_FRACTION = 0.2
+CROP_MARGIN = 0.02
+
+
+@dataclass
+class ImageReport:
+    """What preprocessing did to one receipt image, stored with the scan's raw extraction."""
+
+    original_bytes: int
+    sent_bytes: int
+    original_size: tuple[int, int]
+    sent_size: tuple[int, int]
+    cropped: bool
+    estimated_tokens_before: int
+    estimated_tokens_after: int
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass
+class PreparedImage:
+    data: bytes
+    media_type: str
+    report: ImageReport
+
+
+def estimate_vision_tokens(width: int, height: int) -> int:
+    """Approximate input tokens Claude charges for an image (width × height / 750 after its own downscale)."""
+    scale = min(1.0, VISION_MAX_EDGE / max(width, height))
+    return min(math.ceil(width * scale * height * scale / 750), VISION_MAX_TOKENS)
+
+
+def _receipt_box(gray: Image.Image) -> tuple[int, int, int, int] | None:
+    """Bounding box of the receipt (bright paper on a darker background), or None to keep the whole image.
+
+    Thresholds a thumbnail at its Otsu level, then keeps the columns, and
+    within them the rows, that are at least half as bright as the brightest
+    one, so stray highlights on the table don't widen the box.
+    """
+    thumb = gray.copy()
+    thumb.thumbnail((DETECT_EDGE, DETECT_EDGE))
+    pixels = np.asarray(thumb)
+
+    hist = np.bincount(pixels.ravel(), minlength=256).astype(float)
+    weight = np.cumsum(hist)
+    mass = np.cumsum(hist * np.arange(256))
+    below, above = weight, weight[-1] - weight
+    spread = below * above * (mass / np.maximum(below, 1) - (mass[-1] - mass) / np.maximum(above, 1)) ** 2
+    paper = pixels > np.argmax(spread)
+
+    columns = paper.mean(axis=0)
+    keep = np.flatnonzero(columns >= columns.max() / 2)
+    left, right = keep[0], keep[-1] + 1
+    rows = paper[:, left:right].mean(axis=1)
+    keep = np.flatnonzero(rows >= rows.max() / 2)
+    top, bottom = keep[0], keep[-1] + 1
+
+    height, width = paper.shape
+    if (right - left) < width * MIN_CROP_FRACTION or (bottom - top) < height * MIN_CROP_FRACTION:
+        return None  # no clear receipt in the frame
+    if (right - left) * (bottom - top) > 0.9 * width * height:
+        return None  # already fills the frame
+    scale_x, scale_y = gray.width / width, gray.height / height
+    margin_x, margin_y = gray.width * CROP_MARGIN, gray.height * CROP_MARGIN
+    return (
+        max(0, int(left * scale_x - margin_x)),
+        max(0, int(top * scale_y - margin_y)),
+        min(gray.width, math.ceil(right * scale_x + margin_x)),
+        min(gray.height, math.ceil(bottom * scale_y + margin_y)),
+    )
+
+
+def prepare_receipt_image(data: bytes, media_type: str, max_edge: int) -> PreparedImage:
+    """Decode, auto-orient, grayscale, crop to the receipt and downscale to max_edge, re-encoded as JPEG.
+
+    CPU-bound (about a quarter of a second for a 12 MP photo): call it off
+    the event loop. Bytes Pillow can't decode are passed through unchanged for Claude to
+    judge, and so is the original when it is already smaller and needs no
+    change.
+
+    Decision: max_edge defaults to Claude's own limit (VISION_MAX_EDGE) —
+    pixels beyond it are thrown away server-side, so sending them only costs
+    upload time. Grayscale and the crop cost the OCR nothing on a paper
+    receipt, and the crop moves the pixel budget from the table onto the
+    text. The estimated token counts in the report follow Claude's published
+    sizing rule, not a measurement.
+    """
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except Image.DecompressionBombError as exc:
+        raise OCRExtractionError(f"Image dimensions too large: {exc}") from exc
+    except (UnidentifiedImageError, OSError):
+        logger.warning("[prepare_receipt_image] could not decode %s (%d bytes), sending as is", media_type, len(data))
+        size = (0, 0)
+        return PreparedImage(data, media_type, ImageReport(len(data), len(data), size, size, False, 0, 0))
+
+    original_size = image.size
+    rotated = image.getexif().get(ExifTags.Base.Orientation, 1) != 1
+    gray = ImageOps.exif_transpose(image).convert("L")
+    box = _receipt_box(gray)
+    if box:
+        gray = gray.crop(box)
+    gray.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+
+    buffer = io.BytesIO()
+    gray.save(buffer, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    prepared, prepared_type = buffer.getvalue(), "image/jpeg"
+    unchanged = not rotated and not box and gray.size == original_size
+    if unchanged and len(prepared) >= len(data):
+        prepared, prepared_type = data, media_type
+
+    report = ImageReport(
+        original_bytes=len(data),
+        sent_bytes=len(prepared),
+        original_size=original_size,
+        sent_size=gray.size,
+        cropped=box is not None,
+        estimated_tokens_before=estimate_vision_tokens(*original_size),
+        estimated_tokens_after=estimate_vision_tokens(*gray.size),
+    )
+    logger.info(
+        "[prepare_receipt_image] %d bytes %dx%d → %d bytes %dx%d (cropped=%s), ~%d → ~%d vision tokens",
+        report.original_bytes,
+        *report.original_size,
+        report.sent_bytes,
+        *report.sent_size,
+        report.cropped,
+        report.estimated_tokens_before,
+        report.estimated_tokens_after,
+    )
+    return PreparedImage(prepared, prepared_type, report)
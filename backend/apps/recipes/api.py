@@ -1,26 +1,42 @@
 import logging
+from datetime import date, timedelta
 
 from django.core.exceptions import ValidationError
 from django.db import IntegrityError
+from django.db.models import Q, Sum
+from django.utils import timezone
 from ninja import Router
 from ninja.errors import HttpError
-from ninja.pagination import PageNumberPagination, paginate
+from ninja.pagination import paginate
 
+from apps.core.pagination import CursorPagination
 from apps.core.schemas import ErrorOut
 from apps.pantry.models import PantryItem
-from apps.recipes.models import CookingLog, Recipe, SavedRecipe
+from apps.recipes.models import CookingLog, Recipe, RecipeCookingStats, SavedRecipe, UserCookingStats
 from apps.recipes.schemas import (
+    RECIPE_CARD_FIELDS,
     CookingLogIn,
     CookingLogOut,
+    CookingStatsOut,
+    MostCookedRecipeOut,
+    NutritionGroup,
+    NutritionSummaryOut,
+    RecipeCardOut,
     RecipeDetailOut,
     RecipeSummaryOut,
+    RecipeView,
+    RecommendedRecipeOut,
+    SavedRecipeListOut,
     SavedRecipeOut,
     SaveRecipeNotesIn,
     SearchResultsOut,
     SuggestRecipesOut,
 )
 from apps.recipes.services.base import RecipeProviderError
+from apps.recipes.services.matching import deduct_pantry, match_recipe_ingredients
+from apps.recipes.services.nutrition import record_nutrition, summarize_nutrition
 from apps.recipes.services.spoonacular import SpoonacularProvider
+from apps.recipes.services.stats import live_streak, record_cooking
 
 logger = logging.getLogger(__name__)
 
@@ -30,22 +46,25 @@ router = Router(tags=["recipes"])
 recipe_provider = SpoonacularProvider()
 
 
-async def _resolve_recipe(recipe_id: str, fetch_if_missing: bool = True) -> Recipe:
+async def _resolve_recipe(recipe_id: str, fetch_if_missing: bool = True, only: tuple[str, ...] | None = None) -> Recipe:
     """Resolve a recipe by internal UUID or Spoonacular external_id.
 
     Decision: Accept either format to allow flexible client usage — internal
     UUID for cached recipes, external_id for fresh results from suggest/search.
     When fetch_if_missing=True, fetches from Spoonacular and caches in DB.
+    `only` restricts the columns read for cached recipes (e.g. RECIPE_CARD_FIELDS).
     """
+    qs = Recipe.objects.only(*only) if only else Recipe.objects.all()
+
     # Try UUID lookup first
     try:
-        return await Recipe.objects.aget(id=recipe_id)
+        return await qs.aget(id=recipe_id)
     except (Recipe.DoesNotExist, ValueError, ValidationError):
         pass
 
     # Try external_id lookup
     try:
-        return await Recipe.objects.aget(external_id=recipe_id, source="spoonacular")
+        return await qs.aget(external_id=recipe_id, source="spoonacular")
     except Recipe.DoesNotExist:
         pass
 
@@ -60,25 +79,53 @@ async def _resolve_recipe(recipe_id: str, fetch_if_missing: bool = True) -> Reci
         logger.exception("[_resolve_recipe] provider error for %s", recipe_id)
         raise HttpError(502, f"Failed to fetch recipe: {exc}") from exc
 
-    recipe, _created = await Recipe.objects.aget_or_create(
+    recipe, created = await Recipe.objects.aget_or_create(
         source=detail.source,
         external_id=detail.external_id,
-        defaults={
-            "title": detail.title,
-            "description": detail.description,
-            "instructions": detail.instructions,
-            "ingredients_json": detail.ingredients_json,
-            "prep_time_minutes": detail.prep_time_minutes,
-            "cook_time_minutes": detail.cook_time_minutes,
-            "servings": detail.servings,
-            "image_url": detail.image_url,
-            "nutrition": detail.nutrition,
-            "source_url": detail.source_url,
-        },
+        defaults=detail.as_recipe_fields(),
     )
+    if created:
+        await match_recipe_ingredients([recipe])
     return recipe
 
 
+def _recipe_detail_out(recipe: Recipe, is_saved: bool) -> RecipeDetailOut:
+    return RecipeDetailOut(
+        id=recipe.id,
+        external_id=recipe.external_id,
+        source=recipe.source,
+        title=recipe.title,
+        description=recipe.description,
+        instructions=recipe.instructions,
+        ingredients_json=recipe.ingredients_json,
+        prep_time_minutes=recipe.prep_time_minutes,
+        cook_time_minutes=recipe.cook_time_minutes,
+        servings=recipe.servings,
+        difficulty=recipe.difficulty,
+        image_url=recipe.image_url,
+        nutrition=recipe.nutrition,
+        source_url=recipe.source_url,
+        is_saved=is_saved,
+        created_at=recipe.created_at,
+        updated_at=recipe.updated_at,
+    )
+
+
+def _recipe_card_out(recipe: Recipe, is_saved: bool) -> RecipeCardOut:
+    return RecipeCardOut(
+        id=recipe.id,
+        external_id=recipe.external_id,
+        source=recipe.source,
+        title=recipe.title,
+        image_url=recipe.image_url,
+        prep_time_minutes=recipe.prep_time_minutes,
+        cook_time_minutes=recipe.cook_time_minutes,
+        servings=recipe.servings,
+        difficulty=recipe.difficulty,
+        is_saved=is_saved,
+    )
+
+
 async def _annotate_is_saved(user, summaries: list[RecipeSummaryOut]) -> list[RecipeSummaryOut]:
     """Batch-annotate is_saved on a list of recipe summaries."""
     external_ids = [s.external_id for s in summaries]
@@ -258,38 +305,144 @@ async def search_recipes(
     return SearchResultsOut(items=results, total_results=total)
 
 
-@router.get("/saved", response=list[SavedRecipeOut])
-@paginate(PageNumberPagination, page_size=20)
-async def list_saved_recipes(request):
-    """List the authenticated user's saved recipes.
+@router.get("/saved", response=list[SavedRecipeListOut])
+@paginate(CursorPagination, ordering=("-created_at", "-id"))
+async def list_saved_recipes(request, view: RecipeView = "full"):
+    """List the authenticated user's saved recipes, most recently saved first.
 
-    Returns saved recipes with full recipe details, ordered by most recently saved.
+    view=full (default) returns full recipe details; view=summary returns only
+    the card fields, and reads only those columns from the recipes table.
     """
-    return SavedRecipe.objects.filter(user=request.auth).select_related("recipe").order_by("-created_at")
+    qs = SavedRecipe.objects.filter(user=request.auth).select_related("recipe")
+    if view == "summary":
+        qs = qs.only("id", "notes", "created_at", "recipe", *(f"recipe__{f}" for f in RECIPE_CARD_FIELDS))
+    return qs
 
 
 @router.get("/history", response=list[CookingLogOut])
-@paginate(PageNumberPagination, page_size=20)
+@paginate(CursorPagination, ordering=("-cooked_at", "-id"))
 async def cooking_history(request):
     """List the authenticated user's cooking history, newest first.
 
     Returns denormalized recipe info (title, image) alongside log data.
     """
-    logs = CookingLog.objects.filter(user=request.auth).select_related("recipe").order_by("-cooked_at")
-    results = []
-    async for log in logs:
-        results.append(
-            CookingLogOut(
-                id=log.id,
-                recipe_id=log.recipe_id,
-                recipe_title=log.recipe.title,
-                recipe_image_url=log.recipe.image_url,
-                cooked_at=log.cooked_at,
-                rating=log.rating,
-                notes=log.notes,
-            )
+    return CookingLog.objects.filter(user=request.auth).select_related("recipe")
+
+
+@router.get("/stats", response=CookingStatsOut)
+async def cooking_stats(request, top: int = 5):
+    """Cooking statistics for the authenticated user: totals, average rating,
+    streaks and the `top` most-cooked recipes (1-20, default 5).
+
+    Decision: Served from the UserCookingStats/RecipeCookingStats rollups that
+    log_cooking maintains, so the cost is two indexed reads no matter how long
+    the cooking log gets.
+    """
+    top = max(1, min(top, 20))
+    try:
+        stats = await UserCookingStats.objects.aget(user=request.auth)
+    except UserCookingStats.DoesNotExist:
+        return CookingStatsOut()
+
+    most_cooked = [
+        MostCookedRecipeOut(
+            recipe_id=row.recipe_id,
+            title=row.recipe.title,
+            image_url=row.recipe.image_url,
+            times_cooked=row.times_cooked,
+            average_rating=row.rating_sum / row.rated_count if row.rated_count else None,
+            last_cooked_at=row.last_cooked_at,
         )
-    return results
+        async for row in RecipeCookingStats.objects.filter(user=request.auth)
+        .select_related("recipe")
+        .only(
+            "recipe_id",
+            "times_cooked",
+            "rated_count",
+            "rating_sum",
+            "last_cooked_at",
+            "recipe__title",
+            "recipe__image_url",
+        )
+        .order_by("-times_cooked", "-last_cooked_at")[:top]
+    ]
+
+    return CookingStatsOut(
+        total_cooked=stats.total_cooked,
+        distinct_recipes=stats.distinct_recipes,
+        average_rating=stats.rating_sum / stats.rated_count if stats.rated_count else None,
+        current_streak=live_streak(stats.current_streak, stats.last_cooked_date, timezone.localdate()),
+        longest_streak=stats.longest_streak,
+        last_cooked_date=stats.last_cooked_date,
+        most_cooked=most_cooked,
+    )
+
+
+@router.get("/recommended", response=list[RecommendedRecipeOut])
+async def recommended_recipes(request, limit: int = 20):
+    """Personalized recommendations from the precomputed item-item similarity table.
+
+    Sums each candidate's similarity to every recipe the user has cooked or
+    saved, excluding those recipes themselves. Returns up to `limit` (1-50)
+    recipe cards, best first; empty until the user has history and
+    build_recipe_similarity has run.
+
+    Decision: One query, no upstream call — the neighbours are built offline,
+    so this endpoint only reads and ranks them.
+    """
+    limit = max(1, min(limit, 50))
+    user = request.auth
+    cooked = RecipeCookingStats.objects.filter(user=user).values("recipe_id")
+    saved = SavedRecipe.objects.filter(user=user).values("recipe_id")
+
+    recipes = (
+        Recipe.objects.filter(Q(neighbor_of__recipe_id__in=cooked) | Q(neighbor_of__recipe_id__in=saved))
+        .exclude(id__in=cooked)
+        .exclude(id__in=saved)
+        .annotate(score=Sum("neighbor_of__score"))
+        .only(*RECIPE_CARD_FIELDS)
+        .order_by("-score", "id")[:limit]
+    )
+    return [recipe async for recipe in recipes]
+
+
+# Longest range /recipes/nutrition will aggregate in one request
+MAX_NUTRITION_RANGE_DAYS = 366
+
+
+@router.get("/nutrition", response={200: NutritionSummaryOut, 400: ErrorOut})
+async def nutrition_summary(
+    request,
+    start: date | None = None,
+    end: date | None = None,
+    group: NutritionGroup = "day",
+):
+    """Nutrient intake from cooked recipes between start and end (inclusive).
+
+    Defaults to the last 30 days ending today. Each cooking log counts as one
+    serving of the recipe. Returns totals, the per-day average over the range
+    and day/week/month buckets. Ranges longer than 366 days are rejected (400).
+
+    Decision: Answered from the DailyNutrition rollup that log_cooking keeps up
+    to date, so a months-long range is a few hundred small rows, never a scan
+    of CookingLog joined to recipe JSON.
+    """
+    end = end or timezone.localdate()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HttpError(400, "start must be on or before end")
+    if (end - start).days + 1 > MAX_NUTRITION_RANGE_DAYS:
+        raise HttpError(400, f"Range cannot exceed {MAX_NUTRITION_RANGE_DAYS} days")
+
+    summary = await summarize_nutrition(request.auth, start, end, group)
+    return NutritionSummaryOut(
+        start=start,
+        end=end,
+        group=group,
+        totals=summary.totals,
+        daily_average=summary.daily_average,
+        buckets=summary.buckets,
+    )
 
 
 # ---------------------------------------------------------------------------
@@ -297,37 +450,22 @@ async def cooking_history(request):
 # ---------------------------------------------------------------------------
 
 
-@router.get("/{recipe_id}", response={200: RecipeDetailOut, 404: ErrorOut, 502: ErrorOut})
-async def get_recipe(request, recipe_id: str):
-    """Get full recipe details by internal UUID or Spoonacular external_id.
+@router.get("/{recipe_id}", response={200: RecipeDetailOut | RecipeCardOut, 404: ErrorOut, 502: ErrorOut})
+async def get_recipe(request, recipe_id: str, view: RecipeView = "full"):
+    """Get recipe details by internal UUID or Spoonacular external_id.
 
     Decision: Cache-on-first-access — if the recipe isn't in our DB yet,
     it's fetched from Spoonacular and stored for future lookups.
+    view=summary returns only the card fields (RecipeCardOut).
     """
     user = request.auth
-    recipe = await _resolve_recipe(recipe_id)
+    recipe = await _resolve_recipe(recipe_id, only=RECIPE_CARD_FIELDS if view == "summary" else None)
 
     is_saved = await SavedRecipe.objects.filter(user=user, recipe=recipe).aexists()
 
-    return RecipeDetailOut(
-        id=recipe.id,
-        external_id=recipe.external_id,
-        source=recipe.source,
-        title=recipe.title,
-        description=recipe.description,
-        instructions=recipe.instructions,
-        ingredients_json=recipe.ingredients_json,
-        prep_time_minutes=recipe.prep_time_minutes,
-        cook_time_minutes=recipe.cook_time_minutes,
-        servings=recipe.servings,
-        difficulty=recipe.difficulty,
-        image_url=recipe.image_url,
-        nutrition=recipe.nutrition,
-        source_url=recipe.source_url,
-        is_saved=is_saved,
-        created_at=recipe.created_at,
-        updated_at=recipe.updated_at,
-    )
+    if view == "summary":
+        return _recipe_card_out(recipe, is_saved)
+    return _recipe_detail_out(recipe, is_saved)
 
 
 @router.post(
@@ -354,28 +492,9 @@ async def save_recipe(request, recipe_id: str, payload: SaveRecipeNotesIn | None
 
     logger.info("[save_recipe] user=%s recipe=%s", user.id, recipe.id)
 
-    is_saved = True
     return 201, SavedRecipeOut(
         id=saved.id,
-        recipe=RecipeDetailOut(
-            id=recipe.id,
-            external_id=recipe.external_id,
-            source=recipe.source,
-            title=recipe.title,
-            description=recipe.description,
-            instructions=recipe.instructions,
-            ingredients_json=recipe.ingredients_json,
-            prep_time_minutes=recipe.prep_time_minutes,
-            cook_time_minutes=recipe.cook_time_minutes,
-            servings=recipe.servings,
-            difficulty=recipe.difficulty,
-            image_url=recipe.image_url,
-            nutrition=recipe.nutrition,
-            source_url=recipe.source_url,
-            is_saved=is_saved,
-            created_at=recipe.created_at,
-            updated_at=recipe.updated_at,
-        ),
+        recipe=_recipe_detail_out(recipe, is_saved=True),
         notes=saved.notes,
         created_at=saved.created_at,
     )
@@ -412,8 +531,14 @@ async def unsave_recipe(request, recipe_id: str):
 async def log_cooking(request, recipe_id: str, payload: CookingLogIn | None = None):
     """Log that the user cooked a recipe.
 
-    Decision: No automatic pantry deduction — ingredient name matching is
-    complex and deferred to a future iteration. Just logs the event.
+    Logs the event and folds it into the cooking stats and daily nutrition
+    rollups (see /recipes/stats and /recipes/nutrition). With
+    deduct_pantry=true, also decrements the matching available pantry items
+    by the recipe's amounts.
+
+    Decision: Deduction is opt-in and uses the RecipeIngredientMatch rows built
+    when the recipe was cached — no name matching on the request path. Items in
+    a different unit than the recipe are left untouched rather than guessed at.
     """
     user = request.auth
     recipe = await _resolve_recipe(recipe_id)
@@ -425,14 +550,11 @@ async def log_cooking(request, recipe_id: str, payload: CookingLogIn | None = No
         notes=payload.notes if payload else None,
     )
 
+    await record_cooking(log)
+    await record_nutrition(log, recipe)
+    if payload and payload.deduct_pantry:
+        log.deducted_pantry_item_ids = await deduct_pantry(user, recipe)
+
     logger.info("[log_cooking] user=%s recipe=%s rating=%s", user.id, recipe.id, log.rating)
 
-    return 201, CookingLogOut(
-        id=log.id,
-        recipe_id=recipe.id,
-        recipe_title=recipe.title,
-        recipe_image_url=recipe.image_url,
-        cooked_at=log.cooked_at,
-        rating=log.rating,
-        notes=log.notes,
-    )
+    return 201, log
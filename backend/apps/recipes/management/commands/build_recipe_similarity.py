@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from apps.recipes.services.similarity import build_recipe_similarity
+
+
+class Command(BaseCommand):
+    help = "Rebuild the item-item recipe similarity table used by /recipes/recommended"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--top-k",
+            type=int,
+            default=20,
+            help="Neighbours stored per recipe (default: 20)",
+        )
+
+    def handle(self, *args, **options):
+        result = build_recipe_similarity(top_k=max(1, options["top_k"]))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Stored {result.pairs} neighbour pairs for {result.recipes} recipes from {result.users} users"
+            )
+        )
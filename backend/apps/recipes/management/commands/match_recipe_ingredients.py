@@ -0,0 +1,36 @@
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand
+
+from apps.recipes.models import Recipe
+from apps.recipes.services.matching import match_recipe_ingredients
+
+
+class Command(BaseCommand):
+    help = "Re-match cached recipes' ingredients to Ingredient rows (used for pantry deduction)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=200,
+            help="Recipes matched per batch (default: 200)",
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options["chunk_size"])
+        recipes_done = matches = 0
+        last_id = None
+        while True:
+            qs = Recipe.objects.only("id", "ingredients_json").order_by("id")
+            if last_id is not None:
+                qs = qs.filter(id__gt=last_id)
+            chunk = list(qs[:chunk_size])
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+            # Decision: async_to_sync rather than asyncio.run so the async ORM calls
+            # share this thread's DB connection (required for tests and transactions).
+            matches += async_to_sync(match_recipe_ingredients)(chunk)
+            recipes_done += len(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f"Matched {matches} ingredients across {recipes_done} recipes"))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from apps.recipes.services.stats import rebuild_cooking_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the cooking stats and daily nutrition rollups from the cooking log"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Users reconciled per transaction (default: 500)",
+        )
+
+    def handle(self, *args, **options):
+        result = rebuild_cooking_stats(chunk_size=max(1, options["chunk_size"]))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt cooking stats for {result.users} users "
+                f"({result.recipe_rows} recipe rows, {result.nutrition_days} nutrition days)"
+            )
+        )
@@ -0,0 +1,55 @@
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.recipes.services.refresh import refresh_stale_recipes
+from apps.recipes.services.spoonacular import SpoonacularProvider
+
+
+class Command(BaseCommand):
+    help = "Re-fetch cached Spoonacular recipes older than the cache TTL"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ttl-days",
+            type=int,
+            default=settings.RECIPE_CACHE_TTL_DAYS,
+            help=f"Refresh recipes not updated in this many days (default: {settings.RECIPE_CACHE_TTL_DAYS})",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.RECIPE_REFRESH_BATCH_SIZE,
+            help=f"Recipes per informationBulk call, max 100 (default: {settings.RECIPE_REFRESH_BATCH_SIZE})",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.RECIPE_REFRESH_CONCURRENCY,
+            help=f"Maximum batches in flight (default: {settings.RECIPE_REFRESH_CONCURRENCY})",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=None,
+            help="Refresh at most this many recipes, oldest first (default: all stale)",
+        )
+
+    def handle(self, *args, **options):
+        # Decision: async_to_sync rather than asyncio.run so the async ORM calls
+        # share this thread's DB connection (required for tests and transactions).
+        result = async_to_sync(refresh_stale_recipes)(
+            SpoonacularProvider(),
+            ttl=timedelta(days=options["ttl_days"]),
+            batch_size=options["batch_size"],
+            concurrency=options["concurrency"],
+            limit=options["limit"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Refreshed {result.refreshed} of {result.stale} stale recipes "
+                f"({result.missing} missing upstream, {result.failed} failed)"
+            )
+        )
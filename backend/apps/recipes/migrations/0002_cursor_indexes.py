@@ -0,0 +1,22 @@
+# Generated by Django 6.0.2 on 2026-10-19 08:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="cookinglog",
+            index=models.Index(fields=["user", "-cooked_at", "-id"], name="cooking_log_user_cursor_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="savedrecipe",
+            index=models.Index(fields=["user", "-created_at", "-id"], name="saved_recipe_user_cursor_idx"),
+        ),
+    ]
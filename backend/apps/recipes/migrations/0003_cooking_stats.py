@@ -0,0 +1,86 @@
+# Generated by Django 6.0.2 on 2026-10-19 09:00
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+# New public tables get the same deny-all RLS as core.0001_enable_rls_deny_all
+RLS_TABLES = ["recipe_cooking_stats", "user_cooking_stats"]
+
+
+def enable_rls(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for table in RLS_TABLES:
+        schema_editor.execute(f"ALTER TABLE public.{table} ENABLE ROW LEVEL SECURITY;")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0002_cursor_indexes"),
+        ("users", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserCookingStats",
+            fields=[
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "user",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="cooking_stats",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                ("total_cooked", models.IntegerField(default=0)),
+                ("distinct_recipes", models.IntegerField(default=0)),
+                ("rated_count", models.IntegerField(default=0)),
+                ("rating_sum", models.IntegerField(default=0)),
+                ("current_streak", models.IntegerField(default=0)),
+                ("longest_streak", models.IntegerField(default=0)),
+                ("last_cooked_date", models.DateField(blank=True, null=True)),
+            ],
+            options={
+                "db_table": "user_cooking_stats",
+            },
+        ),
+        migrations.CreateModel(
+            name="RecipeCookingStats",
+            fields=[
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("id", models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ("times_cooked", models.IntegerField(default=0)),
+                ("rated_count", models.IntegerField(default=0)),
+                ("rating_sum", models.IntegerField(default=0)),
+                ("last_cooked_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "recipe",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="cooking_stats", to="recipes.recipe"
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="recipe_cooking_stats",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "recipe_cooking_stats",
+                "indexes": [models.Index(fields=["user", "-times_cooked"], name="recipe_stats_user_top_idx")],
+                "constraints": [models.UniqueConstraint(fields=("user", "recipe"), name="unique_recipe_cooking_stats")],
+            },
+        ),
+        migrations.RunPython(enable_rls, migrations.RunPython.noop),
+    ]
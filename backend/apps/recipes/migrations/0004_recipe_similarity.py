@@ -0,0 +1,48 @@
+# Generated by Django 6.0.2 on 2026-10-19 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+RLS_TABLES = ["recipe_similarities"]
+
+
+def enable_rls(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for table in RLS_TABLES:
+        schema_editor.execute(f"ALTER TABLE public.{table} ENABLE ROW LEVEL SECURITY;")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0003_cooking_stats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecipeSimilarity",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("score", models.FloatField()),
+                (
+                    "neighbor",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="neighbor_of", to="recipes.recipe"
+                    ),
+                ),
+                (
+                    "recipe",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="similarities", to="recipes.recipe"
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "recipe_similarities",
+                "constraints": [
+                    models.UniqueConstraint(fields=("recipe", "neighbor"), name="unique_recipe_similarity")
+                ],
+            },
+        ),
+        migrations.RunPython(enable_rls, migrations.RunPython.noop),
+    ]
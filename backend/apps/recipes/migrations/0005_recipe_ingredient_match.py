@@ -0,0 +1,55 @@
+# Generated by Django 6.0.2 on 2026-10-19 11:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+RLS_TABLES = ["recipe_ingredient_matches"]
+
+
+def enable_rls(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for table in RLS_TABLES:
+        schema_editor.execute(f"ALTER TABLE public.{table} ENABLE ROW LEVEL SECURITY;")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("ingredients", "0001_initial"),
+        ("recipes", "0004_recipe_similarity"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecipeIngredientMatch",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("position", models.SmallIntegerField(help_text="Index of the entry in Recipe.ingredients_json")),
+                ("amount", models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ("unit", models.CharField(blank=True, default="", help_text="Normalized unit", max_length=50)),
+                (
+                    "ingredient",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="recipe_matches",
+                        to="ingredients.ingredient",
+                    ),
+                ),
+                (
+                    "recipe",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ingredient_matches",
+                        to="recipes.recipe",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "recipe_ingredient_matches",
+                "constraints": [
+                    models.UniqueConstraint(fields=("recipe", "position"), name="unique_recipe_ingredient_position")
+                ],
+            },
+        ),
+        migrations.RunPython(enable_rls, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 6.0.2 on 2026-10-19 12:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+RLS_TABLES = ["daily_nutrition"]
+
+
+def enable_rls(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for table in RLS_TABLES:
+        schema_editor.execute(f"ALTER TABLE public.{table} ENABLE ROW LEVEL SECURITY;")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0005_recipe_ingredient_match"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyNutrition",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("date", models.DateField()),
+                ("servings", models.IntegerField(default=0)),
+                ("calories", models.FloatField(default=0)),
+                ("protein_g", models.FloatField(default=0)),
+                ("carbohydrates_g", models.FloatField(default=0)),
+                ("fat_g", models.FloatField(default=0)),
+                ("fiber_g", models.FloatField(default=0)),
+                ("sugar_g", models.FloatField(default=0)),
+                ("sodium_mg", models.FloatField(default=0)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_nutrition",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "daily_nutrition",
+                "constraints": [models.UniqueConstraint(fields=("user", "date"), name="unique_daily_nutrition")],
+            },
+        ),
+        migrations.RunPython(enable_rls, migrations.RunPython.noop),
+    ]
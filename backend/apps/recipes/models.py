@@ -1,7 +1,7 @@
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
 
-from apps.core.models import AbstractUUIDTimestampModel
+from apps.core.models import AbstractTimestampModel, AbstractUUIDTimestampModel
 
 
 class Recipe(AbstractUUIDTimestampModel):
@@ -53,6 +53,9 @@ class SavedRecipe(AbstractUUIDTimestampModel):
                 name="unique_saved_recipe",
             ),
         ]
+        indexes = [
+            models.Index(fields=["user", "-created_at", "-id"], name="saved_recipe_user_cursor_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user} saved {self.recipe}"
@@ -80,6 +83,174 @@ class CookingLog(AbstractUUIDTimestampModel):
     class Meta:
         db_table = "cooking_log"
         ordering = ["-cooked_at"]
+        indexes = [
+            models.Index(fields=["user", "-cooked_at", "-id"], name="cooking_log_user_cursor_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user} cooked {self.recipe}"
+
+
+class UserCookingStats(AbstractTimestampModel):
+    """Per-user rollup of CookingLog, maintained incrementally by log_cooking.
+
+    Decision: Streaks are stored as "consecutive days ending at last_cooked_date";
+    whether the streak is still alive is decided at read time against today.
+    """
+
+    user = models.OneToOneField(
+        "users.User",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="cooking_stats",
+    )
+    total_cooked = models.IntegerField(default=0)
+    distinct_recipes = models.IntegerField(default=0)
+    rated_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    current_streak = models.IntegerField(default=0)
+    longest_streak = models.IntegerField(default=0)
+    last_cooked_date = models.DateField(null=True, blank=True)
+
+    class Meta:
+        db_table = "user_cooking_stats"
+
+    def __str__(self):
+        return f"{self.user} cooked {self.total_cooked}x"
+
+
+class RecipeCookingStats(AbstractUUIDTimestampModel):
+    """Per-user, per-recipe rollup of CookingLog (times cooked, ratings)."""
+
+    user = models.ForeignKey(
+        "users.User",
+        on_delete=models.CASCADE,
+        related_name="recipe_cooking_stats",
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="cooking_stats",
+    )
+    times_cooked = models.IntegerField(default=0)
+    rated_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    last_cooked_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "recipe_cooking_stats"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "recipe"],
+                name="unique_recipe_cooking_stats",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["user", "-times_cooked"], name="recipe_stats_user_top_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} cooked {self.recipe} {self.times_cooked}x"
+
+
+class RecipeSimilarity(models.Model):
+    """Precomputed item-item neighbour: `neighbor` is one of `recipe`'s top-K most similar recipes.
+
+    Written only by build_recipe_similarity (offline); read by /recipes/recommended.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="similarities",
+    )
+    neighbor = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="neighbor_of",
+    )
+    score = models.FloatField()
+
+    class Meta:
+        db_table = "recipe_similarities"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipe", "neighbor"],
+                name="unique_recipe_similarity",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.recipe_id} ~ {self.neighbor_id} ({self.score:.3f})"
+
+
+class RecipeIngredientMatch(models.Model):
+    """A Recipe.ingredients_json entry resolved to an Ingredient row.
+
+    Built once when a recipe is cached (services.matching), so pantry deduction
+    on log_cooking is a plain lookup with no name matching on the request path.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="ingredient_matches",
+    )
+    ingredient = models.ForeignKey(
+        "ingredients.Ingredient",
+        on_delete=models.CASCADE,
+        related_name="recipe_matches",
+    )
+    position = models.SmallIntegerField(help_text="Index of the entry in Recipe.ingredients_json")
+    amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    unit = models.CharField(max_length=50, blank=True, default="", help_text="Normalized unit")
+
+    class Meta:
+        db_table = "recipe_ingredient_matches"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipe", "position"],
+                name="unique_recipe_ingredient_position",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.recipe_id}[{self.position}] → {self.ingredient_id}"
+
+
+class DailyNutrition(models.Model):
+    """Per-user, per-day nutrient intake from cooked recipes, one serving per CookingLog.
+
+    Maintained incrementally by log_cooking and rebuilt by rebuild_cooking_stats.
+    Columns mirror services.nutrition.NUTRIENTS.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(
+        "users.User",
+        on_delete=models.CASCADE,
+        related_name="daily_nutrition",
+    )
+    date = models.DateField()
+    servings = models.IntegerField(default=0)
+    calories = models.FloatField(default=0)
+    protein_g = models.FloatField(default=0)
+    carbohydrates_g = models.FloatField(default=0)
+    fat_g = models.FloatField(default=0)
+    fiber_g = models.FloatField(default=0)
+    sugar_g = models.FloatField(default=0)
+    sodium_mg = models.FloatField(default=0)
+
+    class Meta:
+        db_table = "daily_nutrition"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "date"],
+                name="unique_daily_nutrition",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.date}: {self.calories:.0f} kcal"
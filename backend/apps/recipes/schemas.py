@@ -1,7 +1,26 @@
 import uuid
-from datetime import datetime
+from datetime import date, datetime
+from typing import Annotated, Literal
 
 from ninja import Field, Schema
+from pydantic import Discriminator, Tag
+
+# Response projection for recipe endpoints: "summary" is enough to draw a recipe
+# card; "full" adds description, instructions, ingredients and nutrition.
+RecipeView = Literal["summary", "full"]
+
+# Recipe columns read for the summary view — pushed down to the queryset via .only()
+RECIPE_CARD_FIELDS = (
+    "id",
+    "external_id",
+    "source",
+    "title",
+    "image_url",
+    "prep_time_minutes",
+    "cook_time_minutes",
+    "servings",
+    "difficulty",
+)
 
 
 class RecipeSummaryOut(Schema):
@@ -17,6 +36,23 @@ class RecipeSummaryOut(Schema):
     is_saved: bool = False
 
 
+class RecipeCardOut(Schema):
+    id: uuid.UUID
+    external_id: str | None = None
+    source: str
+    title: str
+    image_url: str | None = None
+    prep_time_minutes: int | None = None
+    cook_time_minutes: int | None = None
+    servings: int | None = None
+    difficulty: str | None = None
+    is_saved: bool = False
+
+
+class RecommendedRecipeOut(RecipeCardOut):
+    score: float = Field(description="Summed similarity to recipes the user has cooked or saved")
+
+
 class RecipeDetailOut(Schema):
     id: uuid.UUID
     external_id: str | None = None
@@ -61,6 +97,33 @@ class SavedRecipeOut(Schema):
     created_at: datetime
 
 
+class SavedRecipeCardOut(Schema):
+    id: uuid.UUID
+    recipe: RecipeCardOut
+    notes: str | None = None
+    created_at: datetime
+
+
+def _saved_recipe_view(value) -> str:
+    """Pick the output schema for a saved-recipe row.
+
+    Decision: Summary rows are loaded with .only(RECIPE_CARD_FIELDS), so the view
+    is read off the deferred columns instead of trying RecipeDetailOut first —
+    touching a deferred field would fire a sync query from the async view.
+    """
+    if isinstance(value, SavedRecipeCardOut):
+        return "summary"
+    if isinstance(value, SavedRecipeOut):
+        return "full"
+    return "summary" if "instructions" in value.recipe.get_deferred_fields() else "full"
+
+
+SavedRecipeListOut = Annotated[
+    Annotated[SavedRecipeOut, Tag("full")] | Annotated[SavedRecipeCardOut, Tag("summary")],
+    Discriminator(_saved_recipe_view),
+]
+
+
 class CookingLogOut(Schema):
     id: uuid.UUID
     recipe_id: uuid.UUID
@@ -69,11 +132,73 @@ class CookingLogOut(Schema):
     cooked_at: datetime
     rating: int | None = None
     notes: str | None = None
+    deducted_pantry_item_ids: list[uuid.UUID] = Field(
+        default_factory=list, description="Pantry items decremented by this log (deduct_pantry=true only)"
+    )
+
+    @staticmethod
+    def resolve_recipe_title(obj):
+        if isinstance(obj, dict):
+            return obj.get("recipe_title")
+        return obj.recipe.title
+
+    @staticmethod
+    def resolve_recipe_image_url(obj):
+        if isinstance(obj, dict):
+            return obj.get("recipe_image_url")
+        return obj.recipe.image_url
+
+
+class MostCookedRecipeOut(Schema):
+    recipe_id: uuid.UUID
+    title: str
+    image_url: str | None = None
+    times_cooked: int
+    average_rating: float | None = None
+    last_cooked_at: datetime | None = None
+
+
+class CookingStatsOut(Schema):
+    total_cooked: int = 0
+    distinct_recipes: int = 0
+    average_rating: float | None = Field(default=None, description="Mean of all rated logs, null if none rated")
+    current_streak: int = Field(default=0, description="Consecutive days cooked, ending today or yesterday")
+    longest_streak: int = 0
+    last_cooked_date: date | None = None
+    most_cooked: list[MostCookedRecipeOut] = Field(default_factory=list)
+
+
+NutritionGroup = Literal["day", "week", "month"]
+
+
+class NutritionTotalsOut(Schema):
+    servings: float = 0
+    calories: float = 0
+    protein_g: float = 0
+    carbohydrates_g: float = 0
+    fat_g: float = 0
+    fiber_g: float = 0
+    sugar_g: float = 0
+    sodium_mg: float = 0
+
+
+class NutritionBucketOut(NutritionTotalsOut):
+    period_start: date = Field(description="First day of the day/week (Monday)/month bucket")
+
+
+class NutritionSummaryOut(Schema):
+    start: date
+    end: date
+    group: NutritionGroup
+    totals: NutritionTotalsOut
+    daily_average: NutritionTotalsOut = Field(description="totals divided by the number of days in the range")
+    buckets: list[NutritionBucketOut] = Field(description="Only periods with at least one logged serving")
 
 
 class CookingLogIn(Schema):
     rating: int | None = Field(default=None, ge=1, le=5, description="Rating from 1-5")
     notes: str | None = None
+    deduct_pantry: bool = Field(default=False, description="Decrement matching pantry items by the recipe's amounts")
 
 
 class SaveRecipeNotesIn(Schema):
@@ -31,6 +31,21 @@ class RecipeDetail:
     source_url: str | None = None
     diets: list[str] = field(default_factory=list)
 
+    def as_recipe_fields(self) -> dict:
+        """Map to Recipe model fields (everything except the source/external_id key)."""
+        return {
+            "title": self.title,
+            "description": self.description,
+            "instructions": self.instructions,
+            "ingredients_json": self.ingredients_json,
+            "prep_time_minutes": self.prep_time_minutes,
+            "cook_time_minutes": self.cook_time_minutes,
+            "servings": self.servings,
+            "image_url": self.image_url,
+            "nutrition": self.nutrition,
+            "source_url": self.source_url,
+        }
+
 
 class RecipeProviderError(Exception):
     """Raised when an external recipe API call fails."""
@@ -55,6 +70,13 @@ class RecipeProvider(ABC):
     async def get_recipe_detail(self, external_id: str) -> RecipeDetail:
         """Get full recipe details by external (Spoonacular) ID."""
 
+    @abstractmethod
+    async def get_recipe_details_bulk(self, external_ids: list[str]) -> list[RecipeDetail]:
+        """Get full recipe details for several external IDs in a single call.
+
+        Recipes the provider no longer knows about are omitted from the result.
+        """
+
     @abstractmethod
     async def get_popular(
         self,
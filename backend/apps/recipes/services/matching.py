@@ -0,0 +1,253 @@
+import logging
+import re
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from asgiref.sync import sync_to_async
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.ingredients.models import Ingredient
+from apps.pantry.counters import apply_pantry_change
+from apps.pantry.models import PantryItem
+from apps.pantry.versioning import bump_pantry_versions
+from apps.recipes.models import Recipe, RecipeIngredientMatch
+
+logger = logging.getLogger(__name__)
+
+# Spelling variants Spoonacular and users both produce, mapped to one canonical unit.
+# Deduction only happens when recipe and pantry units normalize to the same string;
+# unitless counts ("2 eggs") are pieces, like PantryItem's default unit.
+UNIT_ALIASES = {
+    "": "piece",
+    "g": "g",
+    "gram": "g",
+    "grams": "g",
+    "kg": "kg",
+    "kilogram": "kg",
+    "kilograms": "kg",
+    "ml": "ml",
+    "milliliter": "ml",
+    "milliliters": "ml",
+    "l": "l",
+    "liter": "l",
+    "liters": "l",
+    "oz": "oz",
+    "ounce": "oz",
+    "ounces": "oz",
+    "lb": "lb",
+    "lbs": "lb",
+    "pound": "lb",
+    "pounds": "lb",
+    "tsp": "tsp",
+    "teaspoon": "tsp",
+    "teaspoons": "tsp",
+    "tbsp": "tbsp",
+    "tbs": "tbsp",
+    "tablespoon": "tbsp",
+    "tablespoons": "tbsp",
+    "cup": "cup",
+    "cups": "cup",
+    "piece": "piece",
+    "pieces": "piece",
+    "serving": "piece",
+    "servings": "piece",
+    "large": "piece",
+    "medium": "piece",
+    "small": "piece",
+    "whole": "piece",
+}
+
+_NON_WORD = re.compile(r"[^a-z\s-]+")
+
+
+def normalize_unit(unit: str | None) -> str:
+    unit = (unit or "").lower().strip().rstrip(".")
+    return UNIT_ALIASES.get(unit, unit)
+
+
+def _singular(word: str) -> str:
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith(("oes", "ches", "shes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def candidate_names(name: str) -> list[str]:
+    """Ingredient names to try for a recipe ingredient, most specific first.
+
+    "Extra virgin olive oils" → ["extra virgin olive oils", "extra virgin olive oil",
+    "virgin olive oils", "virgin olive oil", "olive oils", "olive oil", "oils", "oil"].
+    Trailing words are kept because the head noun comes last in English.
+    """
+    words = _NON_WORD.sub(" ", name.lower()).split()
+    candidates: list[str] = []
+    for start in range(len(words)):
+        suffix = words[start:]
+        for variant in (" ".join(suffix), " ".join([*suffix[:-1], _singular(suffix[-1])])):
+            if variant not in candidates:
+                candidates.append(variant)
+    return candidates
+
+
+def _amount(value) -> Decimal | None:
+    try:
+        amount = Decimal(str(value)).quantize(Decimal("0.01"))
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+    return amount if amount > 0 else None
+
+
+async def match_recipe_ingredients(recipes: list[Recipe]) -> int:
+    """Resolve each recipe's ingredients_json entries to Ingredient ids and store them.
+
+    Decision: All the name matching happens here, when a recipe is cached or
+    refreshed — one Ingredient query for every candidate name across the
+    batch — so log_cooking never matches names. Entries with no matching
+    Ingredient row are skipped. Returns the number of matches stored.
+    """
+    if not recipes:
+        return 0
+
+    candidates_by_entry: dict[tuple, list[str]] = {}
+    for recipe in recipes:
+        for position, entry in enumerate(recipe.ingredients_json or []):
+            name = (entry or {}).get("name") if isinstance(entry, dict) else None
+            if name:
+                candidates_by_entry[(recipe, position)] = candidate_names(name)
+
+    all_names = {name for names in candidates_by_entry.values() for name in names}
+    ingredient_ids = {
+        name: ingredient_id
+        async for name, ingredient_id in Ingredient.objects.filter(name__in=all_names).values_list("name", "id")
+    }
+
+    matches = []
+    for (recipe, position), names in candidates_by_entry.items():
+        ingredient_id = next((ingredient_ids[n] for n in names if n in ingredient_ids), None)
+        if ingredient_id is None:
+            continue
+        entry = recipe.ingredients_json[position]
+        matches.append(
+            RecipeIngredientMatch(
+                recipe=recipe,
+                ingredient_id=ingredient_id,
+                position=position,
+                amount=_amount(entry.get("amount")),
+                unit=normalize_unit(entry.get("unit")),
+            )
+        )
+
+    await RecipeIngredientMatch.objects.filter(recipe__in=recipes).adelete()
+    await RecipeIngredientMatch.objects.abulk_create(matches)
+    logger.info("[match_recipe_ingredients] recipes=%d matches=%d", len(recipes), len(matches))
+    return len(matches)
+
+
+def _apply_deductions(user, deductions: dict) -> list:
+    """Write phase of deduct_pantry: UPDATE ... RETURNING, version bump and counter moves in one transaction.
+
+    Returns the ids of the items actually decremented. Written out as SQL like
+    pantry.services._use_query, since the ORM has no update-returning; an item
+    that stopped being available since it was read is simply not returned.
+    """
+    quote = connection.ops.quote_name
+    meta = PantryItem._meta
+    table = quote(meta.db_table)
+    col = {f.name: f"{table}.{quote(f.column)}" for f in meta.concrete_fields}
+    ingredients = quote(Ingredient._meta.db_table)
+    quantity = col["quantity"]
+
+    quantity_whens, quantity_params = [], []
+    status_whens, status_params = [], []
+    ids = []
+    for item_id, amount in deductions.items():
+        pk = meta.pk.get_db_prep_value(item_id, connection)
+        n = str(amount)
+        quantity_whens.append(
+            f"WHEN {col['id']} = %s THEN CASE WHEN {quantity} > CAST(%s AS NUMERIC) "
+            f"THEN {quantity} - CAST(%s AS NUMERIC) ELSE 0 END"
+        )
+        quantity_params += [pk, n, n]
+        status_whens.append(f"WHEN {col['id']} = %s AND {quantity} <= CAST(%s AS NUMERIC) THEN %s")
+        status_params += [pk, n, PantryItem.Status.USED_UP]
+        ids.append(pk)
+
+    updated_at = meta.get_field("updated_at")
+    sql = (
+        f"UPDATE {table} SET "
+        f"{quote(meta.get_field('quantity').column)} = CASE {' '.join(quantity_whens)} ELSE {quantity} END, "
+        f"{quote(meta.get_field('status').column)} = CASE {' '.join(status_whens)} ELSE {col['status']} END, "
+        f"{quote(updated_at.column)} = %s "
+        f"WHERE {col['user']} = %s AND {col['status']} = %s AND {quantity} IS NOT NULL "
+        f"AND {col['id']} IN ({', '.join(['%s'] * len(ids))}) "
+        f"RETURNING {col['id']}, {col['status']}, "
+        f"(SELECT {ingredients}.{quote('category_id')} FROM {ingredients} "
+        f"WHERE {ingredients}.{quote('id')} = {col['ingredient']})"
+    )
+    params = [
+        *quantity_params,
+        *status_params,
+        updated_at.get_db_prep_value(timezone.now(), connection),
+        meta.get_field("user").get_db_prep_value(user.pk, connection),
+        PantryItem.Status.AVAILABLE,
+        *ids,
+    ]
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        if rows:
+            bump_pantry_versions([user.id])
+            apply_pantry_change(
+                user.id,
+                [
+                    (category_id, PantryItem.Status.AVAILABLE, PantryItem.Status.USED_UP)
+                    for _, status, category_id in rows
+                    if status == PantryItem.Status.USED_UP
+                ],
+            )
+    return [meta.pk.to_python(item_id) for item_id, _, _ in rows]
+
+
+async def deduct_pantry(user, recipe: Recipe) -> list:
+    """Decrement the user's available pantry items by the recipe's matched amounts.
+
+    Only items whose unit matches the recipe's (after normalization) and that
+    track a quantity are touched; anything else is left for the user to adjust.
+    Items that reach zero become used_up. Returns the ids of deducted items.
+
+    Decision: The decrement is a single UPDATE with per-row CASE expressions on
+    the row's own quantity, so a concurrent edit can't be overwritten with a
+    stale value. It returns each row's new status, so the counters move by
+    what the UPDATE actually did, and shares one transaction with the
+    pantry_version bump and the counter moves (_apply_deductions). Two reads
+    (matches, pantry items) precede it.
+    """
+    needed: dict[int, dict[str, Decimal]] = defaultdict(lambda: defaultdict(Decimal))
+    async for ingredient_id, amount, unit in RecipeIngredientMatch.objects.filter(
+        recipe=recipe, amount__isnull=False
+    ).values_list("ingredient_id", "amount", "unit"):
+        needed[ingredient_id][unit] += amount
+    if not needed:
+        return []
+
+    deductions: dict = {}
+    async for item_id, ingredient_id, unit in PantryItem.objects.filter(
+        user=user,
+        ingredient_id__in=needed,
+        status=PantryItem.Status.AVAILABLE,
+        quantity__isnull=False,
+    ).values_list("id", "ingredient_id", "unit"):
+        amount = needed[ingredient_id].get(normalize_unit(unit))
+        if amount:
+            deductions[item_id] = amount
+    if not deductions:
+        return []
+
+    deducted = set(await sync_to_async(_apply_deductions)(user, deductions))
+    logger.info("[deduct_pantry] user=%s recipe=%s deducted=%d items", user.id, recipe.id, len(deducted))
+    return [item_id for item_id in deductions if item_id in deducted]
@@ -0,0 +1,133 @@
+import logging
+from dataclasses import dataclass
+from datetime import date
+
+import numpy as np
+from django.db.models import F
+from django.utils import timezone
+
+from apps.recipes.models import CookingLog, DailyNutrition, Recipe
+
+logger = logging.getLogger(__name__)
+
+# DailyNutrition column → key in Recipe.nutrition (Spoonacular nutrient name, lowercased)
+NUTRIENTS = {
+    "calories": "calories",
+    "protein_g": "protein",
+    "carbohydrates_g": "carbohydrates",
+    "fat_g": "fat",
+    "fiber_g": "fiber",
+    "sugar_g": "sugar",
+    "sodium_mg": "sodium",
+}
+
+
+def nutrients_per_serving(nutrition: dict | None) -> dict[str, float]:
+    """Extract the tracked nutrients from a Recipe.nutrition blob.
+
+    Decision: Spoonacular's includeNutrition values are already per serving,
+    so they are used as-is — dividing by Recipe.servings again would
+    under-count. Returns {} when the recipe has no nutrition data.
+    """
+    if not nutrition:
+        return {}
+    values = {}
+    for column, key in NUTRIENTS.items():
+        entry = nutrition.get(key)
+        amount = entry.get("amount") if isinstance(entry, dict) else None
+        if isinstance(amount, (int, float)):
+            values[column] = float(amount)
+    return values
+
+
+async def record_nutrition(log: CookingLog, recipe: Recipe) -> None:
+    """Add one serving of the recipe's nutrients to the user's DailyNutrition row for the log's day.
+
+    Same single-UPDATE-with-F() pattern as services.stats.record_cooking;
+    recipes without nutrition data are skipped.
+    """
+    nutrients = nutrients_per_serving(recipe.nutrition)
+    if not nutrients:
+        return
+
+    cooked_on = timezone.localdate(log.cooked_at)
+    day = DailyNutrition.objects.filter(user_id=log.user_id, date=cooked_on)
+    updates = {column: F(column) + amount for column, amount in nutrients.items()}
+    updates["servings"] = F("servings") + 1
+    if await day.aupdate(**updates):
+        return
+    _, created = await DailyNutrition.objects.aget_or_create(
+        user_id=log.user_id,
+        date=cooked_on,
+        defaults={"servings": 1, **nutrients},
+    )
+    if not created:
+        await day.aupdate(**updates)
+
+
+def daily_rows(logs_by_day_recipe: list[tuple], nutrition_by_recipe: dict) -> list[DailyNutrition]:
+    """Build DailyNutrition rows from (user_id, day, recipe_id, servings) aggregates."""
+    rows: dict[tuple, DailyNutrition] = {}
+    for user_id, day, recipe_id, servings in logs_by_day_recipe:
+        nutrients = nutrients_per_serving(nutrition_by_recipe.get(recipe_id))
+        if not nutrients:
+            continue
+        row = rows.setdefault((user_id, day), DailyNutrition(user_id=user_id, date=day))
+        row.servings += servings
+        for column, amount in nutrients.items():
+            setattr(row, column, getattr(row, column) + amount * servings)
+    return list(rows.values())
+
+
+@dataclass
+class NutritionSummary:
+    totals: dict[str, float]
+    daily_average: dict[str, float]
+    buckets: list[dict]
+
+
+def _bucket_keys(days: np.ndarray, group: str) -> np.ndarray:
+    if group == "week":
+        # 1970-01-01 was a Thursday; shift so weeks start on Monday
+        return days - ((days.astype("int64") + 3) % 7).astype("timedelta64[D]")
+    if group == "month":
+        return days.astype("datetime64[M]").astype("datetime64[D]")
+    return days
+
+
+async def summarize_nutrition(user, start: date, end: date, group: str = "day") -> NutritionSummary:
+    """Totals, per-day average and per-period buckets for [start, end] from DailyNutrition.
+
+    Decision: One indexed range read of the compact daily rows, then the
+    grouping and sums are vectorized in NumPy — a year is at most 366 rows,
+    so there is no JSON to parse and no per-row Python arithmetic.
+    """
+    columns = ["servings", *NUTRIENTS]
+    rows = [
+        row
+        async for row in DailyNutrition.objects.filter(user=user, date__gte=start, date__lte=end)
+        .order_by("date")
+        .values_list("date", *columns)
+    ]
+
+    days_in_range = (end - start).days + 1
+    if not rows:
+        zeros = dict.fromkeys(columns, 0.0)
+        return NutritionSummary(totals=zeros, daily_average=dict(zeros), buckets=[])
+
+    days = np.array([row[0] for row in rows], dtype="datetime64[D]")
+    values = np.array([row[1:] for row in rows], dtype=np.float64)
+
+    totals = values.sum(axis=0)
+    keys, inverse = np.unique(_bucket_keys(days, group), return_inverse=True)
+    sums = np.zeros((len(keys), len(columns)))
+    np.add.at(sums, inverse, values)
+
+    return NutritionSummary(
+        totals=dict(zip(columns, totals.round(2).tolist())),
+        daily_average=dict(zip(columns, (totals / days_in_range).round(2).tolist())),
+        buckets=[
+            {"period_start": key.astype(date), **dict(zip(columns, bucket.round(2).tolist()))}
+            for key, bucket in zip(keys, sums)
+        ],
+    )
@@ -0,0 +1,108 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.utils import timezone
+
+from apps.recipes.models import Recipe
+from apps.recipes.services.base import RecipeProvider, RecipeProviderError
+from apps.recipes.services.matching import match_recipe_ingredients
+
+logger = logging.getLogger(__name__)
+
+# Spoonacular's informationBulk accepts at most 100 ids per call
+MAX_BATCH_SIZE = 100
+
+REFRESH_FIELDS = [
+    "title",
+    "description",
+    "instructions",
+    "ingredients_json",
+    "prep_time_minutes",
+    "cook_time_minutes",
+    "servings",
+    "image_url",
+    "nutrition",
+    "source_url",
+    "updated_at",
+]
+
+
+@dataclass
+class RefreshResult:
+    stale: int = 0
+    refreshed: int = 0
+    missing: int = 0
+    failed: int = 0
+
+
+async def refresh_stale_recipes(
+    provider: RecipeProvider,
+    ttl: timedelta,
+    batch_size: int = 50,
+    concurrency: int = 4,
+    limit: int | None = None,
+) -> RefreshResult:
+    """Re-fetch cached Spoonacular recipes whose updated_at is older than ttl.
+
+    Decision: Runs out-of-band (refresh_recipes command) so user requests keep
+    serving straight from the DB. Stale rows are fetched in informationBulk
+    batches, at most `concurrency` batches in flight, and written back with one
+    bulk_update per batch. A failed batch is logged and skipped — its rows stay
+    stale and are picked up again on the next run.
+    """
+    batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+    cutoff = timezone.now() - ttl
+
+    stale_qs = (
+        Recipe.objects.filter(source="spoonacular", external_id__isnull=False, updated_at__lt=cutoff)
+        .order_by("updated_at")
+        .values_list("id", "external_id")
+    )
+    if limit is not None:
+        stale_qs = stale_qs[:limit]
+    stale = [row async for row in stale_qs]
+
+    result = RefreshResult(stale=len(stale))
+    if not stale:
+        logger.info("[refresh_stale_recipes] nothing older than %s", cutoff)
+        return result
+
+    batches = [stale[i : i + batch_size] for i in range(0, len(stale), batch_size)]
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def refresh_batch(batch: list[tuple]) -> None:
+        ids_by_external = {external_id: recipe_id for recipe_id, external_id in batch}
+        async with semaphore:
+            try:
+                details = await provider.get_recipe_details_bulk(list(ids_by_external))
+            except RecipeProviderError:
+                logger.exception("[refresh_stale_recipes] batch of %d failed", len(batch))
+                result.failed += len(batch)
+                return
+
+        # Decision: bulk_update skips auto_now, so updated_at is set explicitly —
+        # it's what the TTL is measured against.
+        now = timezone.now()
+        recipes = [
+            Recipe(id=ids_by_external[detail.external_id], updated_at=now, **detail.as_recipe_fields())
+            for detail in details
+            if detail.external_id in ids_by_external
+        ]
+        if recipes:
+            await Recipe.objects.abulk_update(recipes, REFRESH_FIELDS)
+            await match_recipe_ingredients(recipes)
+        result.refreshed += len(recipes)
+        result.missing += len(batch) - len(recipes)
+
+    await asyncio.gather(*(refresh_batch(batch) for batch in batches))
+
+    logger.info(
+        "[refresh_stale_recipes] stale=%d refreshed=%d missing=%d failed=%d",
+        result.stale,
+        result.refreshed,
+        result.missing,
+        result.failed,
+    )
+    return result
@@ -161,6 +161,19 @@ class SpoonacularProvider(RecipeProvider):
         data = await self._request(url, params)
         return self._parse_detail(data)
 
+    async def get_recipe_details_bulk(self, external_ids: list[str]) -> list[RecipeDetail]:
+        """Fetch full recipe details for up to 100 recipes via /recipes/informationBulk.
+
+        Unlike _bulk_fetch_ingredients, errors propagate so callers (e.g. the
+        cache refresh job) can tell a failed batch from an empty one.
+        """
+        logger.info("[get_recipe_details_bulk] ids=%d", len(external_ids))
+        url = f"{self.base_url}/recipes/informationBulk"
+        params = {"ids": ",".join(external_ids), "includeNutrition": "true"}
+
+        data = await self._request(url, params)
+        return [self._parse_detail(item) for item in data]
+
     async def search(
         self,
         query: str,
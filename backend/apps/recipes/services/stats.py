@@ -0,0 +1,206 @@
+import logging
+from dataclasses import dataclass
+from datetime import date, timedelta
+from itertools import pairwise
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Max, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest, TruncDate
+from django.utils import timezone
+
+from apps.recipes.models import CookingLog, DailyNutrition, Recipe, RecipeCookingStats, UserCookingStats
+from apps.recipes.services.nutrition import daily_rows
+from apps.users.models import User
+
+logger = logging.getLogger(__name__)
+
+
+async def record_cooking(log: CookingLog) -> None:
+    """Fold one new CookingLog into the user's and recipe's stats rollups.
+
+    Decision: Every counter is bumped with F() expressions in a single UPDATE,
+    so concurrent logs never lose increments and the steady state costs two
+    queries. The row is only created (get_or_create) on the first log.
+    A log dated before last_cooked_date leaves the streak untouched — only
+    rebuild_cooking_stats recomputes streaks from scratch.
+    """
+    rating = log.rating
+    rated = 0 if rating is None else 1
+    now = timezone.now()
+
+    recipe_updates = {
+        "times_cooked": F("times_cooked") + 1,
+        "rated_count": F("rated_count") + rated,
+        "rating_sum": F("rating_sum") + (rating or 0),
+        "last_cooked_at": log.cooked_at,
+        "updated_at": now,
+    }
+    recipe_stats = RecipeCookingStats.objects.filter(user_id=log.user_id, recipe_id=log.recipe_id)
+    first_for_recipe = False
+    if not await recipe_stats.aupdate(**recipe_updates):
+        _, first_for_recipe = await RecipeCookingStats.objects.aget_or_create(
+            user_id=log.user_id,
+            recipe_id=log.recipe_id,
+            defaults={
+                "times_cooked": 1,
+                "rated_count": rated,
+                "rating_sum": rating or 0,
+                "last_cooked_at": log.cooked_at,
+            },
+        )
+        if not first_for_recipe:
+            # Lost a race with a concurrent first log for this recipe
+            await recipe_stats.aupdate(**recipe_updates)
+
+    cooked_on = timezone.localdate(log.cooked_at)
+    streak = Case(
+        When(last_cooked_date__gte=cooked_on, then=F("current_streak")),
+        When(last_cooked_date=cooked_on - timedelta(days=1), then=F("current_streak") + 1),
+        default=Value(1),
+    )
+    user_updates = {
+        "total_cooked": F("total_cooked") + 1,
+        "distinct_recipes": F("distinct_recipes") + int(first_for_recipe),
+        "rated_count": F("rated_count") + rated,
+        "rating_sum": F("rating_sum") + (rating or 0),
+        "current_streak": streak,
+        "longest_streak": Greatest(F("longest_streak"), streak),
+        "last_cooked_date": Case(
+            When(last_cooked_date__gt=cooked_on, then=F("last_cooked_date")),
+            default=Value(cooked_on),
+        ),
+        "updated_at": now,
+    }
+    user_stats = UserCookingStats.objects.filter(user_id=log.user_id)
+    if not await user_stats.aupdate(**user_updates):
+        _, created = await UserCookingStats.objects.aget_or_create(
+            user_id=log.user_id,
+            defaults={
+                "total_cooked": 1,
+                "distinct_recipes": 1,
+                "rated_count": rated,
+                "rating_sum": rating or 0,
+                "current_streak": 1,
+                "longest_streak": 1,
+                "last_cooked_date": cooked_on,
+            },
+        )
+        if not created:
+            await user_stats.aupdate(**user_updates)
+
+
+def live_streak(current_streak: int, last_cooked_date: date | None, today: date) -> int:
+    """The stored streak counts only while the user cooked today or yesterday."""
+    if last_cooked_date is None or last_cooked_date < today - timedelta(days=1):
+        return 0
+    return current_streak
+
+
+def compute_streaks(days: list[date]) -> tuple[int, int]:
+    """Return (streak ending at the last day, longest streak) for sorted distinct days."""
+    if not days:
+        return 0, 0
+    current = longest = 1
+    for previous, day in pairwise(days):
+        current = current + 1 if day - previous == timedelta(days=1) else 1
+        longest = max(longest, current)
+    return current, longest
+
+
+@dataclass
+class RebuildResult:
+    users: int = 0
+    recipe_rows: int = 0
+    nutrition_days: int = 0
+
+
+def rebuild_cooking_stats(chunk_size: int = 500) -> RebuildResult:
+    """Recompute every user's stats and DailyNutrition rollups from CookingLog, chunk_size users at a time.
+
+    Decision: Reconciliation, not the hot path — run it after backfills or if
+    the rollups are suspected to have drifted. Each chunk is aggregated in the
+    database and swapped in inside its own transaction, so memory and lock
+    time stay bounded by chunk_size regardless of table size.
+    """
+    result = RebuildResult()
+    last_user_id = None
+
+    while True:
+        users = User.objects.order_by("id")
+        if last_user_id is not None:
+            users = users.filter(id__gt=last_user_id)
+        user_ids = list(users.values_list("id", flat=True)[:chunk_size])
+        if not user_ids:
+            break
+        last_user_id = user_ids[-1]
+
+        with transaction.atomic():
+            logs = CookingLog.objects.filter(user_id__in=user_ids).order_by()
+            recipe_rows = [
+                RecipeCookingStats(
+                    user_id=row["user_id"],
+                    recipe_id=row["recipe_id"],
+                    times_cooked=row["times_cooked"],
+                    rated_count=row["rated_count"],
+                    rating_sum=row["rating_sum"],
+                    last_cooked_at=row["last_cooked_at"],
+                )
+                for row in logs.values("user_id", "recipe_id").annotate(
+                    times_cooked=Count("id"),
+                    rated_count=Count("rating"),
+                    rating_sum=Coalesce(Sum("rating"), 0),
+                    last_cooked_at=Max("cooked_at"),
+                )
+            ]
+
+            days_by_user: dict = {}
+            for user_id, day in (
+                logs.annotate(day=TruncDate("cooked_at"))
+                .values_list("user_id", "day")
+                .distinct()
+                .order_by("user_id", "day")
+            ):
+                days_by_user.setdefault(user_id, []).append(day)
+
+            user_rows = {}
+            for row in recipe_rows:
+                stats = user_rows.setdefault(row.user_id, UserCookingStats(user_id=row.user_id))
+                stats.total_cooked += row.times_cooked
+                stats.distinct_recipes += 1
+                stats.rated_count += row.rated_count
+                stats.rating_sum += row.rating_sum
+            for user_id, stats in user_rows.items():
+                days = days_by_user.get(user_id, [])
+                stats.current_streak, stats.longest_streak = compute_streaks(days)
+                stats.last_cooked_date = days[-1] if days else None
+
+            logs_by_day_recipe = list(
+                logs.annotate(day=TruncDate("cooked_at"))
+                .values("user_id", "day", "recipe_id")
+                .annotate(servings=Count("id"))
+                .values_list("user_id", "day", "recipe_id", "servings")
+            )
+            nutrition_by_recipe = dict(
+                Recipe.objects.filter(id__in={row.recipe_id for row in recipe_rows}).values_list("id", "nutrition")
+            )
+            nutrition_rows = daily_rows(logs_by_day_recipe, nutrition_by_recipe)
+
+            RecipeCookingStats.objects.filter(user_id__in=user_ids).delete()
+            UserCookingStats.objects.filter(user_id__in=user_ids).delete()
+            DailyNutrition.objects.filter(user_id__in=user_ids).delete()
+            RecipeCookingStats.objects.bulk_create(recipe_rows)
+            UserCookingStats.objects.bulk_create(user_rows.values())
+            DailyNutrition.objects.bulk_create(nutrition_rows)
+
+        result.users += len(user_rows)
+        result.recipe_rows += len(recipe_rows)
+        result.nutrition_days += len(nutrition_rows)
+        logger.info("[rebuild_cooking_stats] chunk of %d users done (through %s)", len(user_ids), last_user_id)
+
+    logger.info(
+        "[rebuild_cooking_stats] users=%d recipe_rows=%d nutrition_days=%d",
+        result.users,
+        result.recipe_rows,
+        result.nutrition_days,
+    )
+    return result
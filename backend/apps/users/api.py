@@ -26,7 +26,10 @@ def update_me(request, payload: UserUpdateIn):
     user = request.auth
     # Decision: model_dump(exclude_unset=True) skips fields the client didn't send,
     # so unchanged fields aren't overwritten with None defaults.
-    for field, value in payload.model_dump(exclude_unset=True).items():
+    changes = payload.model_dump(exclude_unset=True)
+    for field, value in changes.items():
         setattr(user, field, value)
-    user.save()
+    # Only the sent fields: request.auth was loaded at auth time, and a full save would write
+    # back a stale pantry_version over bumps made by concurrent pantry writes
+    user.save(update_fields=[*changes, "updated_at"])
     return user
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.2 on 2026-10-19 14:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="pantry_version",
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -33,6 +33,8 @@ class User(AbstractBaseUser, PermissionsMixin, AbstractTimestampModel):
     household_size = models.SmallIntegerField(default=1)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # Bumped by every pantry write (apps.pantry.versioning); backs the pantry read ETags
+    pantry_version = models.BigIntegerField(default=0)
 
     objects = UserManager()
 
@@ -4,6 +4,7 @@ from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from ninja import NinjaAPI
 
+from apps.ingredients.api import router as ingredients_router
 from apps.pantry.api import router as pantry_router
 from apps.receipts.api import router as receipts_router
 from apps.recipes.api import router as recipes_router
@@ -40,6 +41,7 @@ def health(request):
 
 
 api.add_router("/", users_router)
+api.add_router("/ingredients", ingredients_router)
 api.add_router("/pantry", pantry_router)
 api.add_router("/receipts", receipts_router)
 api.add_router("/recipes", recipes_router)
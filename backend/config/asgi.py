@@ -7,10 +7,28 @@ For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
 
+import logging
 import os
 
 from django.core.asgi import get_asgi_application
+from django.db import close_old_connections
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings.local")
 
 application = get_asgi_application()
+
+# Optional in-process expiry sweeper; a no-op unless PANTRY_EXPIRY_SWEEP_INTERVAL > 0
+from apps.pantry.expiry import start_expiry_sweeper  # noqa: E402
+
+start_expiry_sweeper()
+
+# Build the ingredient autocomplete index now rather than on the first keystroke
+from apps.ingredients.autocomplete import ingredient_autocomplete  # noqa: E402
+
+try:
+    ingredient_autocomplete.load()
+except Exception:
+    # Not fatal: the first /ingredients/autocomplete request loads it instead
+    logging.getLogger(__name__).exception("[asgi] ingredient autocomplete warm-up failed")
+finally:
+    close_old_connections()
@@ -148,3 +148,31 @@ NINJA_DOCS_URL = "/docs"
 # Rate limiting (receipt scans)
 SCAN_RATE_LIMIT_MAX = int(os.environ.get("SCAN_RATE_LIMIT_MAX", "10"))
 SCAN_RATE_LIMIT_PERIOD = int(os.environ.get("SCAN_RATE_LIMIT_PERIOD", "3600"))  # seconds
+
+# Receipt extraction: in the background (POST /receipts/scan answers 202) unless disabled, then inline (200/502)
+RECEIPT_SCAN_BACKGROUND = os.environ.get("RECEIPT_SCAN_BACKGROUND", "true").lower() in ("1", "true", "yes")
+RECEIPT_SCAN_CONCURRENCY = int(os.environ.get("RECEIPT_SCAN_CONCURRENCY", "4"))  # extractions in flight per worker
+RECEIPT_SCAN_TIMEOUT = int(os.environ.get("RECEIPT_SCAN_TIMEOUT", "120"))  # seconds, then the scan fails
+# Receipt photos are grayscaled, cropped and downscaled to this longest edge before OCR; 0 sends them as uploaded
+RECEIPT_IMAGE_MAX_EDGE = int(os.environ.get("RECEIPT_IMAGE_MAX_EDGE", "1568"))
+
+# Recipe cache refresh (refresh_recipes management command)
+RECIPE_CACHE_TTL_DAYS = int(os.environ.get("RECIPE_CACHE_TTL_DAYS", "30"))
+RECIPE_REFRESH_BATCH_SIZE = int(os.environ.get("RECIPE_REFRESH_BATCH_SIZE", "50"))  # max 100 (informationBulk)
+RECIPE_REFRESH_CONCURRENCY = int(os.environ.get("RECIPE_REFRESH_CONCURRENCY", "4"))
+
+# Per-worker name → Ingredient LRU used by bulk ingredient resolution
+INGREDIENT_CACHE_SIZE = int(os.environ.get("INGREDIENT_CACHE_SIZE", "5000"))
+# ...whose entries expire, so a recategorisation made on another worker shows up
+INGREDIENT_CACHE_TTL = int(os.environ.get("INGREDIENT_CACHE_TTL", "60"))  # seconds
+# Per-worker category snapshot: reloaded at least this often, so edits made on another worker show up
+CATEGORY_CACHE_TTL = int(os.environ.get("CATEGORY_CACHE_TTL", "60"))  # seconds
+
+# Pantry expiry sweeper (expire_pantry_items command; in-process loop when the interval is > 0)
+PANTRY_EXPIRY_SWEEP_INTERVAL = int(os.environ.get("PANTRY_EXPIRY_SWEEP_INTERVAL", "0"))  # seconds, 0 = off
+PANTRY_EXPIRY_SWEEP_BATCH_SIZE = int(os.environ.get("PANTRY_EXPIRY_SWEEP_BATCH_SIZE", "1000"))
+
+# /pantry/changes: deletions are kept this long; older sync cursors get 410 (prune_pantry_tombstones command)
+PANTRY_TOMBSTONE_RETENTION_DAYS = int(os.environ.get("PANTRY_TOMBSTONE_RETENTION_DAYS", "30"))
+# /pantry/changes re-reads changes stamped this close to a sync, in case their write had not committed yet
+PANTRY_CHANGES_OVERLAP = int(os.environ.get("PANTRY_CHANGES_OVERLAP", "60"))  # seconds
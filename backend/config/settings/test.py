@@ -19,6 +19,8 @@ SUPABASE_JWT_SECRET = "test-supabase-jwt-secret"
 
 ANTHROPIC_API_KEY = "test-anthropic-key"
 ANTHROPIC_MODEL = "claude-sonnet-4-20250514"
+# Scans run inline so API tests get the finished scan; background tests override this
+RECEIPT_SCAN_BACKGROUND = False
 
 SPOONACULAR_API_KEY = "test-spoonacular-key"
 SPOONACULAR_BASE_URL = "https://api.spoonacular.com"
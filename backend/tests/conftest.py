@@ -1,7 +1,11 @@
 import jwt
+import pytest
 from cryptography.hazmat.primitives.asymmetric import ec
 from django.conf import settings
 
+from apps.ingredients.autocomplete import ingredient_autocomplete
+from apps.ingredients.cache import clear_category_cache, ingredient_lru
+
 
 def make_auth_header(user):
     """Generate a Supabase-style JWT auth header for a user (HS256)."""
@@ -34,3 +38,15 @@ def make_es256_auth_header(user):
         "aud": "authenticated",
     }
     return {"HTTP_AUTHORIZATION": f"Bearer {make_es256_token(payload)}"}
+
+
+@pytest.fixture(autouse=True)
+def _reset_ingredient_caches():
+    """Drop the per-worker ingredient caches and indexes so rows rolled back by one test never leak into the next."""
+    clear_category_cache()
+    ingredient_lru.clear()
+    ingredient_autocomplete.clear()
+    yield
+    clear_category_cache()
+    ingredient_lru.clear()
+    ingredient_autocomplete.clear()
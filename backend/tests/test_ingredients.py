@@ -1,9 +1,27 @@
+import time
+from datetime import date, timedelta
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
 from django.core.management import call_command
 from django.db import IntegrityError
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
-from apps.ingredients.models import IngredientCategory
-from tests.factories import IngredientCategoryFactory, IngredientFactory
+from apps.ingredients import cache as category_cache
+from apps.ingredients.autocomplete import ingredient_autocomplete
+from apps.ingredients.cache import VERSION_KEY, IngredientLRU, get_categories
+from apps.ingredients.models import Ingredient, IngredientCategory
+from apps.pantry.services import (
+    IngredientSpec,
+    calculate_expiry_date,
+    get_or_create_category,
+    get_or_create_ingredient,
+    resolve_ingredients,
+)
+from tests.conftest import make_auth_header
+from tests.factories import IngredientCategoryFactory, IngredientFactory, PantryItemFactory, UserFactory
 
 
 class IngredientCategoryTest(TestCase):
@@ -61,3 +79,293 @@ class SeedCategoriesTest(TestCase):
         call_command("seed_categories")
         call_command("seed_categories")
         self.assertEqual(IngredientCategory.objects.count(), 25)
+
+
+class CategoryCacheTest(TestCase):
+    def _snapshot(self):
+        return async_to_sync(get_categories)()
+
+    def test_loads_once_then_serves_from_memory(self):
+        cat = IngredientCategoryFactory(name="Dairy")
+        first = self._snapshot()
+        self.assertEqual(first.by_id[cat.id].name, "Dairy")
+        self.assertIs(first.by_name["Dairy"], first.by_id[cat.id])
+
+        with self.assertNumQueries(0):
+            self.assertIs(self._snapshot(), first)
+
+    def test_save_invalidates(self):
+        cat = IngredientCategoryFactory(name="Dairy", default_shelf_life=7)
+        self._snapshot()
+
+        cat.default_shelf_life = 14
+        cat.save()
+
+        self.assertEqual(self._snapshot().by_id[cat.id].default_shelf_life, 14)
+
+    def test_create_and_delete_invalidate(self):
+        self._snapshot()
+        cat = IngredientCategoryFactory(name="Spices")
+        self.assertIn("Spices", self._snapshot().by_name)
+
+        cat.delete()
+        self.assertNotIn("Spices", self._snapshot().by_name)
+
+    def test_version_bump_from_another_worker(self):
+        cat = IngredientCategoryFactory(name="Dairy")
+        stale = self._snapshot()
+        # Simulate another worker's write: the row changes and the shared counter moves
+        IngredientCategory.objects.filter(id=cat.id).update(icon="🧀")
+        cache.incr(VERSION_KEY)
+
+        fresh = self._snapshot()
+        self.assertGreater(fresh.version, stale.version)
+        self.assertEqual(fresh.by_id[cat.id].icon, "🧀")
+
+    def test_expiry_and_category_lookup_are_query_free(self):
+        cat = IngredientCategoryFactory(name="Produce", default_shelf_life=5)
+        ingredient = IngredientFactory(category=cat)
+        self._snapshot()
+
+        with self.assertNumQueries(0):
+            expiry = async_to_sync(calculate_expiry_date)(ingredient)
+            category = async_to_sync(get_or_create_category)("Produce")
+
+        self.assertEqual(expiry, date.today() + timedelta(days=5))
+        self.assertEqual(category.id, cat.id)
+
+
+class CategoryCacheAcrossWorkersTest(TestCase):
+    """Two gunicorn workers: each has its own snapshot and, with LocMemCache, its own version counter."""
+
+    def _other_worker(self):
+        return mock.patch.multiple(category_cache, cache=LocMemCache("other-worker", {}), _snapshot=None)
+
+    def _snapshot(self, **lookups):
+        return async_to_sync(get_categories)(**lookups)
+
+    def test_category_created_on_another_worker_is_found(self):
+        self._snapshot()
+        with self._other_worker():
+            cat = IngredientCategoryFactory(name="Spices", default_shelf_life=365)
+        ingredient = IngredientFactory(category=cat)
+
+        self.assertEqual(async_to_sync(calculate_expiry_date)(ingredient), date.today() + timedelta(days=365))
+        self.assertEqual(async_to_sync(get_or_create_category)("Spices").id, cat.id)
+
+    def test_edit_on_another_worker_shows_up_after_ttl(self):
+        cat = IngredientCategoryFactory(name="Dairy")
+        self._snapshot()
+        with self._other_worker():
+            cat.name = "Dairy & Eggs"
+            cat.save()
+
+        self.assertEqual(self._snapshot().by_id[cat.id].name, "Dairy")
+        with override_settings(CATEGORY_CACHE_TTL=0):
+            self.assertEqual(self._snapshot().by_id[cat.id].name, "Dairy & Eggs")
+
+    def test_workers_agree_on_digest(self):
+        IngredientCategoryFactory(name="Dairy")
+        here = self._snapshot()
+        with self._other_worker():
+            there = self._snapshot()
+
+        self.assertNotEqual(here.version, there.version)
+        self.assertEqual(here.digest, there.digest)
+
+
+class ResolveIngredientsTest(TestCase):
+    def _resolve(self, specs):
+        return async_to_sync(resolve_ingredients)(specs)
+
+    def test_resolves_existing_and_creates_missing_in_bounded_queries(self):
+        IngredientFactory(name="milk")
+        IngredientFactory(name="eggs")
+        specs = [IngredientSpec(name) for name in ["Milk", " eggs ", "butter", "flour", "sugar", "MILK"]]
+
+        # SELECT existing, bulk INSERT missing, re-SELECT created
+        with self.assertNumQueries(3):
+            resolved = self._resolve(specs)
+
+        self.assertEqual(set(resolved), {"milk", "eggs", "butter", "flour", "sugar"})
+        self.assertEqual(Ingredient.objects.count(), 5)
+
+    def test_second_resolve_is_served_from_lru(self):
+        self._resolve([IngredientSpec("milk"), IngredientSpec("eggs")])
+
+        with self.assertNumQueries(0):
+            resolved = self._resolve([IngredientSpec("Milk"), IngredientSpec("eggs")])
+        self.assertEqual(resolved["milk"].name, "milk")
+
+    def test_hints_apply_only_to_new_ingredients(self):
+        dairy = IngredientCategoryFactory(name="Dairy")
+        existing = IngredientFactory(name="cheese", category=None, common_unit="slice")
+
+        resolved = self._resolve(
+            [
+                IngredientSpec("cheese", category_hint="Dairy", unit="g"),
+                IngredientSpec("yogurt", category_hint="Dairy", unit="cup"),
+            ]
+        )
+
+        existing.refresh_from_db()
+        self.assertIsNone(existing.category_id)
+        self.assertEqual(existing.common_unit, "slice")
+        self.assertEqual(resolved["yogurt"].category_id, dairy.id)
+        self.assertEqual(resolved["yogurt"].common_unit, "cup")
+
+    def test_absorbs_concurrently_created_row(self):
+        # Another worker inserted the name between our SELECT and INSERT: ignore_conflicts
+        # keeps the INSERT from failing and the re-SELECT returns that row.
+        IngredientFactory(name="basil")
+        original_filter = Ingredient.objects.filter
+        selects = iter([original_filter(name__in=[]), original_filter(name__in=["basil"])])
+
+        with mock.patch.object(Ingredient.objects, "filter", side_effect=lambda **kwargs: next(selects)):
+            resolved = self._resolve([IngredientSpec("basil")])
+
+        self.assertEqual(resolved["basil"].name, "basil")
+        self.assertEqual(Ingredient.objects.filter(name="basil").count(), 1)
+
+    def test_save_evicts_lru_entry(self):
+        cat = IngredientCategoryFactory(name="Produce")
+        ingredient = async_to_sync(get_or_create_ingredient)("carrot", None, None)
+        self.assertIsNone(ingredient.category_id)
+
+        fresh = Ingredient.objects.get(id=ingredient.id)
+        fresh.category = cat
+        fresh.save()
+
+        self.assertEqual(async_to_sync(get_or_create_ingredient)("carrot", None, None).category_id, cat.id)
+
+    def test_recategorised_on_another_worker_shows_up_after_ttl(self):
+        produce = IngredientCategoryFactory(name="Produce")
+        greens = IngredientCategoryFactory(name="Leafy Greens")
+        kale = IngredientFactory(name="kale", category=produce)
+        self._resolve([IngredientSpec("kale")])
+        # Another worker's save evicts only its own LRU entry
+        Ingredient.objects.filter(id=kale.id).update(category=greens)
+
+        self.assertEqual(self._resolve([IngredientSpec("kale")])["kale"].category_id, produce.id)
+        with override_settings(INGREDIENT_CACHE_TTL=0):
+            self.assertEqual(self._resolve([IngredientSpec("kale")])["kale"].category_id, greens.id)
+
+    def test_lru_entries_expire(self):
+        lru = IngredientLRU(maxsize=2)
+        lru.put_many([Ingredient(name="a")])
+
+        with mock.patch("apps.ingredients.cache.time.monotonic", return_value=time.monotonic() + 61):
+            self.assertEqual(lru.get_many(["a"]), {})
+        self.assertEqual(len(lru), 0)
+
+    def test_lru_is_bounded(self):
+        lru = IngredientLRU(maxsize=2)
+        a, b, c = (Ingredient(name=name) for name in "abc")
+        lru.put_many([a, b])
+        lru.get_many(["a"])  # a becomes most recently used
+        lru.put_many([c])
+
+        self.assertEqual(len(lru), 2)
+        self.assertEqual(set(lru.get_many(["a", "b", "c"])), {"a", "c"})
+
+
+class IngredientAutocompleteTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.auth = make_auth_header(self.user)
+        fruit = IngredientCategoryFactory(name="Fresh Fruits", icon="🍎")
+        self.tomato = IngredientFactory(name="tomato", category=fruit)
+        self.paste = IngredientFactory(name="tomato paste", category=None)
+        self.oil = IngredientFactory(name="olive oil", category=None)
+        IngredientFactory(name="toffee", category=None)
+        for _ in range(3):
+            PantryItemFactory(ingredient=self.paste)
+        PantryItemFactory(ingredient=self.tomato)
+        ingredient_autocomplete.load()  # as config/asgi.py does at worker start
+
+    def _search(self, q, limit=10):
+        ingredient_autocomplete.refresh()
+        return [entry.name for entry in ingredient_autocomplete.search(q, limit)]
+
+    def test_ranks_by_popularity(self):
+        self.assertEqual(self._search("tom"), ["tomato paste", "tomato"])
+        # Short prefixes come from the precomputed tops
+        self.assertEqual(self._search("to"), ["tomato paste", "tomato", "toffee"])
+
+    def test_matches_any_word_start(self):
+        self.assertEqual(self._search("oil"), ["olive oil"])
+        self.assertEqual(self._search("pas"), ["tomato paste"])
+        self.assertEqual(self._search("  TOMATO   Pa "), ["tomato paste"])
+
+    def test_search_does_not_query_after_load(self):
+        ingredient_autocomplete.refresh()
+        with self.assertNumQueries(0):
+            ingredient_autocomplete.refresh()
+            ingredient_autocomplete.search("tom")
+            ingredient_autocomplete.search("t")
+
+    def test_new_and_renamed_ingredients_are_indexed_incrementally(self):
+        ingredient_autocomplete.refresh()
+        async_to_sync(resolve_ingredients)([IngredientSpec("Tomatillo")])
+        self.oil.name = "extra virgin olive oil"
+        self.oil.save()
+
+        with self.assertNumQueries(0):
+            self.assertIn("tomatillo", self._search("tomat"))
+            self.assertEqual(self._search("vir"), ["extra virgin olive oil"])
+
+        self.tomato.pantry_items.all().delete()
+        self.tomato.delete()
+        self.assertEqual(self._search("tomat"), ["tomato paste", "tomatillo"])
+
+    def test_pulls_other_workers_ingredients_on_refresh(self):
+        ingredient_autocomplete.refresh()
+        # Created behind this worker's back (no save() hook fires for bulk_create)
+        Ingredient.objects.bulk_create([Ingredient(name="tomatillo")])
+        self.assertNotIn("tomatillo", self._search("tomat"))
+
+        with mock.patch("apps.ingredients.autocomplete.REFRESH_SECONDS", 0):
+            self.assertIn("tomatillo", self._search("tomat"))
+
+    def test_api(self):
+        response = self.client.get("/api/v1/ingredients/autocomplete?q=tom&limit=1", **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            [{"id": self.paste.id, "name": "tomato paste", "category_name": None, "category_icon": None}],
+        )
+
+    def test_api_includes_category_and_caps_limit(self):
+        data = self.client.get("/api/v1/ingredients/autocomplete?q=t&limit=500", **self.auth).json()
+        self.assertEqual(len(data), 3)
+        self.assertEqual(data[1]["category_icon"], "🍎")
+
+    def test_api_does_not_refresh_a_fresh_index(self):
+        with mock.patch.object(ingredient_autocomplete, "refresh") as refresh:
+            response = self.client.get("/api/v1/ingredients/autocomplete?q=tom", **self.auth)
+        self.assertEqual(len(response.json()), 2)
+        refresh.assert_not_called()
+
+    def test_api_does_not_load_inline(self):
+        ingredient_autocomplete.clear()  # worker-start load failed
+        with mock.patch.object(ingredient_autocomplete, "refresh"):
+            response = self.client.get("/api/v1/ingredients/autocomplete?q=tom", **self.auth)
+        self.assertEqual(response.json(), [])
+
+    def test_stale_index_refreshes_once_in_the_background(self):
+        async def scenario():
+            ingredient_autocomplete.refresh_soon()
+            ingredient_autocomplete.refresh_soon()  # one is already running
+            inline = refresh.call_count
+            await ingredient_autocomplete._refresh_task
+            return inline, refresh.call_count
+
+        with (
+            mock.patch.object(ingredient_autocomplete, "refresh") as refresh,
+            mock.patch("apps.ingredients.autocomplete.REFRESH_SECONDS", 0),
+        ):
+            self.assertEqual(async_to_sync(scenario)(), (0, 1))
+
+    def test_api_empty_query(self):
+        response = self.client.get("/api/v1/ingredients/autocomplete?q=", **self.auth)
+        self.assertEqual(response.json(), [])
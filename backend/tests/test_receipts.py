@@ -1,14 +1,29 @@
+import asyncio
+import base64
+import io
 import json
+import time
+from datetime import timedelta
 from decimal import Decimal
-from unittest.mock import AsyncMock, patch
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
 
+import anthropic
+import httpx
+from asgiref.sync import async_to_sync
 from django.core.cache import cache
+from django.db import IntegrityError
 from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image, ImageDraw
 
 from apps.ingredients.models import Ingredient
 from apps.pantry.models import PantryItem
 from apps.receipts.models import ReceiptItem, ReceiptScan
-from apps.receipts.services.base import ExtractedItem, OCRExtractionError, ReceiptExtractionResult
+from apps.receipts.processing import WAIT_POLL_INTERVAL, scan_runner, wait_for_scan
+from apps.receipts.services.base import ExtractedItem, OCRExtractionError, OCRProvider, ReceiptExtractionResult
+from apps.receipts.services.claude_ocr import ClaudeOCRProvider, ItemStreamParser
+from apps.receipts.services.preprocess import estimate_vision_tokens, prepare_receipt_image
 from tests.conftest import make_auth_header
 from tests.factories import (
     IngredientCategoryFactory,
@@ -287,6 +302,551 @@ class ScanReceiptAPITest(TestCase):
         self.assertEqual(response.status_code, 200)
 
 
+@override_settings(RECEIPT_SCAN_BACKGROUND=True)
+class BackgroundScanAPITest(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.headers = {"Authorization": make_auth_header(self.user)["HTTP_AUTHORIZATION"]}
+        IngredientCategoryFactory(name="Fresh Fruits", default_shelf_life=5)
+        IngredientCategoryFactory(name="Poultry", default_shelf_life=3)
+        cache.clear()
+
+    async def _post_scan(self):
+        return await self.async_client.post(
+            "/api/v1/receipts/scan",
+            data=json.dumps({"image_url": VALID_IMAGE_URL}),
+            content_type="application/json",
+            headers=self.headers,
+        )
+
+    async def _get_scan(self, scan_id, wait=None):
+        params = {"wait": wait} if wait is not None else {}
+        return await self.async_client.get(f"/api/v1/receipts/{scan_id}", params, headers=self.headers)
+
+    @patch("apps.receipts.api.ocr_provider")
+    def test_scan_returns_202_then_completes(self, mock_provider):
+        mock_provider.extract_receipt = AsyncMock(return_value=MOCK_OCR_RESULT)
+
+        async def scenario():
+            response = await self._post_scan()
+            await scan_runner.join()
+            return response, await self._get_scan(response.json()["id"])
+
+        accepted, detail = async_to_sync(scenario)()
+        self.assertEqual(accepted.status_code, 202)
+        self.assertEqual(accepted.json()["status"], "processing")
+        self.assertEqual(accepted.json()["items"], [])
+        self.assertEqual(detail.status_code, 200)
+        self.assertEqual(detail.json()["status"], "completed")
+        self.assertEqual(detail.json()["store_name"], "Test Grocery")
+        self.assertEqual(len(detail.json()["items"]), 3)
+        self.assertIsNone(detail.json()["error"])
+
+    @patch("apps.receipts.api.ocr_provider")
+    def test_failure_is_recorded_on_the_scan(self, mock_provider):
+        mock_provider.extract_receipt = AsyncMock(side_effect=OCRExtractionError("API timeout"))
+
+        async def scenario():
+            response = await self._post_scan()
+            await scan_runner.join()
+            return response, await self._get_scan(response.json()["id"])
+
+        accepted, detail = async_to_sync(scenario)()
+        self.assertEqual(accepted.status_code, 202)
+        self.assertEqual(detail.json()["status"], "failed")
+        self.assertEqual(detail.json()["error"], "API timeout")
+        self.assertEqual(ReceiptItem.objects.count(), 0)
+
+    @patch("apps.receipts.api.ocr_provider")
+    def test_long_poll_wakes_as_soon_as_the_scan_finishes(self, mock_provider):
+        async def scenario():
+            release = asyncio.Event()
+
+            async def extract(image_url):
+                await release.wait()
+                return MOCK_OCR_RESULT
+
+            mock_provider.extract_receipt = extract
+            scan = await ReceiptScan.objects.aget(id=(await self._post_scan()).json()["id"])
+            waiter = asyncio.ensure_future(wait_for_scan(scan, 10))
+            await asyncio.sleep(0.05)
+            self.assertFalse(waiter.done())
+            started = time.monotonic()
+            release.set()
+            await waiter
+            return scan, time.monotonic() - started
+
+        scan, elapsed = async_to_sync(scenario)()
+        self.assertLess(elapsed, WAIT_POLL_INTERVAL)
+        response = async_to_sync(self._get_scan)(scan.id, wait=10)
+        self.assertEqual(response.json()["status"], "completed")
+        self.assertEqual(len(response.json()["items"]), 3)
+
+    @patch("apps.receipts.api.ocr_provider")
+    def test_long_poll_gives_up_after_wait(self, mock_provider):
+        async def scenario():
+            release = asyncio.Event()
+
+            async def extract(image_url):
+                await release.wait()
+                return MOCK_OCR_RESULT
+
+            mock_provider.extract_receipt = extract
+            scan_id = (await self._post_scan()).json()["id"]
+            response = await self._get_scan(scan_id, wait=1)
+            release.set()
+            await scan_runner.join()
+            return response
+
+        response = async_to_sync(scenario)()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "processing")
+
+    @override_settings(RECEIPT_SCAN_CONCURRENCY=1)
+    @patch("apps.receipts.api.ocr_provider")
+    def test_concurrency_is_bounded(self, mock_provider):
+        running = []
+        peak = []
+
+        async def extract(image_url):
+            running.append(image_url)
+            peak.append(len(running))
+            await asyncio.sleep(0.01)
+            running.pop()
+            return MOCK_OCR_RESULT
+
+        mock_provider.extract_receipt = extract
+
+        async def scenario():
+            responses = [await self._post_scan() for _ in range(3)]
+            await scan_runner.join()
+            return responses
+
+        self.assertEqual([r.status_code for r in async_to_sync(scenario)()], [202, 202, 202])
+        self.assertEqual(max(peak), 1)
+        self.assertEqual(ReceiptScan.objects.filter(status="completed").count(), 3)
+
+    @override_settings(RECEIPT_SCAN_CONCURRENCY=1, RECEIPT_SCAN_TIMEOUT=0.5)
+    @patch("apps.receipts.api.ocr_provider")
+    def test_time_queued_counts_against_the_timeout(self, mock_provider):
+        async def extract(image_url):
+            await asyncio.sleep(0.3)
+            return MOCK_OCR_RESULT
+
+        mock_provider.extract_receipt = extract
+
+        async def scenario():
+            first, queued = [(await self._post_scan()).json()["id"] for _ in range(2)]
+            await scan_runner.join()
+            return first, queued
+
+        first, queued = async_to_sync(scenario)()
+        self.assertEqual(ReceiptScan.objects.get(id=first).status, ReceiptScan.Status.COMPLETED)
+        # Only 0.2s of its 0.5s were left once the first scan freed the slot
+        self.assertEqual(ReceiptScan.objects.get(id=queued).status, ReceiptScan.Status.FAILED)
+        self.assertEqual(ReceiptScan.objects.get(id=queued).error, "Timed out after 0.5s")
+
+    @override_settings(RECEIPT_SCAN_TIMEOUT=0)
+    @patch("apps.receipts.api.ocr_provider")
+    def test_timeout_fails_the_scan(self, mock_provider):
+        async def extract(image_url):
+            await asyncio.sleep(1)
+            return MOCK_OCR_RESULT
+
+        mock_provider.extract_receipt = extract
+
+        async def scenario():
+            await self._post_scan()
+            await scan_runner.join()
+
+        async_to_sync(scenario)()
+        scan = ReceiptScan.objects.get()
+        self.assertEqual(scan.status, ReceiptScan.Status.FAILED)
+        self.assertEqual(scan.error, "Timed out after 0s")
+
+    def test_abandoned_scan_reads_as_failed(self):
+        scan = ReceiptScanFactory(user=self.user, status=ReceiptScan.Status.PROCESSING)
+        ReceiptScan.objects.filter(id=scan.id).update(scanned_at=timezone.now() - timedelta(hours=1))
+        response = async_to_sync(self._get_scan)(scan.id)
+        self.assertEqual(response.json()["status"], "failed")
+        self.assertEqual(response.json()["error"], "Scan was interrupted, please try again")
+        scan.refresh_from_db()
+        self.assertEqual(scan.status, ReceiptScan.Status.FAILED)
+
+    def test_recent_processing_scan_is_not_abandoned(self):
+        scan = ReceiptScanFactory(user=self.user, status=ReceiptScan.Status.PROCESSING)
+        response = async_to_sync(self._get_scan)(scan.id)
+        self.assertEqual(response.json()["status"], "processing")
+
+    def test_confirm_rejects_processing_scan(self):
+        scan = ReceiptScanFactory(user=self.user, status=ReceiptScan.Status.PROCESSING)
+        response = self.client.post(
+            f"/api/v1/receipts/{scan.id}/confirm",
+            data=json.dumps({"items": []}),
+            content_type="application/json",
+            HTTP_AUTHORIZATION=self.headers["Authorization"],
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+# ---------------------------------------------------------------------------
+# Streaming extraction
+# ---------------------------------------------------------------------------
+
+TOOL_INPUT = {
+    "store_name": "Corner {Market}",
+    "items": [
+        {
+            "raw_text": 'BANANAS "ORG"',
+            "name": "banana",
+            "quantity": 1,
+            "is_food": True,
+            "category_hint": "Fresh Fruits",
+        },
+        {"raw_text": "CHKN BRST }{ 1.5LB", "name": "chicken breast", "quantity": 1.5, "unit": "lb", "is_food": True},
+        {"raw_text": "TAX \\ 8%", "name": "tax", "price": 0.87, "is_food": False},
+    ],
+}
+
+
+class ItemStreamParserTest(TestCase):
+    def _feed(self, text, size):
+        parser = ItemStreamParser()
+        return [parser.feed(text[i : i + size]) for i in range(0, len(text), size)]
+
+    def test_each_item_comes_out_when_its_object_closes(self):
+        text = json.dumps(TOOL_INPUT)
+        emitted = self._feed(text, 1)
+        first = json.dumps(TOOL_INPUT["items"][0])
+        self.assertEqual(emitted[text.index(first) + len(first) - 1], [TOOL_INPUT["items"][0]])
+        self.assertEqual([item for items in emitted for item in items], TOOL_INPUT["items"])
+
+    def test_any_fragment_size(self):
+        text = json.dumps(TOOL_INPUT, indent=2)
+        for size in (1, 2, 7, 64, len(text)):
+            with self.subTest(size=size):
+                self.assertEqual([item for items in self._feed(text, size) for item in items], TOOL_INPUT["items"])
+
+    def test_ignores_objects_outside_the_items_array(self):
+        text = json.dumps({"notes": [{"raw_text": "x", "name": "x"}], "store_name": "items", **TOOL_INPUT})
+        self.assertEqual([item for items in self._feed(text, 5) for item in items], TOOL_INPUT["items"])
+
+
+class FakeMessageStream:
+    """Stands in for the AsyncMessageStream context manager of client.messages.stream()."""
+
+    def __init__(self, fragments, final_input, error=None):
+        self.events = [SimpleNamespace(type="message_start")] + [
+            SimpleNamespace(type="content_block_delta", delta=SimpleNamespace(type="input_json_delta", partial_json=f))
+            for f in fragments
+        ]
+        self.final_input = final_input
+        self.error = error
+        self.sent = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def __aiter__(self):
+        for event in self.events:
+            self.sent += 1
+            yield event
+        if self.error:
+            raise self.error
+
+    async def get_final_message(self):
+        block = SimpleNamespace(type="tool_use", name="extract_receipt_items", input=self.final_input)
+        return SimpleNamespace(content=[block], stop_reason="tool_use", usage=None, model_dump=lambda: {"mock": True})
+
+
+class ClaudeStreamReceiptTest(TestCase):
+    def _stream(self, stream):
+        provider = ClaudeOCRProvider()
+        provider._download_image = AsyncMock(return_value=(b"image", "image/jpeg"))
+        provider.client = MagicMock()
+        provider.client.messages.stream = MagicMock(return_value=stream)
+
+        async def collect():
+            out = []
+            async for extracted in provider.stream_receipt(VALID_IMAGE_URL):
+                out.append((extracted, stream.sent))
+            return out
+
+        return async_to_sync(collect)()
+
+    def test_yields_items_while_streaming_then_the_result(self):
+        text = json.dumps(TOOL_INPUT)
+        stream = FakeMessageStream([text[i : i + 10] for i in range(0, len(text), 10)], TOOL_INPUT)
+
+        out = self._stream(stream)
+
+        items, (result, _) = out[:-1], out[-1]
+        self.assertEqual([item.name for item, _ in items], ["banana", "chicken breast", "tax"])
+        self.assertLess(items[0][1], len(stream.events) / 2)  # long before the stream ended
+        self.assertEqual(items[1][0].unit, "lb")
+        self.assertFalse(items[2][0].is_food)
+        self.assertIsInstance(result, ReceiptExtractionResult)
+        self.assertEqual(result.store_name, "Corner {Market}")
+        self.assertEqual(len(result.items), 3)
+
+    def test_items_the_parser_missed_come_from_the_final_message(self):
+        out = self._stream(FakeMessageStream(['{"store_name": null, "items": []}'], TOOL_INPUT))
+        self.assertEqual([e.name for e, _ in out[:-1]], ["banana", "chicken breast", "tax"])
+
+    def test_api_error(self):
+        error = anthropic.APIConnectionError(request=httpx.Request("POST", "https://api.anthropic.com"))
+        with self.assertRaises(OCRExtractionError):
+            self._stream(FakeMessageStream(['{"items": ['], TOOL_INPUT, error=error))
+
+
+def make_photo(size=(2400, 1800), receipt=(900, 150, 1500, 1650), orientation=None, fmt="JPEG"):
+    """A phone-style photo: a white receipt with printed lines on a darker, noisy table."""
+    image = Image.effect_noise(size, 40).convert("RGB")
+    image = Image.eval(image, lambda v: v // 3 + 40)
+    draw = ImageDraw.Draw(image)
+    if receipt:
+        draw.rectangle(receipt, fill=(246, 244, 238))
+        for y in range(receipt[1] + 30, receipt[3] - 30, 36):
+            draw.text((receipt[0] + 30, y), "BNLS CHKN BRST  ....  8.99", fill=(20, 20, 20))
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, exif=exif)
+    return buffer.getvalue()
+
+
+class ReceiptImagePreprocessTest(TestCase):
+    def _open(self, data):
+        return Image.open(io.BytesIO(data))
+
+    def test_crops_grayscales_and_downscales(self):
+        photo = make_photo()
+        prepared = prepare_receipt_image(photo, "image/jpeg", max_edge=800)
+
+        self.assertEqual(prepared.media_type, "image/jpeg")
+        image = self._open(prepared.data)
+        self.assertEqual(image.mode, "L")
+        self.assertEqual(max(image.size), 800)
+        # Cropped to the 600x1500 receipt (plus margin), not the 4:3 photo
+        width, height = image.size
+        self.assertLess(width / height, 0.5)
+        report = prepared.report
+        self.assertTrue(report.cropped)
+        self.assertEqual(report.original_size, (2400, 1800))
+        self.assertEqual(report.sent_size, image.size)
+        self.assertEqual(report.sent_bytes, len(prepared.data))
+        self.assertLess(report.sent_bytes, report.original_bytes / 5)
+        self.assertLess(report.estimated_tokens_after, report.estimated_tokens_before)
+
+    def test_applies_exif_orientation(self):
+        photo = make_photo(size=(1200, 800), receipt=None, orientation=6)
+        prepared = prepare_receipt_image(photo, "image/jpeg", max_edge=600)
+        self.assertFalse(prepared.report.cropped)
+        self.assertEqual(self._open(prepared.data).size, (400, 600))
+
+    def test_keeps_a_small_original_that_needs_no_change(self):
+        photo = make_photo(size=(120, 60), receipt=None, fmt="PNG")
+        image = Image.new("L", (120, 60), 255)
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        prepared = prepare_receipt_image(buffer.getvalue(), "image/png", max_edge=1568)
+        self.assertEqual(prepared.data, buffer.getvalue())
+        self.assertEqual(prepared.media_type, "image/png")
+        self.assertEqual(prepared.report.sent_size, (120, 60))
+        # Never upscaled
+        self.assertEqual(self._open(prepare_receipt_image(photo, "image/png", max_edge=1568).data).size, (120, 60))
+
+    def test_undecodable_bytes_pass_through(self):
+        prepared = prepare_receipt_image(b"not an image", "image/webp", max_edge=1568)
+        self.assertEqual(prepared.data, b"not an image")
+        self.assertEqual(prepared.media_type, "image/webp")
+
+    def test_estimate_vision_tokens(self):
+        self.assertEqual(estimate_vision_tokens(200, 200), 54)
+        self.assertEqual(estimate_vision_tokens(1000, 1000), 1334)
+        self.assertEqual(estimate_vision_tokens(4032, 3024), 1600)
+        # Claude caps the long edge at 1568 first
+        self.assertEqual(estimate_vision_tokens(1000, 4000), estimate_vision_tokens(392, 1568))
+
+
+class ClaudeImageLoadTest(TestCase):
+    def setUp(self):
+        self.photo = make_photo()
+        self.provider = ClaudeOCRProvider()
+        self.provider._download_image = AsyncMock(return_value=(self.photo, "image/jpeg"))
+
+    def test_sends_the_preprocessed_image_and_reports_savings(self):
+        data, media_type, report = async_to_sync(self.provider._load_image)(VALID_IMAGE_URL)
+        self.assertEqual(media_type, "image/jpeg")
+        self.assertEqual(len(base64.b64decode(data)), report["sent_bytes"])
+        self.assertEqual(report["original_bytes"], len(self.photo))
+        self.assertLessEqual(max(report["sent_size"]), 1568)
+
+        block = SimpleNamespace(type="tool_use", name="extract_receipt_items", input=TOOL_INPUT)
+        response = SimpleNamespace(content=[block], stop_reason="tool_use", model_dump=lambda: {"mock": True})
+        result = self.provider._parse_response(response, report)
+        self.assertEqual(result.raw_response["image_preprocessing"], report)
+
+    @override_settings(RECEIPT_IMAGE_MAX_EDGE=0)
+    def test_disabled(self):
+        data, media_type, report = async_to_sync(self.provider._load_image)(VALID_IMAGE_URL)
+        self.assertEqual(base64.b64decode(data), self.photo)
+        self.assertEqual(report, {})
+
+
+def parse_sse(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+class StaticOCRProvider(OCRProvider):
+    async def extract_receipt(self, image_url):
+        return MOCK_OCR_RESULT
+
+
+class ScanReceiptStreamAPITest(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.headers = {"Authorization": make_auth_header(self.user)["HTTP_AUTHORIZATION"]}
+        IngredientCategoryFactory(name="Fresh Fruits", default_shelf_life=5)
+        IngredientCategoryFactory(name="Poultry", default_shelf_life=3)
+        cache.clear()
+
+    async def _post(self, image_url=VALID_IMAGE_URL):
+        return await self.async_client.post(
+            "/api/v1/receipts/scan/stream",
+            data=json.dumps({"image_url": image_url}),
+            content_type="application/json",
+            headers=self.headers,
+        )
+
+    def _events(self):
+        async def fetch():
+            response = await self._post()
+            body = b"".join([chunk async for chunk in response.streaming_content])
+            return response, parse_sse(body.decode())
+
+        return async_to_sync(fetch)()
+
+    @patch("apps.receipts.api.ocr_provider")
+    def test_items_are_sent_and_saved_as_they_are_extracted(self, mock_provider):
+        release = None
+
+        async def stream_receipt(image_url):
+            yield MOCK_OCR_RESULT.items[0]
+            await release.wait()
+            for item in MOCK_OCR_RESULT.items[1:]:
+                yield item
+            yield MOCK_OCR_RESULT
+
+        async def scenario():
+            nonlocal release
+            release = asyncio.Event()
+            response = await self._post()
+            chunks = aiter(response.streaming_content)
+            first = [await anext(chunks), await anext(chunks)]
+            saved_while_extracting = await ReceiptItem.objects.acount()
+            release.set()
+            rest = [chunk async for chunk in chunks]
+            return (
+                response,
+                parse_sse(b"".join(first).decode()),
+                parse_sse(b"".join(rest).decode()),
+                saved_while_extracting,
+            )
+
+        mock_provider.stream_receipt = stream_receipt
+        response, first, rest, saved_while_extracting = async_to_sync(scenario)()
+
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertEqual([event for event, _ in first], ["scan", "item"])
+        self.assertEqual(first[0][1]["status"], "processing")
+        self.assertEqual(first[1][1]["ingredient_name"], "banana")
+        self.assertEqual(saved_while_extracting, 1)
+        self.assertEqual([event for event, _ in rest], ["item", "item", "done"])
+        done = rest[-1][1]
+        self.assertEqual(done["status"], "completed")
+        self.assertEqual(done["store_name"], "Test Grocery")
+        self.assertEqual(
+            [item["raw_text"] for item in done["items"]], ["ORGANIC BANANAS", "CHICKEN BREAST 1.5LB", "TAX"]
+        )
+
+        scan = ReceiptScan.objects.get()
+        self.assertEqual(scan.status, ReceiptScan.Status.COMPLETED)
+        self.assertEqual(scan.raw_extraction, {"mock": True})
+        self.assertEqual(scan.items.count(), 3)
+        self.assertIsNone(scan.items.get(raw_text="TAX").ingredient)
+
+    @patch("apps.receipts.api.ocr_provider")
+    def test_failure_sends_error_and_drops_partial_items(self, mock_provider):
+        async def stream_receipt(image_url):
+            yield MOCK_OCR_RESULT.items[0]
+            raise OCRExtractionError("Claude API error: overloaded")
+
+        mock_provider.stream_receipt = stream_receipt
+        response, events = self._events()
+
+        self.assertEqual([event for event, _ in events], ["scan", "item", "error"])
+        self.assertEqual(events[-1][1]["detail"], "Receipt extraction failed: Claude API error: overloaded")
+        scan = ReceiptScan.objects.get()
+        self.assertEqual(scan.status, ReceiptScan.Status.FAILED)
+        self.assertEqual(scan.error, "Claude API error: overloaded")
+        self.assertEqual(ReceiptItem.objects.count(), 0)
+
+    @override_settings(RECEIPT_SCAN_CONCURRENCY=1)
+    @patch("apps.receipts.api.ocr_provider")
+    def test_streams_share_the_scan_concurrency_limit(self, mock_provider):
+        running, peak = [], []
+
+        async def stream_receipt(image_url):
+            running.append(image_url)
+            peak.append(len(running))
+            await asyncio.sleep(0.01)
+            yield MOCK_OCR_RESULT.items[0]
+            running.pop()
+            yield MOCK_OCR_RESULT
+
+        async def scenario():
+            responses = [await self._post(), await self._post()]
+
+            async def consume(response):
+                return parse_sse(b"".join([chunk async for chunk in response.streaming_content]).decode())
+
+            return await asyncio.gather(*map(consume, responses))
+
+        mock_provider.stream_receipt = stream_receipt
+        streams = async_to_sync(scenario)()
+
+        self.assertEqual([[event for event, _ in events] for events in streams], [["scan", "item", "done"]] * 2)
+        self.assertEqual(max(peak), 1)
+
+    @patch.object(ReceiptItem, "asave", AsyncMock(side_effect=IntegrityError))
+    @patch("apps.receipts.api.ocr_provider", StaticOCRProvider())
+    def test_scan_deleted_while_streaming_ends_the_stream(self):
+        response, events = self._events()
+        self.assertEqual([event for event, _ in events], ["scan", "error"])
+        self.assertEqual(events[-1][1]["detail"], "Receipt scan is no longer processing")
+
+    @patch("apps.receipts.api.ocr_provider", StaticOCRProvider())
+    def test_provider_without_streaming_sends_items_at_the_end(self):
+        response, events = self._events()
+        self.assertEqual([event for event, _ in events], ["scan", "item", "item", "item", "done"])
+        self.assertEqual(ReceiptItem.objects.count(), 3)
+
+    def test_rejects_invalid_url_before_streaming(self):
+        response = async_to_sync(self._post)("https://evil.com/storage/v1/object/public/test.jpg")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.streaming)
+        self.assertEqual(ReceiptScan.objects.count(), 0)
+
+
 class ListScansAPITest(TestCase):
     def setUp(self):
         self.user = UserFactory()
@@ -302,14 +862,14 @@ class ListScansAPITest(TestCase):
         response = self.client.get(self.url, **self.auth)
         self.assertEqual(response.status_code, 200)
         data = response.json()
-        self.assertEqual(data["count"], 2)
+        self.assertEqual(len(data["items"]), 2)
         self.assertEqual(len(data["items"]), 2)
 
     def test_list_empty(self):
         response = self.client.get(self.url, **self.auth)
         self.assertEqual(response.status_code, 200)
         data = response.json()
-        self.assertEqual(data["count"], 0)
+        self.assertEqual(len(data["items"]), 0)
         self.assertEqual(data["items"], [])
 
     def test_list_includes_item_count(self):
@@ -426,6 +986,36 @@ class ConfirmReceiptAPITest(TestCase):
         pantry = PantryItem.objects.get(user=self.user, ingredient=self.ingredient)
         self.assertEqual(pantry.quantity, Decimal("5.00"))  # 2.00 + 3.00
 
+    def test_confirm_merge_keeps_existing_unit(self):
+        PantryItemFactory(user=self.user, ingredient=self.ingredient, quantity=Decimal("500"), unit="g")
+
+        response = self.client.post(
+            self.url,
+            data=json.dumps({"items": [{"receipt_item_id": self.item.id, "unit": "bunch"}]}),
+            content_type="application/json",
+            **self.auth,
+        )
+        self.assertEqual(response.status_code, 200)
+        pantry = PantryItem.objects.get(user=self.user, ingredient=self.ingredient)
+        self.assertEqual(pantry.unit, "g")
+        self.assertEqual(pantry.quantity, Decimal("503.00"))
+
+    def test_confirm_counts_each_line(self):
+        second = ReceiptItemFactory(receipt=self.scan, ingredient=self.ingredient, quantity=Decimal("2.00"), unit="kg")
+
+        response = self.client.post(
+            self.url,
+            data=json.dumps({"items": [{"receipt_item_id": self.item.id}, {"receipt_item_id": second.id}]}),
+            content_type="application/json",
+            **self.auth,
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data["pantry_items_created"], data["pantry_items_updated"]), (1, 1))
+        self.assertEqual(len(data["items"]), 1)
+        pantry = PantryItem.objects.get(user=self.user, ingredient=self.ingredient)
+        self.assertEqual((pantry.quantity, pantry.unit), (Decimal("5.00"), "piece"))
+
     def test_confirm_with_expiry_override(self):
         response = self.client.post(
             self.url,
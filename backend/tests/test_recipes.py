@@ -1,13 +1,36 @@
 import json
+from dataclasses import replace
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
 from unittest.mock import AsyncMock, patch
 
+from asgiref.sync import async_to_sync
 from django.core.exceptions import ValidationError
-from django.db import IntegrityError
+from django.core.management import call_command
+from django.db import DatabaseError, IntegrityError, connection
 from django.test import TestCase
-
-from apps.pantry.models import PantryItem
-from apps.recipes.models import CookingLog, Recipe, SavedRecipe
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from apps.pantry.counters import reconcile_pantry_counters
+from apps.pantry.models import PantryCategoryCounter, PantryItem
+from apps.recipes.models import (
+    CookingLog,
+    DailyNutrition,
+    Recipe,
+    RecipeCookingStats,
+    RecipeIngredientMatch,
+    RecipeSimilarity,
+    SavedRecipe,
+    UserCookingStats,
+)
+from apps.recipes.services import matching
 from apps.recipes.services.base import RecipeDetail, RecipeProviderError, RecipeSummary
+from apps.recipes.services.matching import candidate_names, match_recipe_ingredients, normalize_unit
+from apps.recipes.services.nutrition import record_nutrition
+from apps.recipes.services.refresh import refresh_stale_recipes
+from apps.recipes.services.stats import compute_streaks, record_cooking
 from tests.conftest import make_auth_header
 from tests.factories import (
     CookingLogFactory,
@@ -327,6 +350,22 @@ class GetRecipeAPITest(TestCase):
         self.assertEqual(resp.json()["id"], str(recipe.id))
         mock_provider.get_recipe_detail.assert_not_called()
 
+    def test_get_recipe_summary_view(self, mock_provider):
+        recipe = RecipeFactory(source="spoonacular", external_id="12345", title="Pasta Primavera", servings=2)
+
+        resp = self.client.get(f"{BASE_URL}/{recipe.id}?view=summary", **self.auth)
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertEqual(data["title"], "Pasta Primavera")
+        self.assertEqual(data["servings"], 2)
+        self.assertNotIn("instructions", data)
+        self.assertNotIn("nutrition", data)
+
+    def test_get_recipe_invalid_view(self, mock_provider):
+        recipe = RecipeFactory()
+        resp = self.client.get(f"{BASE_URL}/{recipe.id}?view=tiny", **self.auth)
+        self.assertEqual(resp.status_code, 422)
+
     def test_get_recipe_unauthenticated(self, mock_provider):
         resp = self.client.get(f"{BASE_URL}/12345")
         self.assertEqual(resp.status_code, 401)
@@ -513,14 +552,46 @@ class ListSavedRecipesAPITest(TestCase):
         resp = self.client.get(f"{BASE_URL}/saved", **self.auth)
         self.assertEqual(resp.status_code, 200)
         data = resp.json()
-        self.assertEqual(data["count"], 1)
+        self.assertEqual(len(data["items"]), 1)
         self.assertEqual(data["items"][0]["recipe"]["title"], recipe.title)
         self.assertEqual(data["items"][0]["notes"], "My fave")
 
+    def test_list_saved_full_view_by_default(self, mock_provider):
+        SavedRecipeFactory(user=self.user)
+
+        resp = self.client.get(f"{BASE_URL}/saved", **self.auth)
+        recipe_data = resp.json()["items"][0]["recipe"]
+        self.assertIn("instructions", recipe_data)
+        self.assertIn("ingredients_json", recipe_data)
+
+    def test_list_saved_summary_view(self, mock_provider):
+        recipe = RecipeFactory(source="spoonacular", external_id="111", title="Soup")
+        SavedRecipeFactory(user=self.user, recipe=recipe, notes="Winter")
+
+        resp = self.client.get(f"{BASE_URL}/saved?view=summary", **self.auth)
+        self.assertEqual(resp.status_code, 200)
+        item = resp.json()["items"][0]
+        self.assertEqual(item["notes"], "Winter")
+        self.assertEqual(item["recipe"]["title"], "Soup")
+        self.assertEqual(item["recipe"]["id"], str(recipe.id))
+        self.assertNotIn("instructions", item["recipe"])
+        self.assertNotIn("ingredients_json", item["recipe"])
+
+    def test_list_saved_summary_view_reads_card_columns_only(self, mock_provider):
+        SavedRecipeFactory(user=self.user)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(f"{BASE_URL}/saved?view=summary", **self.auth)
+        saved_sql = [q["sql"] for q in ctx.captured_queries if '"saved_recipes"' in q["sql"]]
+        self.assertTrue(saved_sql)
+        for sql in saved_sql:
+            self.assertNotIn('"instructions"', sql)
+            self.assertNotIn('"nutrition"', sql)
+
     def test_list_saved_empty(self, mock_provider):
         resp = self.client.get(f"{BASE_URL}/saved", **self.auth)
         self.assertEqual(resp.status_code, 200)
-        self.assertEqual(resp.json()["count"], 0)
+        self.assertEqual(len(resp.json()["items"]), 0)
 
     def test_list_saved_own_only(self, mock_provider):
         """Should not see other users' saved recipes."""
@@ -530,7 +601,7 @@ class ListSavedRecipesAPITest(TestCase):
 
         resp = self.client.get(f"{BASE_URL}/saved", **self.auth)
         self.assertEqual(resp.status_code, 200)
-        self.assertEqual(resp.json()["count"], 0)
+        self.assertEqual(len(resp.json()["items"]), 0)
 
 
 # ---------------------------------------------------------------------------
@@ -616,7 +687,7 @@ class CookingHistoryAPITest(TestCase):
         resp = self.client.get(f"{BASE_URL}/history", **self.auth)
         self.assertEqual(resp.status_code, 200)
         data = resp.json()
-        self.assertEqual(data["count"], 2)
+        self.assertEqual(len(data["items"]), 2)
         # Newest first
         self.assertEqual(data["items"][0]["rating"], 5)
         self.assertEqual(data["items"][1]["rating"], 4)
@@ -624,7 +695,7 @@ class CookingHistoryAPITest(TestCase):
     def test_history_empty(self, mock_provider):
         resp = self.client.get(f"{BASE_URL}/history", **self.auth)
         self.assertEqual(resp.status_code, 200)
-        self.assertEqual(resp.json()["count"], 0)
+        self.assertEqual(len(resp.json()["items"]), 0)
 
     def test_history_own_only(self, mock_provider):
         other_user = UserFactory()
@@ -633,4 +704,558 @@ class CookingHistoryAPITest(TestCase):
 
         resp = self.client.get(f"{BASE_URL}/history", **self.auth)
         self.assertEqual(resp.status_code, 200)
-        self.assertEqual(resp.json()["count"], 0)
+        self.assertEqual(len(resp.json()["items"]), 0)
+
+    def test_history_cursor_pagination(self, mock_provider):
+        recipe = RecipeFactory(title="Soup")
+        logs = [CookingLogFactory(user=self.user, recipe=recipe) for _ in range(3)]
+
+        first = self.client.get(f"{BASE_URL}/history?page_size=2", **self.auth).json()
+        self.assertEqual(len(first["items"]), 2)
+        self.assertIsNotNone(first["next_cursor"])
+        self.assertEqual(first["items"][0]["recipe_title"], "Soup")
+
+        second = self.client.get(f"{BASE_URL}/history?page_size=2&cursor={first['next_cursor']}", **self.auth).json()
+        self.assertEqual(len(second["items"]), 1)
+        self.assertIsNone(second["next_cursor"])
+
+        ids = [item["id"] for item in first["items"] + second["items"]]
+        expected = sorted(logs, key=lambda log: (log.cooked_at, log.id), reverse=True)
+        self.assertEqual(ids, [str(log.id) for log in expected])
+
+
+# ---------------------------------------------------------------------------
+# Recipe cache refresh tests
+# ---------------------------------------------------------------------------
+
+
+class RefreshStaleRecipesTest(TestCase):
+    def setUp(self):
+        self.provider = AsyncMock()
+
+    def _make_stale(self, recipe, days=60):
+        Recipe.objects.filter(id=recipe.id).update(updated_at=timezone.now() - timedelta(days=days))
+
+    def _refresh(self, **kwargs):
+        kwargs.setdefault("ttl", timedelta(days=30))
+        return async_to_sync(refresh_stale_recipes)(self.provider, **kwargs)
+
+    def test_refreshes_stale_recipes(self):
+        recipe = RecipeFactory(source="spoonacular", external_id="12345", title="Old Title")
+        self._make_stale(recipe)
+        self.provider.get_recipe_details_bulk.return_value = [MOCK_DETAIL]
+
+        result = self._refresh()
+
+        self.assertEqual(result.refreshed, 1)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, "Pasta Primavera")
+        self.assertEqual(recipe.nutrition, MOCK_DETAIL.nutrition)
+        self.assertGreater(recipe.updated_at, timezone.now() - timedelta(minutes=1))
+        self.provider.get_recipe_details_bulk.assert_awaited_once_with(["12345"])
+
+    def test_skips_fresh_recipes(self):
+        RecipeFactory(source="spoonacular", external_id="12345")
+
+        result = self._refresh()
+
+        self.assertEqual(result.stale, 0)
+        self.provider.get_recipe_details_bulk.assert_not_called()
+
+    def test_batches_requests(self):
+        for ext_id in ("1", "2", "3"):
+            self._make_stale(RecipeFactory(source="spoonacular", external_id=ext_id))
+        self.provider.get_recipe_details_bulk.side_effect = lambda ids: [
+            replace(MOCK_DETAIL, external_id=ext_id) for ext_id in ids
+        ]
+
+        result = self._refresh(batch_size=2, concurrency=2)
+
+        self.assertEqual(result.refreshed, 3)
+        self.assertEqual(self.provider.get_recipe_details_bulk.await_count, 2)
+        self.assertEqual(Recipe.objects.filter(title="Pasta Primavera").count(), 3)
+
+    def test_failed_batch_leaves_rows_stale(self):
+        recipe = RecipeFactory(source="spoonacular", external_id="12345", title="Old Title")
+        self._make_stale(recipe)
+        self.provider.get_recipe_details_bulk.side_effect = RecipeProviderError("API down")
+
+        result = self._refresh()
+
+        self.assertEqual(result.failed, 1)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, "Old Title")
+
+    def test_missing_upstream(self):
+        self._make_stale(RecipeFactory(source="spoonacular", external_id="12345"))
+        self.provider.get_recipe_details_bulk.return_value = []
+
+        result = self._refresh()
+
+        self.assertEqual(result.missing, 1)
+        self.assertEqual(result.refreshed, 0)
+
+    @patch("apps.recipes.management.commands.refresh_recipes.SpoonacularProvider")
+    def test_command(self, mock_provider_cls):
+        self._make_stale(RecipeFactory(source="spoonacular", external_id="12345"))
+        mock_provider_cls.return_value.get_recipe_details_bulk = AsyncMock(return_value=[MOCK_DETAIL])
+
+        out = StringIO()
+        call_command("refresh_recipes", "--ttl-days=30", stdout=out)
+
+        self.assertIn("Refreshed 1 of 1", out.getvalue())
+        self.assertTrue(Recipe.objects.filter(title="Pasta Primavera").exists())
+
+
+# ---------------------------------------------------------------------------
+# Cooking stats tests
+# ---------------------------------------------------------------------------
+
+
+class CookingStatsTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.auth = make_auth_header(self.user)
+        self.today = timezone.localdate()
+
+    def _log(self, recipe, days_ago=0, rating=None):
+        """Create a log dated days_ago and fold it into the rollups like log_cooking does."""
+        log = CookingLogFactory(user=self.user, recipe=recipe, rating=rating)
+        CookingLog.objects.filter(id=log.id).update(cooked_at=timezone.now() - timedelta(days=days_ago))
+        log.refresh_from_db()
+        async_to_sync(record_cooking)(log)
+        return log
+
+    def _stats(self):
+        resp = self.client.get(f"{BASE_URL}/stats", **self.auth)
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()
+
+    def test_empty_stats(self):
+        data = self._stats()
+        self.assertEqual(data["total_cooked"], 0)
+        self.assertIsNone(data["average_rating"])
+        self.assertEqual(data["most_cooked"], [])
+
+    def test_log_cooking_updates_rollups(self):
+        recipe = RecipeFactory()
+        for rating in (4, None):
+            resp = self.client.post(
+                f"{BASE_URL}/{recipe.id}/cooked",
+                data=json.dumps({"rating": rating}),
+                content_type="application/json",
+                **self.auth,
+            )
+            self.assertEqual(resp.status_code, 201)
+
+        data = self._stats()
+        self.assertEqual(data["total_cooked"], 2)
+        self.assertEqual(data["distinct_recipes"], 1)
+        self.assertEqual(data["average_rating"], 4.0)
+        self.assertEqual(data["current_streak"], 1)
+        self.assertEqual(data["most_cooked"][0]["recipe_id"], str(recipe.id))
+        self.assertEqual(data["most_cooked"][0]["times_cooked"], 2)
+
+    def test_most_cooked_order_and_top(self):
+        soup, pasta, salad = RecipeFactory(title="Soup"), RecipeFactory(title="Pasta"), RecipeFactory(title="Salad")
+        for recipe, times in ((soup, 1), (pasta, 3), (salad, 2)):
+            for _ in range(times):
+                self._log(recipe, rating=5)
+
+        data = self.client.get(f"{BASE_URL}/stats?top=2", **self.auth).json()
+        self.assertEqual([r["title"] for r in data["most_cooked"]], ["Pasta", "Salad"])
+        self.assertEqual(data["distinct_recipes"], 3)
+        self.assertEqual(data["average_rating"], 5.0)
+
+    def test_streaks(self):
+        recipe = RecipeFactory()
+        for days_ago in (6, 5, 4, 2, 1, 1, 0):
+            self._log(recipe, days_ago=days_ago)
+
+        data = self._stats()
+        self.assertEqual(data["current_streak"], 3)
+        self.assertEqual(data["longest_streak"], 3)
+        self.assertEqual(data["last_cooked_date"], self.today.isoformat())
+
+    def test_streak_lapses_after_a_missed_day(self):
+        self._log(RecipeFactory(), days_ago=2)
+        data = self._stats()
+        self.assertEqual(data["current_streak"], 0)
+        self.assertEqual(data["longest_streak"], 1)
+
+    def test_stats_own_only(self):
+        other = UserFactory()
+        CookingLogFactory(user=other)
+        call_command("rebuild_cooking_stats", stdout=StringIO())
+        self.assertEqual(self._stats()["total_cooked"], 0)
+
+    def test_rebuild_matches_incremental(self):
+        soup, pasta = RecipeFactory(), RecipeFactory()
+        for recipe, days_ago, rating in ((soup, 3, 2), (soup, 1, None), (pasta, 0, 5), (pasta, 0, 4)):
+            self._log(recipe, days_ago=days_ago, rating=rating)
+        incremental = self._stats()
+
+        UserCookingStats.objects.all().delete()
+        RecipeCookingStats.objects.update(times_cooked=99)
+        out = StringIO()
+        call_command("rebuild_cooking_stats", "--chunk-size=1", stdout=out)
+
+        self.assertIn("Rebuilt cooking stats for 1 users (2 recipe rows, 0 nutrition days)", out.getvalue())
+        self.assertEqual(self._stats(), incremental)
+
+    def test_compute_streaks(self):
+        d = self.today
+        self.assertEqual(compute_streaks([]), (0, 0))
+        self.assertEqual(compute_streaks([d]), (1, 1))
+        days = [d - timedelta(days=n) for n in (9, 8, 7, 3, 2)]
+        self.assertEqual(compute_streaks(days), (2, 3))
+
+
+# ---------------------------------------------------------------------------
+# Recommendation tests
+# ---------------------------------------------------------------------------
+
+
+class RecommendedRecipesTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.auth = make_auth_header(self.user)
+        self.a, self.b, self.c, self.d = (RecipeFactory(title=t) for t in ("A", "B", "C", "D"))
+
+        # Two users who cook A also cook B; one who saves A also saves C; D is unrelated to A
+        for recipes in ((self.a, self.b), (self.a, self.b, self.c)):
+            user = UserFactory()
+            for recipe in recipes:
+                CookingLogFactory(user=user, recipe=recipe, rating=5)
+        fan = UserFactory()
+        SavedRecipeFactory(user=fan, recipe=self.a)
+        SavedRecipeFactory(user=fan, recipe=self.c)
+        loner = UserFactory()
+        CookingLogFactory(user=loner, recipe=self.d)
+
+        CookingLogFactory(user=self.user, recipe=self.a)
+        call_command("rebuild_cooking_stats", stdout=StringIO())
+
+    def _build(self, *args):
+        out = StringIO()
+        call_command("build_recipe_similarity", *args, stdout=out)
+        return out.getvalue()
+
+    def test_build_stores_neighbours(self):
+        self.assertIn("from 5 users", self._build())
+        self.assertTrue(RecipeSimilarity.objects.filter(recipe=self.a, neighbor=self.b).exists())
+        self.assertFalse(RecipeSimilarity.objects.filter(recipe=self.a, neighbor=self.a).exists())
+        self.assertFalse(RecipeSimilarity.objects.filter(recipe=self.a, neighbor=self.d).exists())
+        forward = RecipeSimilarity.objects.get(recipe=self.a, neighbor=self.b).score
+        backward = RecipeSimilarity.objects.get(recipe=self.b, neighbor=self.a).score
+        self.assertAlmostEqual(forward, backward)
+
+    def test_build_top_k(self):
+        self._build("--top-k=1")
+        self.assertEqual(RecipeSimilarity.objects.filter(recipe=self.a).count(), 1)
+
+    def test_build_replaces_previous_table(self):
+        self._build()
+        RecipeSimilarity.objects.create(recipe=self.d, neighbor=self.a, score=9.0)
+        self._build()
+        self.assertFalse(RecipeSimilarity.objects.filter(recipe=self.d, neighbor=self.a).exists())
+
+    def test_recommended_ranks_neighbours_and_excludes_history(self):
+        self._build()
+
+        resp = self.client.get(f"{BASE_URL}/recommended", **self.auth)
+        self.assertEqual(resp.status_code, 200)
+        titles = [r["title"] for r in resp.json()]
+        self.assertEqual(titles, ["B", "C"])
+        self.assertGreater(resp.json()[0]["score"], resp.json()[1]["score"])
+
+    def test_recommended_uses_saved_recipes_as_seeds(self):
+        self._build()
+        SavedRecipeFactory(user=self.user, recipe=self.b)
+
+        titles = [r["title"] for r in self.client.get(f"{BASE_URL}/recommended", **self.auth).json()]
+        self.assertEqual(titles, ["C"])
+
+    def test_recommended_is_one_query_without_upstream(self):
+        self._build()
+        with patch("apps.recipes.api.recipe_provider") as mock_provider:
+            with CaptureQueriesContext(connection) as ctx:
+                resp = self.client.get(f"{BASE_URL}/recommended?limit=1", **self.auth)
+        self.assertEqual(len(resp.json()), 1)
+        self.assertEqual(len([q for q in ctx.captured_queries if "recipe_similarities" in q["sql"]]), 1)
+        self.assertFalse(mock_provider.method_calls)
+
+    def test_recommended_empty_without_history(self):
+        self._build()
+        other = UserFactory()
+        resp = self.client.get(f"{BASE_URL}/recommended", **make_auth_header(other))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json(), [])
+
+
+# ---------------------------------------------------------------------------
+# Ingredient matching and pantry deduction tests
+# ---------------------------------------------------------------------------
+
+
+class IngredientMatchingTest(TestCase):
+    def test_candidate_names(self):
+        self.assertEqual(
+            candidate_names("Extra-Virgin Olive Oils"),
+            ["extra-virgin olive oils", "extra-virgin olive oil", "olive oils", "olive oil", "oils", "oil"],
+        )
+        self.assertEqual(candidate_names("tomatoes"), ["tomatoes", "tomato"])
+        self.assertEqual(candidate_names("berries")[-1], "berry")
+
+    def test_normalize_unit(self):
+        self.assertEqual(normalize_unit("Tablespoons"), "tbsp")
+        self.assertEqual(normalize_unit("grams"), "g")
+        self.assertEqual(normalize_unit(""), "piece")
+        self.assertEqual(normalize_unit(None), "piece")
+        self.assertEqual(normalize_unit("pinch"), "pinch")
+
+    @patch("apps.recipes.api.recipe_provider")
+    def test_matches_built_when_recipe_is_cached(self, mock_provider):
+        pasta = IngredientFactory(name="pasta")
+        tomato = IngredientFactory(name="tomato")
+        mock_provider.get_recipe_detail = AsyncMock(return_value=MOCK_DETAIL)
+        user = UserFactory()
+
+        resp = self.client.post(f"{BASE_URL}/12345/cooked", content_type="application/json", **make_auth_header(user))
+
+        self.assertEqual(resp.status_code, 201)
+        matches = {m.ingredient_id: m for m in RecipeIngredientMatch.objects.all()}
+        self.assertEqual(set(matches), {pasta.id, tomato.id})
+        self.assertEqual(matches[pasta.id].amount, Decimal("200.00"))
+        self.assertEqual(matches[tomato.id].unit, "piece")
+
+    def test_unmatched_entries_are_skipped(self):
+        IngredientFactory(name="olive oil")
+        recipe = RecipeFactory(
+            ingredients_json=[
+                {"name": "extra virgin olive oil", "amount": 2, "unit": "tbsp"},
+                {"name": "unobtainium", "amount": 1, "unit": ""},
+                {"name": "", "amount": 1, "unit": ""},
+            ]
+        )
+
+        out = StringIO()
+        call_command("match_recipe_ingredients", stdout=out)
+
+        self.assertIn("Matched 1 ingredients across 1 recipes", out.getvalue())
+        self.assertEqual(RecipeIngredientMatch.objects.get(recipe=recipe).position, 0)
+
+    def test_refresh_rematches(self):
+        IngredientFactory(name="pasta")
+        recipe = RecipeFactory(source="spoonacular", external_id="12345", ingredients_json=[])
+        Recipe.objects.filter(id=recipe.id).update(updated_at=timezone.now() - timedelta(days=60))
+        provider = AsyncMock()
+        provider.get_recipe_details_bulk.return_value = [MOCK_DETAIL]
+
+        async_to_sync(refresh_stale_recipes)(provider, ttl=timedelta(days=30))
+
+        self.assertEqual(RecipeIngredientMatch.objects.filter(recipe=recipe).count(), 1)
+
+
+class PantryDeductionTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.auth = make_auth_header(self.user)
+        eggs, oil, flour = (IngredientFactory(name=n) for n in ("egg", "olive oil", "flour"))
+        self.recipe = RecipeFactory(
+            ingredients_json=[
+                {"name": "eggs", "amount": 2, "unit": "large"},
+                {"name": "olive oil", "amount": 2, "unit": "tablespoons"},
+                {"name": "flour", "amount": 250, "unit": "grams"},
+            ]
+        )
+        async_to_sync(match_recipe_ingredients)([self.recipe])
+        self.eggs = PantryItemFactory(user=self.user, ingredient=eggs, quantity=Decimal("6"), unit="piece")
+        self.oil = PantryItemFactory(user=self.user, ingredient=oil, quantity=Decimal("500"), unit="ml")
+        self.flour = PantryItemFactory(user=self.user, ingredient=flour, quantity=Decimal("200"), unit="g")
+
+    def _cook(self, **body):
+        return self.client.post(
+            f"{BASE_URL}/{self.recipe.id}/cooked",
+            data=json.dumps(body),
+            content_type="application/json",
+            **self.auth,
+        )
+
+    def test_no_deduction_by_default(self):
+        resp = self._cook()
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(resp.json()["deducted_pantry_item_ids"], [])
+        self.eggs.refresh_from_db()
+        self.assertEqual(self.eggs.quantity, Decimal("6"))
+
+    def test_deducts_matching_units_in_one_update(self):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self._cook(deduct_pantry=True)
+
+        self.assertEqual(resp.status_code, 201)
+        self.assertEqual(set(resp.json()["deducted_pantry_item_ids"]), {str(self.eggs.id), str(self.flour.id)})
+        self.assertEqual(len([q for q in ctx.captured_queries if q["sql"].startswith('UPDATE "pantry_items"')]), 1)
+
+        for item in (self.eggs, self.oil, self.flour):
+            item.refresh_from_db()
+        self.assertEqual(self.eggs.quantity, Decimal("4"))
+        self.assertEqual(self.eggs.status, PantryItem.Status.AVAILABLE)
+        # ml vs tbsp — different unit, left alone
+        self.assertEqual(self.oil.quantity, Decimal("500"))
+        # 250 g needed, 200 g available — used up, clamped at zero
+        self.assertEqual(self.flour.quantity, Decimal("0"))
+        self.assertEqual(self.flour.status, PantryItem.Status.USED_UP)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.pantry_version, 1)
+
+    def test_used_up_items_move_pantry_counters(self):
+        reconcile_pantry_counters()
+
+        self._cook(deduct_pantry=True)
+
+        counters = PantryCategoryCounter.objects.filter(user=self.user)
+        self.assertEqual(sum(c.available for c in counters), 2)
+        self.assertEqual(sum(c.used_up for c in counters), 1)
+
+    def test_counters_follow_the_update_not_the_read(self):
+        reconcile_pantry_counters()
+        apply_deductions = matching._apply_deductions
+
+        def restocked_first(*args):
+            # Another device restocks the flour after deduct_pantry read 200 g
+            PantryItem.objects.filter(id=self.flour.id).update(quantity=Decimal("1000"))
+            return apply_deductions(*args)
+
+        with patch("apps.recipes.services.matching._apply_deductions", side_effect=restocked_first):
+            self._cook(deduct_pantry=True)
+
+        self.flour.refresh_from_db()
+        self.assertEqual((self.flour.quantity, self.flour.status), (Decimal("750"), PantryItem.Status.AVAILABLE))
+        counters = PantryCategoryCounter.objects.filter(user=self.user)
+        self.assertEqual((sum(c.available for c in counters), sum(c.used_up for c in counters)), (3, 0))
+
+    def test_deduction_rolls_back_if_the_counter_move_fails(self):
+        with (
+            patch("apps.recipes.services.matching.apply_pantry_change", side_effect=DatabaseError("connection lost")),
+            self.assertRaises(DatabaseError),
+        ):
+            self._cook(deduct_pantry=True)
+
+        self.flour.refresh_from_db()
+        self.assertEqual((self.flour.quantity, self.flour.status), (Decimal("200"), PantryItem.Status.AVAILABLE))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.pantry_version, 0)
+
+    def test_skips_other_users_and_unavailable_items(self):
+        other = PantryItemFactory(ingredient=self.eggs.ingredient, quantity=Decimal("6"), unit="piece")
+        PantryItem.objects.filter(id=self.eggs.id).update(status=PantryItem.Status.EXPIRED)
+
+        resp = self._cook(deduct_pantry=True)
+
+        self.assertEqual(resp.json()["deducted_pantry_item_ids"], [str(self.flour.id)])
+        other.refresh_from_db()
+        self.assertEqual(other.quantity, Decimal("6"))
+
+    def test_history_has_empty_deductions(self):
+        self._cook(deduct_pantry=True)
+        item = self.client.get(f"{BASE_URL}/history", **self.auth).json()["items"][0]
+        self.assertEqual(item["deducted_pantry_item_ids"], [])
+
+
+# ---------------------------------------------------------------------------
+# Daily nutrition tests
+# ---------------------------------------------------------------------------
+
+NUTRITION = {
+    "calories": {"amount": 500, "unit": "kcal"},
+    "protein": {"amount": 20, "unit": "g"},
+    "carbohydrates": {"amount": 60, "unit": "g"},
+    "fat": {"amount": 15.5, "unit": "g"},
+    "sodium": {"amount": 800, "unit": "mg"},
+}
+
+
+class DailyNutritionTest(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.auth = make_auth_header(self.user)
+        self.recipe = RecipeFactory(nutrition=NUTRITION)
+        self.today = timezone.localdate()
+
+    def _log(self, recipe, days_ago=0):
+        log = CookingLogFactory(user=self.user, recipe=recipe)
+        CookingLog.objects.filter(id=log.id).update(cooked_at=timezone.now() - timedelta(days=days_ago))
+        log.refresh_from_db()
+        async_to_sync(record_nutrition)(log, recipe)
+
+    def _summary(self, query=""):
+        resp = self.client.get(f"{BASE_URL}/nutrition{query}", **self.auth)
+        self.assertEqual(resp.status_code, 200)
+        return resp.json()
+
+    def test_log_cooking_adds_one_serving(self):
+        for _ in range(2):
+            self.client.post(f"{BASE_URL}/{self.recipe.id}/cooked", content_type="application/json", **self.auth)
+
+        row = DailyNutrition.objects.get(user=self.user, date=self.today)
+        self.assertEqual(row.servings, 2)
+        self.assertEqual(row.calories, 1000)
+        self.assertEqual(row.fat_g, 31)
+        self.assertEqual(row.fiber_g, 0)
+
+    def test_recipe_without_nutrition_is_skipped(self):
+        self._log(RecipeFactory(nutrition=None))
+        self.assertFalse(DailyNutrition.objects.exists())
+
+    def test_default_range_totals_and_average(self):
+        self._log(self.recipe, days_ago=0)
+        self._log(self.recipe, days_ago=10)
+        self._log(self.recipe, days_ago=40)  # outside the default 30 days
+
+        data = self._summary()
+        self.assertEqual(data["end"], self.today.isoformat())
+        self.assertEqual(data["totals"]["servings"], 2)
+        self.assertEqual(data["totals"]["calories"], 1000)
+        self.assertAlmostEqual(data["daily_average"]["calories"], round(1000 / 30, 2))
+        self.assertEqual(len(data["buckets"]), 2)
+
+    def test_group_by_month(self):
+        start = self.today.replace(day=1) - timedelta(days=1)  # last day of previous month
+        for days_ago in ((self.today - start).days, 0, 0):
+            self._log(self.recipe, days_ago=days_ago)
+
+        data = self._summary(f"?start={start.isoformat()}&end={self.today.isoformat()}&group=month")
+        self.assertEqual(
+            [b["period_start"] for b in data["buckets"]],
+            [
+                start.replace(day=1).isoformat(),
+                self.today.replace(day=1).isoformat(),
+            ],
+        )
+        self.assertEqual([b["servings"] for b in data["buckets"]], [1, 2])
+        self.assertEqual(data["buckets"][1]["protein_g"], 40)
+
+    def test_group_by_week_starts_monday(self):
+        self._log(self.recipe)
+        data = self._summary("?group=week")
+        monday = self.today - timedelta(days=self.today.weekday())
+        self.assertEqual(data["buckets"][0]["period_start"], monday.isoformat())
+
+    def test_invalid_ranges(self):
+        resp = self.client.get(f"{BASE_URL}/nutrition?start=2026-03-01&end=2026-02-01", **self.auth)
+        self.assertEqual(resp.status_code, 400)
+        resp = self.client.get(f"{BASE_URL}/nutrition?start=2024-01-01&end=2026-01-01", **self.auth)
+        self.assertEqual(resp.status_code, 400)
+
+    def test_rebuild_matches_incremental(self):
+        for days_ago in (0, 0, 3):
+            self._log(self.recipe, days_ago=days_ago)
+        self._log(RecipeFactory(nutrition={"calories": {"amount": 100, "unit": "kcal"}}), days_ago=3)
+        incremental = sorted(DailyNutrition.objects.values_list("date", "servings", "calories", "sodium_mg"))
+
+        DailyNutrition.objects.update(calories=0)
+        call_command("rebuild_cooking_stats", stdout=StringIO())
+
+        rebuilt = sorted(DailyNutrition.objects.values_list("date", "servings", "calories", "sodium_mg"))
+        self.assertEqual(rebuilt, incremental)
@@ -1,10 +1,13 @@
 import json
 import uuid
+from unittest import mock
 
 import jwt
 from django.conf import settings
+from django.db.models import F
 from django.test import TestCase
 
+from apps.users.auth import SupabaseJWTAuth
 from apps.users.models import User
 from tests.conftest import make_auth_header
 from tests.factories import UserFactory
@@ -39,6 +42,28 @@ class GetMeTest(TestCase):
         self.assertEqual(self.user.display_name, "Updated Name")
         self.assertEqual(self.user.household_size, 3)
 
+    def test_patch_me_keeps_concurrent_pantry_version_bump(self):
+        authenticate = SupabaseJWTAuth.authenticate
+
+        async def authenticate_then_pantry_write(auth, request, token):
+            user = await authenticate(auth, request, token)
+            # A pantry write lands between authentication and the profile save
+            await User.objects.filter(id=user.id).aupdate(pantry_version=F("pantry_version") + 1)
+            return user
+
+        with mock.patch.object(SupabaseJWTAuth, "authenticate", authenticate_then_pantry_write):
+            response = self.client.patch(
+                "/api/v1/me",
+                data=json.dumps({"display_name": "Updated Name"}),
+                content_type="application/json",
+                **self.auth,
+            )
+        self.assertEqual(response.status_code, 200)
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.display_name, "Updated Name")
+        self.assertEqual(self.user.pantry_version, 1)
+
     def test_auto_creates_user(self):
         new_user_id = str(uuid.uuid4())
         payload = {"sub": new_user_id, "email": "new@example.com", "aud": "authenticated"}
@@ -28,7 +28,8 @@ const mockScanDetail = {
   image_url: "https://example.com/receipt.jpg",
   store_name: "Test Market",
   scanned_at: "2026-02-20T10:00:00Z",
-  status: "pending",
+  status: "completed",
+  error: null,
   items: [
     { id: 1, raw_text: "CHICKEN BREAST", ingredient_id: 1, ingredient_name: "Chicken Breast", quantity: 2, unit: "pcs", price: 9.99, is_food: true },
     { id: 2, raw_text: "MILK 2%", ingredient_id: 2, ingredient_name: "Milk", quantity: 1, unit: "L", price: 3.49, is_food: true },
@@ -28,12 +28,27 @@ export function useScanDetail(scanId: string | null) {
   });
 }
 
+// Seconds each GET /receipts/{id}?wait= long-poll may be held by the backend
+const SCAN_WAIT_SECONDS = 25;
+
+// The backend extracts in the background and answers "processing";
+// long-poll until the scan completes (items filled in) or fails
+async function waitForScan(scan: ReceiptScanDetail): Promise<ReceiptScanDetail> {
+  while (scan.status === "processing") {
+    scan = await apiClient.get<ReceiptScanDetail>(`/receipts/${scan.id}?wait=${SCAN_WAIT_SECONDS}`);
+  }
+  if (scan.status === "failed") {
+    throw new Error(scan.error ?? "Failed to scan receipt");
+  }
+  return scan;
+}
+
 export function useScanReceipt() {
   const queryClient = useQueryClient();
 
   return useMutation({
-    mutationFn: (input: ScanReceiptInput) =>
-      apiClient.post<ReceiptScanDetail>("/receipts/scan", input),
+    mutationFn: async (input: ScanReceiptInput) =>
+      waitForScan(await apiClient.post<ReceiptScanDetail>("/receipts/scan", input)),
     onSuccess: () => {
       queryClient.invalidateQueries({ queryKey: ["receipts"] });
     },
@@ -66,7 +66,7 @@ function updateIsSavedInCache(qc: QueryClient, recipeId: string, isSaved: boolea
     qc.setQueriesData<PaginatedResponse<SavedRecipe>>({ queryKey: ["recipes", "saved"] }, (old) => {
       if (!old) return old;
       const items = old.items.filter((s) => !matches(s.recipe));
-      return { items, count: items.length };
+      return { ...old, items };
     });
   }
 }
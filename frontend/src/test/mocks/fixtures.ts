@@ -58,7 +58,7 @@ export const mockPantryItem2: PantryItem = {
 
 export const mockPantryItems: PaginatedResponse<PantryItem> = {
   items: [mockPantryItem, mockPantryItem2],
-  count: 2,
+  next_cursor: null,
 };
 
 export const mockPantryItemCreateOutput: PantryItemCreateOutput = {
@@ -48,7 +48,7 @@ export const handlers = [
   http.delete(`${API_URL}/recipes/:id/save`, () => new HttpResponse(null, { status: 204 })),
   http.get(`${API_URL}/recipes/saved`, () => HttpResponse.json(mockSavedRecipes)),
   http.get(`${API_URL}/recipes/history`, () =>
-    HttpResponse.json({ items: [mockCookingLog], count: 1 }),
+    HttpResponse.json({ items: [mockCookingLog], next_cursor: null }),
   ),
   http.post(`${API_URL}/recipes/:id/cooked`, () =>
     HttpResponse.json(mockCookingLog, { status: 201 }),
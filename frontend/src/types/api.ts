@@ -6,7 +6,7 @@ export type ErrorResponse = {
 
 export type PaginatedResponse<T> = {
   items: T[];
-  count: number;
+  next_cursor: string | null;
 };
 
 // ── Users ──
@@ -127,6 +127,7 @@ export type ReceiptScanDetail = {
   store_name: string | null;
   scanned_at: string;
   status: string;
+  error: string | null;
   items: ReceiptItem[];
 };
 